@@ -1,13 +1,13 @@
-import ast
-import json
-import re
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QCompleter, QMessageBox
+    QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QCompleter
 )
-from PyQt6.QtCore import Qt
-from hardware_info import HardwareInfo  
+from PyQt6.QtCore import Qt, QStringListModel, QThreadPool
+from hardware_info import HardwareInfo
 from data_handle import DataHandle
 from helpers import MessageHelper
+from components import ComponentModel
+from workers import Worker
+from warranty import WarrantyLookup, describe
 
 class AddReport(QWidget):
     def __init__(self):
@@ -28,12 +28,15 @@ class AddReport(QWidget):
         layout.addWidget(self.client_dropdown)
 
         self.json_file = DataHandle.json_file
-        DataHandle.load_existing_clients(self.json_file, self.client_dropdown)
+        self.client_index = DataHandle.load_existing_clients(self.json_file, self.client_dropdown)
 
-        # Autocomplete for dropdown list
-        self.completer = QCompleter(self.client_dropdown.model(), self)
-        self.completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
+        # Autocomplete for dropdown list: ranked by the client index (prefix matches, then substrings)
+        self.completion_model = QStringListModel(self)
+        self.completer = QCompleter(self.completion_model, self)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
         self.client_dropdown.setCompleter(self.completer)
+        self.client_dropdown.lineEdit().textEdited.connect(self.complete_client)
 
         # Serial Number Labels (Auto-Populated)
         self.machine_label = QLabel("Machine S/N:")
@@ -103,58 +106,121 @@ class AddReport(QWidget):
         self.submit_button.clicked.connect(self.submit_data)
         layout.addWidget(self.submit_button)
 
+        # Warranty of the Machine S/N, looked up on a worker (answers are cached next to the store)
+        self.warranty = WarrantyLookup(self.json_file)
+        self.system_vendor = HardwareInfo.get_system_vendor()
+        self.warranty_button = QPushButton("Check Warranty", self)
+        self.warranty_button.clicked.connect(self.check_warranty)
+        layout.addWidget(self.warranty_button)
+        self.warranty_label = QLabel("", self)
+        self.warranty_label.setWordWrap(True)
+        layout.addWidget(self.warranty_label)
+
         # Set layout
         self.setLayout(layout)
 
-        # Auto-fill serial numbers on startup
+        # Auto-fill serial numbers on startup: each probe runs on its own worker and fills its field when done
+        self.serials = {}
+        self.fields = {
+            "Machine S/N": self.machine_sn,
+            "CPU S/N": self.cpu_sn,
+            "BIOS S/N": self.bios_sn,
+            "GPU S/N": self.gpu_sn,
+            "NIC S/N": self.nic_sn,
+            "Power S/N": self.power_supply_sn,
+            "Battery S/N": self.battery_sn,
+            "RAM S/N": self.ram_sn,
+            "Display S/N": self.display_sn,
+            "Disk S/N": self.disk_sn,
+        }
+        self.pending_probes = set()
+        self.saving = False
+        self.saving_client = None
+        # One thread per probe, so a slow probe (dmidecode) never delays the others
+        self.probe_pool = QThreadPool(self)
+        self.probe_pool.setMaxThreadCount(len(self.fields))
         self.fill_serial_numbers()
 
-    def _format_value(self, value):
-        """
-        Format a value for display.
-        If the value is a dictionary (e.g., for NIC, Power, or Display serials),
-        join its key–value pairs into a multi-line string.
-        """
-        if isinstance(value, dict):
-            return "\n".join([f"{k}: {v}" for k, v in value.items()])
-        return str(value)
-
+    def complete_client(self, text: str):
+        """Offer the best matching client names for the typed text."""
+        self.completion_model.setStringList(self.client_index.complete(text))
+        if text.strip():
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
 
     def fill_serial_numbers(self):
-        """Auto-fill serial number fields using the HardwareInfo class."""
-        serials_json = HardwareInfo.get_serial_numbers()
-        serials = json.loads(serials_json)  # Convert JSON string back to dict
-        
-        self.machine_sn.setText(serials.get("Machine S/N", "N/A"))
-        
-        disk_sn_value = serials.get("Disk S/N", "N/A")
-        # Check if the value is a list and convert it to a string if so
-        if isinstance(disk_sn_value, list):
-            disk_sn_value = ", ".join(disk_sn_value)
-            
-        self.disk_sn.setText(disk_sn_value)
-        
-        ram_sn_value = serials.get("RAM S/N", "N/A")
-        # Check if the value is a list and convert it to a string if so
-        if isinstance(ram_sn_value, list):
-            ram_sn_value = ", ".join(ram_sn_value)
-            
-        self.ram_sn.setText(ram_sn_value)
-        
-        self.cpu_sn.setText(serials.get("CPU S/N", "N/A"))
-        self.bios_sn.setText(serials.get("BIOS S/N", "N/A"))
-        self.gpu_sn.setText(serials.get("GPU S/N", "N/A"))
-        
-        nic_value = serials.get("NIC S/N", "N/A")
-        nic_value = ", ".join(str(value) for value in nic_value.values())
-        self.nic_sn.setText(nic_value)
-        
-        self.battery_sn.setText(serials.get("Battery S/N", "N/A"))
-        self.power_supply_sn.setText(serials.get("Power S/N", "N/A"))
-        
-        display_value = serials.get("Display S/N", "N/A")
-        display_value = ", ".join(f"{v}" for k, v in display_value.items())
-        self.display_sn.setText(display_value)
+        """Start the HardwareInfo probes on worker threads; every field shows a pending state until its probe reports."""
+        self.pending_probes = set(self.fields)
+        for field, line_edit in self.fields.items():
+            line_edit.clear()
+            line_edit.setPlaceholderText("Probing...")
+            worker = Worker(self.probe, field)
+            worker.signals.finished.connect(self.probe_finished)
+            self.probe_pool.start(worker)
+        self.update_submit_button()
+
+    @staticmethod
+    def probe(field: str):
+        """Runs on a probe thread: return (field, value) without touching any widget."""
+        try:
+            return field, HardwareInfo.probe(field)
+        except Exception:
+            return field, "Unknown"
+
+    def probe_finished(self, result):
+        """Fill in one field as soon as its probe completes."""
+        field, value = result
+        self.serials[field] = value
+        line_edit = self.fields[field]
+        line_edit.setPlaceholderText("")
+        # Lists (disks, RAM) and slot mappings (NIC, displays) are shown as one line.
+        if not line_edit.isModified():  # Keep what the user typed meanwhile (Machine S/N is editable)
+            line_edit.setText(ComponentModel.format_value(value))
+        self.pending_probes.discard(field)
+        self.update_submit_button()
+
+    def update_submit_button(self):
+        """Only allow submitting once every probe has reported and no save is running."""
+        self.submit_button.setEnabled(not self.pending_probes and not self.saving)
+        if self.saving:
+            self.submit_button.setText("Saving...")
+        elif self.pending_probes:
+            self.submit_button.setText(f"Probing hardware ({len(self.fields) - len(self.pending_probes)}/{len(self.fields)})...")
+        else:
+            self.submit_button.setText("Submit")
+
+    def check_warranty(self):
+        """Look up the warranty of the Machine S/N on a worker thread."""
+        machine_sn = self.machine_sn.text().strip()
+        if not machine_sn:
+            self.warranty_label.setText("⚠ Enter a Machine S/N first.")
+            return
+        # The local vendor only applies to the probed serial, not to one typed in for another machine
+        vendor = None if self.machine_sn.isModified() else self.system_vendor
+        self.warranty_button.setEnabled(False)
+        self.warranty_label.setText(f"Checking the warranty of {machine_sn}...")
+        worker = Worker(self.warranty.lookup, [(machine_sn, vendor)])
+        worker.signals.finished.connect(lambda results: self.warranty_finished(machine_sn, results[machine_sn]))
+        worker.signals.error.connect(self.warranty_failed)
+        QThreadPool.globalInstance().start(worker)
+
+    def warranty_finished(self, machine_sn: str, result: dict):
+        self.warranty_button.setEnabled(True)
+        icon = "✅" if result["status"] == "active" else "⚠"
+        vendor = f"{result['vendor'].title()}: " if result.get("vendor") else ""
+        self.warranty_label.setText(f"{icon} {machine_sn} {vendor}{describe(result)}")
+
+    def warranty_failed(self, error: str):
+        self.warranty_button.setEnabled(True)
+        self.warranty_label.setText(f"⚠ Warranty lookup failed: {error.strip().splitlines()[-1]}")
+
+    def _components(self, field: str, line_edit: QLineEdit) -> list:
+        """
+        Return the typed component entries for a multi-valued field.
+        The probed value is preferred so that NIC and display slots are kept.
+        """
+        return ComponentModel.to_entries(self.serials.get(field, line_edit.text().strip()))
 
 
     def submit_data(self):
@@ -164,20 +230,44 @@ class AddReport(QWidget):
         # Build a new_record dict where the key is the Machine S/N and its value holds the rest.
         new_record = {
             self.machine_sn.text().strip(): {
-                "Disk S/N": self.disk_sn.text().strip(),
-                "RAM S/N": self.ram_sn.text().strip(),
+                "Disk S/N": self._components("Disk S/N", self.disk_sn),
+                "RAM S/N": self._components("RAM S/N", self.ram_sn),
                 "Battery S/N": self.battery_sn.text().strip(),
                 "CPU S/N": self.cpu_sn.text().strip(),
                 "BIOS S/N": self.bios_sn.text().strip(),
                 "GPU S/N": self.gpu_sn.text().strip(),
-                "NIC S/N": self.nic_sn.text().strip(),
+                "NIC S/N": self._components("NIC S/N", self.nic_sn),
                 "Power S/N": self.power_supply_sn.text().strip(),
-                "Display S/N": self.display_sn.text().strip()
+                "Display S/N": self._components("Display S/N", self.display_sn)
             }
         }
 
-        # Save data and capture the result from DataHandle (alias of SetupHelpers)
-        result = DataHandle.save_client_data(self.json_file, client_name, new_record)
+        # The store is read and written on a worker thread; only the duplicate dialog runs here
+        self.saving = True
+        self.saving_client = client_name
+        self.update_submit_button()
+        self.start_save(DataHandle.stage_client_data, self.json_file, client_name, new_record)
+
+    def start_save(self, fn, *args):
+        """Run a DataHandle save step on a worker thread and report back to save_step_finished."""
+        worker = Worker(fn, *args)
+        worker.signals.finished.connect(self.save_step_finished)
+        worker.signals.error.connect(self.save_failed)
+        QThreadPool.globalInstance().start(worker)
+
+    def save_step_finished(self, result):
+        """Ask about duplicates found while staging, or report the outcome of the save."""
+        if isinstance(result, tuple):
+            result, staged = result
+            if staged is not None:
+                action = DataHandle.ask_duplicate_action(staged)
+                self.start_save(DataHandle.resolve_duplicates, self.json_file, staged, action)
+                return
+        self.saving = False
+        self.update_submit_button()
+        if result in ("Ok", "Merged", "Add New"):
+            self.client_index.add(self.saving_client)
+
         helper = MessageHelper()
         match result:
             case "Ok":
@@ -189,6 +279,12 @@ class AddReport(QWidget):
             case _:
                 helper.show_error("Error", f"Unexpected result: {result}")
 
+    def save_failed(self, error: str):
+        """Report a save that raised on the worker thread."""
+        self.saving = False
+        self.update_submit_button()
+        MessageHelper().show_error("Error", f"Could not save the record: {error.strip().splitlines()[-1]}")
+
 if __name__ == "__main__":
     from PyQt6.QtWidgets import QApplication
     import sys
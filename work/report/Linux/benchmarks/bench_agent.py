@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_fleet import synthetic_machine
+
+
+def start_receiver(json_file: str, failure_rate: float) -> int:
+    """Run a stand-in receiver on a free localhost port: an IngestService that answers 503 at random."""
+    from ingest_server import IngestService
+
+    class FlakyReceiver(IngestService):
+        async def route(self, method, path, body):
+            if method == "POST" and random.random() < failure_rate:
+                return 503, {"error": "stand-in receiver failing on purpose"}
+            return await super().route(method, path, body)
+
+    ready, port = threading.Event(), []
+
+    def started(bound):
+        port.append(bound)
+        ready.set()
+
+    threading.Thread(target=lambda: asyncio.run(FlakyReceiver(json_file).serve("127.0.0.1", 0, started)), daemon=True).start()
+    ready.wait()
+    return port[0]
+
+
+def swap_component(snapshot: dict, rng: random.Random):
+    """Replace one disk or RAM module, or the battery, as a technician would."""
+    field = rng.choice(["Disk S/N", "RAM S/N", "Battery S/N"])
+    if field == "Battery S/N":
+        snapshot[field] = f"B{rng.randrange(10**8):08d}"
+    else:
+        snapshot[field] = snapshot[field][:-1] + [{"serial": f"SWAP{rng.randrange(10**10):010d}"}]
+
+
+def main(machines: int, rounds: int, swap_rate: float, failure_rate: float):
+    from collector_agent import CollectorAgent
+    from components import ComponentModel
+
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "client_system_info.json")
+        port = start_receiver(json_file, failure_rate)
+        url = f"http://127.0.0.1:{port}/machines"
+
+        snapshots, agents, delays = [], [], []
+        for index in range(machines):
+            machine_sn, record = synthetic_machine(rng)
+            snapshots.append({"Machine S/N": f"{machine_sn}-{index}", **record})
+            agents.append(CollectorAgent(
+                url, f"leased{index % 20:02d}", os.path.join(tmp, f"agent{index}.json"),
+                collect=lambda index=index: snapshots[index], sleep=delays.append, rng=random.Random(index),
+            ))
+
+        full_bytes = 0
+        for round_number in range(rounds):
+            swapped = 0
+            if round_number:
+                for snapshot in snapshots:
+                    if rng.random() < swap_rate:
+                        swap_component(snapshot, rng)
+                        swapped += 1
+            outcomes = {}
+            for agent, snapshot in zip(agents, snapshots):
+                status = agent.run_once()
+                outcomes[status] = outcomes.get(status, 0) + 1
+                full_bytes += len(json.dumps({"client": agent.client, "snapshot": snapshot}))
+            print(f"round {round_number}: {swapped} machines changed, outcomes {outcomes}")
+
+        sent = sum(agent.stats["bytes_sent"] for agent in agents)
+        retries = sum(agent.stats["retries"] for agent in agents)
+        print(
+            f"{machines} machines x {rounds} rounds: {sent / 1024:,.0f} KiB sent vs {full_bytes / 1024:,.0f} KiB "
+            f"for full snapshots every round ({sent / full_bytes:.1%}); {retries} retries, "
+            f"{sum(delays):.0f} s of backoff across the fleet"
+        )
+
+        with open(json_file) as file:
+            stored = json.load(file)
+        matching = sum(
+            stored[agent.client][snapshot["Machine S/N"]] == ComponentModel.normalize_record(
+                {field: value for field, value in snapshot.items() if field != "Machine S/N"}
+            )
+            for agent, snapshot in zip(agents, snapshots)
+        )
+        print(f"store matches the latest collection for {matching}/{machines} machines")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delta uploads of collector agents against a flaky stand-in receiver.")
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--swap-rate", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    args = parser.parse_args()
+    main(args.machines, args.rounds, args.swap_rate, args.failure_rate)
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from component_index import ComponentIndex
+from components import ComponentModel
+from synthetic_fleet import synthetic_fleet
+
+
+def main(machines: int, queries: int):
+    data = synthetic_fleet(machines)
+    serials = [
+        serial
+        for machines_of_client in data.values()
+        for record in machines_of_client.values()
+        for serial in ComponentModel.serials(record, "RAM S/N")
+    ][:queries]
+
+    started = time.perf_counter()
+    index = ComponentIndex.build(data)
+    print(f"build:   {time.perf_counter() - started:.2f} s for {machines} machines, {len(index.postings)} keys")
+
+    started = time.perf_counter()
+    for serial in serials:
+        index.locate(serial)
+    elapsed = (time.perf_counter() - started) / len(serials)
+    print(f"locate:  {elapsed * 1e6:.1f} µs per query over {len(serials)} queries (in memory)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "client_system_info.json")
+        buckets = ComponentIndex.buckets_for(json_file)
+        started = time.perf_counter()
+        buckets.write_all(index.postings)
+        print(f"write:   {time.perf_counter() - started:.2f} s for {len(os.listdir(buckets.directory))} bucket files")
+
+        index = ComponentIndex(buckets=buckets)
+        started = time.perf_counter()
+        for serial in serials:
+            index.locate(serial)
+        elapsed = (time.perf_counter() - started) / len(serials)
+        print(f"locate:  {elapsed * 1e6:.1f} µs per query over {len(serials)} queries (from buckets)")
+
+        client, machines_of_client = next(iter(data.items()))
+        machine_sn, record = next(iter(machines_of_client.items()))
+        changed = dict(record, **{"RAM S/N": ComponentModel.to_entries("BENCH-RAM-1")})
+        started = time.perf_counter()
+        buckets.update(
+            [(key, client, machine_sn) for key in ComponentIndex.record_keys(record)],
+            [(key, [client, machine_sn, field]) for key, field in ComponentIndex.record_keys(changed).items()],
+        )
+        print(f"update:  {(time.perf_counter() - started) * 1e3:.1f} ms for one changed machine")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark component index build and lookup.")
+    parser.add_argument("--machines", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args()
+    main(args.machines, args.queries)
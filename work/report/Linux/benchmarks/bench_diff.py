@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHANGE_EVERY = 100  # One machine in CHANGE_EVERY is removed, moved, changed or re-read under a new S/N
+
+
+def machine(seed: int, index: int):
+    from synthetic_fleet import synthetic_machine
+
+    machine_sn, record = synthetic_machine(random.Random(seed * 10_000_019 + index))
+    return f"{machine_sn}-{index}", record
+
+
+def write_snapshot(path: str, machines: int, clients: int, seed: int, quarter: int):
+    """
+    Stream a snapshot to disk one client at a time. Quarter 1 applies the changes: machine i
+    with i % CHANGE_EVERY == 0 is removed, == 1 moves to the next client, == 2 gets a new disk,
+    == 3 keeps its BIOS S/N under a new Machine S/N, and one new machine joins per CHANGE_EVERY.
+    """
+    per_client = machines // clients
+    expected = {"added": 0, "removed": 0, "moved": 0, "changed": 0}
+    with open(path, "w") as file:
+        file.write("{")
+        for client in range(clients):
+            entries = []
+            for index in range(client * per_client, (client + 1) * per_client):
+                machine_sn, record = machine(seed, index)
+                kind = index % CHANGE_EVERY if quarter else None
+                if kind == 0:
+                    expected["removed"] += 1
+                    continue
+                if kind == 1:
+                    continue  # Written under the next client below
+                if kind == 2:
+                    record["Disk S/N"] = [{"serial": f"NEWDISK_{index}"}]
+                    expected["changed"] += 1
+                if kind == 3 and record.get("BIOS S/N"):
+                    machine_sn = f"REREAD-{index}"
+                    expected["changed"] += 1
+                if kind == 4:
+                    entries.append(machine(seed + 1, index))
+                    expected["added"] += 1
+                entries.append((machine_sn, record))
+            if quarter:
+                previous = (client - 1) % clients
+                for index in range(previous * per_client, (previous + 1) * per_client):
+                    if index % CHANGE_EVERY == 1:
+                        entries.append(machine(seed, index))
+                        expected["moved"] += 1
+            body = ", ".join(f"{json.dumps(machine_sn)}: {json.dumps(record)}" for machine_sn, record in entries)
+            file.write(f"{', ' if client else ''}{json.dumps(f'client{client:05d}')}: {{{body}}}")
+        file.write("}")
+    return expected
+
+
+def main(machines: int, clients: int, partitions: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        old_file, new_file, output = (os.path.join(tmp, name) for name in ("old.json", "new.json", "diff.jsonl"))
+        write_snapshot(old_file, machines, clients, 7, 0)
+        expected = write_snapshot(new_file, machines, clients, 7, 1)
+        print(f"snapshots: {os.path.getsize(old_file) / 2**20:.0f} MiB and {os.path.getsize(new_file) / 2**20:.0f} MiB")
+
+        # Run the diff in a child process so its peak resident size is measured on its own.
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshot_diff.py")
+        started = time.perf_counter()
+        subprocess.run([sys.executable, script, old_file, new_file, "--output", output, "--partitions", str(partitions)], check=True)
+        seconds = time.perf_counter() - started
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+        found = {}
+        with open(output) as file:
+            for line in file:
+                change = json.loads(line)["change"]
+                found[change] = found.get(change, 0) + 1
+        print(f"diff: {seconds:.1f} s, peak resident {peak / 2**20:.0f} MiB")
+        print(f"expected {expected}")
+        print(f"found    {found}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot diff time and peak memory on two synthetic snapshots.")
+    parser.add_argument("--machines", type=int, default=1_000_000)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--partitions", type=int, default=128)
+    args = parser.parse_args()
+    main(args.machines, args.clients, args.partitions)
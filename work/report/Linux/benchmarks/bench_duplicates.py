@@ -0,0 +1,86 @@
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory import rss_bytes
+
+KINDS = ("other client", "unknown sibling", "board swap")
+
+
+def inject_duplicates(data: dict, rate: float, seed: int = 5) -> list:
+    """
+    File a share of the machines a second time, cycling through KINDS: the same record under another
+    client, an "Unknown+N" sibling in the same client, or a new Machine and BIOS S/N with one disk swapped.
+    Returns [(kind, (client, machine_sn), (client, machine_sn))] for the injected pairs.
+    """
+    from synthetic_fleet import synthetic_machine
+
+    rng = random.Random(seed)
+    clients = list(data)
+    owners = [(client, machine_sn) for client in clients for machine_sn in data[client] if not machine_sn.startswith("Unknown")]
+    pairs = []
+    for number, (client, machine_sn) in enumerate(rng.sample(owners, int(len(owners) * rate))):
+        kind = KINDS[number % len(KINDS)]
+        record = copy.deepcopy(data[client][machine_sn])
+        if kind == "other client":
+            duplicate = (rng.choice([other for other in clients if other != client]), machine_sn)
+        elif kind == "unknown sibling":
+            duplicate = (client, f"Unknown+{1000 + number}")
+        else:
+            new_sn, donor = synthetic_machine(rng)
+            duplicate = (client, f"SWAP{number}")
+            record["BIOS S/N"] = donor["BIOS S/N"]
+            record["Disk S/N"][0] = donor["Disk S/N"][0]
+        data[duplicate[0]][duplicate[1]] = record
+        pairs.append((kind, (client, machine_sn), duplicate))
+    return pairs
+
+
+def main(sizes: list, rate: float):
+    from duplicate_clusters import DuplicateClusters
+    from synthetic_fleet import synthetic_fleet
+
+    for machines in sizes:
+        data = synthetic_fleet(machines)
+        pairs = inject_duplicates(data, rate)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_file = os.path.join(tmp, "client_system_info.json")
+            with open(json_file, "w") as file:
+                json.dump(data, file)
+            del data
+
+            before = rss_bytes()
+            started = time.perf_counter()
+            clusters = DuplicateClusters(json_file).scan()
+            plan = clusters.plan()
+            seconds = time.perf_counter() - started
+            growth = rss_bytes() - before
+
+        ids = {(clusters.clients[client], machine_sn): machine for machine, (client, machine_sn) in enumerate(clusters.machines)}
+        found, total = {kind: 0 for kind in KINDS}, {kind: 0 for kind in KINDS}
+        injected = set()
+        for kind, original, duplicate in pairs:
+            found[kind] += clusters.find(ids[original]) == clusters.find(ids[duplicate])
+            total[kind] += 1
+            injected.add(clusters.find(ids[original]))
+        unexpected = sum(clusters.find(ids[(entry["keep"]["client"], entry["keep"]["machine"])]) not in injected for entry in plan)
+        per_kind = ", ".join(f"{kind} {found[kind]}/{total[kind]}" for kind in KINDS)
+        print(
+            f"{len(clusters.machines):>9,} machines: {seconds:6.1f} s ({seconds / len(clusters.machines) * 1e6:.0f} µs/machine), "
+            f"resident growth {growth / 2**20:.0f} MiB, {len(plan)} clusters; found {per_kind}; {unexpected} unexpected clusters"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Duplicate-cluster scan time, memory and recall on synthetic fleets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 100_000, 200_000])
+    parser.add_argument("--rate", type=float, default=0.01, help="Share of machines filed a second time.")
+    args = parser.parse_args()
+    main(args.sizes, args.rate)
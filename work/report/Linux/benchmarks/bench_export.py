@@ -0,0 +1,49 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory import rss_bytes
+
+
+def synthetic_machines(machines: int, clients: int = 2000, seed: int = 42):
+    """Yield synthetic (client, machine_sn, record) tuples without building the fleet in memory."""
+    from synthetic_fleet import synthetic_machine
+
+    rng = random.Random(seed)
+    for index in range(machines):
+        machine_sn, record = synthetic_machine(rng)
+        yield f"client{index % clients:05d}", machine_sn, record
+
+
+def main(machines: int, formats: list):
+    from record_export import RecordExport
+
+    for export_format in formats:
+        path = os.path.join(tempfile.mkdtemp(), f"export.{export_format}")
+        before = peak = rss_bytes()
+
+        def progress(count):
+            nonlocal peak
+            peak = max(peak, rss_bytes())
+
+        started = time.perf_counter()
+        written = RecordExport.write_machines(synthetic_machines(machines), path, progress=progress, every=50_000)
+        seconds = time.perf_counter() - started
+        print(
+            f"{export_format:>4}: {written:,} rows in {seconds:6.1f} s, "
+            f"{os.path.getsize(path) / 2**20:7.1f} MiB file, resident growth {(peak - before) / 2**20:5.1f} MiB"
+        )
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming CSV/XLSX export time and memory.")
+    parser.add_argument("--machines", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "xlsx"])
+    args = parser.parse_args()
+    main(args.machines, args.formats)
@@ -0,0 +1,77 @@
+import argparse
+import copy
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def board_swap(record: dict, rng: random.Random, swaps: int) -> dict:
+    """Return the record as it comes back after a motherboard replacement plus `swaps` other component changes."""
+    from synthetic_fleet import synthetic_machine
+
+    _, donor = synthetic_machine(rng)
+    changed = copy.deepcopy(record)
+    changed["BIOS S/N"] = donor["BIOS S/N"]
+    for field in rng.sample(["Disk S/N", "RAM S/N", "NIC S/N", "CPU S/N"], swaps):
+        if isinstance(changed[field], list) and changed[field]:
+            changed[field][rng.randrange(len(changed[field]))] = donor[field][0]
+        else:
+            changed[field] = donor[field]
+    return changed
+
+
+def main(machines: int, lookups: int):
+    from machine_fingerprint import MIN_SIMILARITY, FingerprintIndex, similarity
+    from synthetic_fleet import synthetic_fleet, synthetic_machine
+
+    data = synthetic_fleet(machines)
+    started = time.perf_counter()
+    index = FingerprintIndex.build(data)
+    print(f"build: {machines:,} machines in {time.perf_counter() - started:.1f} s, {len(index.postings):,} band keys")
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "client_system_info.json")
+        buckets = FingerprintIndex.buckets_for(json_file)
+        buckets.write_all(index.postings)
+        size = sum(os.path.getsize(os.path.join(buckets.directory, name)) for name in os.listdir(buckets.directory))
+        print(f"buckets: {size / 2**20:.1f} MiB")
+
+    rng = random.Random(7)
+    owners = [(client, machine_sn) for client, machines_ in data.items() for machine_sn in machines_]
+
+    def likely(record):
+        found = []
+        for client, machine_sn in index.candidates(record):
+            score = similarity(record, data[client][machine_sn])
+            if score >= MIN_SIMILARITY:
+                found.append((client, machine_sn))
+        return found
+
+    for swaps in (0, 1, 2):
+        found, timings, candidates = 0, [], 0
+        for client, machine_sn in rng.sample(owners, lookups):
+            record = board_swap(data[client][machine_sn], rng, swaps)
+            started = time.perf_counter()
+            matches = likely(record)
+            timings.append(time.perf_counter() - started)
+            candidates += len(index.candidates(record))
+            found += (client, machine_sn) in matches
+        print(
+            f"board swap + {swaps} component(s): found {found}/{lookups}, "
+            f"median {statistics.median(timings) * 1000:.2f} ms, {candidates / lookups:.1f} candidates per lookup"
+        )
+
+    false_matches = sum(bool(likely(synthetic_machine(rng)[1])) for _ in range(lookups))
+    print(f"unrelated machines matched: {false_matches}/{lookups}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint (MinHash + LSH) recall, false matches and lookup time.")
+    parser.add_argument("--machines", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    main(args.machines, args.lookups)
@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory import rss_bytes
+from bench_view import synthetic_table
+
+
+def mistype(serial: str, rng: random.Random, edits: int) -> str:
+    """Misread a serial like a sticker: swap look-alikes, then drop or change a few characters."""
+    chars = list(serial.translate(str.maketrans("0O1I", "O0I1")))
+    for _ in range(edits):
+        position = rng.randrange(len(chars))
+        if rng.random() < 0.5:
+            del chars[position]
+        else:
+            chars[position] = rng.choice("ABCDEF0123456789")
+    return "".join(chars)
+
+
+def main(rows: int, lookups: int, edits: int):
+    from record_fuzzy import FuzzyIndex, MIN_FUZZY_LENGTH
+
+    table = synthetic_table(rows)
+    before = rss_bytes()
+    started = time.perf_counter()
+    index = FuzzyIndex(table)
+    print(
+        f"{rows} rows, {index.cells} serial cells indexed in {time.perf_counter() - started:.2f} s, "
+        f"resident growth {(rss_bytes() - before) / 2**20:.1f} MiB"
+    )
+
+    rng = random.Random(7)
+    timings, found = [], 0
+    while len(timings) < lookups:
+        row, column = rng.randrange(len(table)), rng.randrange(1, 11)
+        serials = [serial for serial, folded in index.cell_serials(row, column) if len(folded) >= 3 * MIN_FUZZY_LENGTH // 2]
+        if not serials:
+            continue
+        started = time.perf_counter()
+        closest = index.closest(mistype(serials[0], rng, edits))
+        timings.append(time.perf_counter() - started)
+        found += any(match[1] == row for match in closest)
+    timings.sort()
+    print(
+        f"{lookups} lookups with {edits} typo(s): median {timings[len(timings) // 2] * 1000:.1f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms, worst {timings[-1] * 1000:.1f} ms, "
+        f"intended machine found {found}/{lookups}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Typo-tolerant serial lookup latency.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--edits", type=int, default=1)
+    args = parser.parse_args()
+    main(args.rows, args.lookups, args.edits)
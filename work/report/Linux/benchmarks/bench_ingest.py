@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_fleet import synthetic_fleet, synthetic_machine
+
+
+def snapshot(rng: random.Random) -> dict:
+    """A HardwareInfo-shaped snapshot, as a collector would send it."""
+    machine_sn, record = synthetic_machine(rng)
+    return {"Machine S/N": machine_sn, **record}
+
+
+async def request(reader, writer, host: str, method: str, path: str, payload=None) -> dict:
+    """Send one keep-alive HTTP request and return the decoded JSON response."""
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = await reader.readline()
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    response = json.loads(await reader.readexactly(length))
+    if b" 200 " not in status:
+        raise RuntimeError(f"{status.decode().strip()}: {response}")
+    return response
+
+
+async def client(host: str, port: int, submissions: list, per_request: int, latencies: list, statuses: dict):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for start in range(0, len(submissions), per_request):
+            chunk = submissions[start:start + per_request]
+            started = time.perf_counter()
+            response = await request(reader, writer, host, "POST", "/machines", {"submissions": chunk})
+            latencies.append(time.perf_counter() - started)
+            for result in response["results"]:
+                statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    finally:
+        writer.close()
+
+
+async def load(host: str, port: int, total: int, connections: int, per_request: int, clients: int):
+    rng = random.Random(11)
+    submissions = [{"client": f"ingest{rng.randrange(clients):04d}", "snapshot": snapshot(rng)} for _ in range(total)]
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, submissions[n::connections], per_request, latencies, statuses) for n in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(host, port)
+    health = await request(reader, writer, host, "GET", "/health")
+    writer.close()
+    latencies.sort()
+    print(
+        f"{total} submissions over {connections} connections ({per_request} per request): "
+        f"{total / elapsed:,.0f} submissions/s, request latency p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms"
+    )
+    print(f"results {statuses}; server: {health}")
+
+
+def start_local_server(json_file: str, max_batch: int) -> int:
+    """Run an IngestService on a free localhost port in a background thread and return the port."""
+    from ingest_server import IngestService
+
+    ready = threading.Event()
+    port = []
+
+    def started(bound):
+        port.append(bound)
+        ready.set()
+
+    threading.Thread(
+        target=lambda: asyncio.run(IngestService(json_file, max_batch).serve("127.0.0.1", 0, started)), daemon=True
+    ).start()
+    ready.wait()
+    return port[0]
+
+
+def main(args):
+    host, port = args.host, args.port
+    with tempfile.TemporaryDirectory() as tmp:
+        if port is None:
+            json_file = os.path.join(tmp, "client_system_info.json")
+            with open(json_file, "w") as file:
+                json.dump(synthetic_fleet(args.preload) if args.preload else {}, file, indent=4)
+            if args.sharded:
+                from shard_store import ShardedStore
+
+                ShardedStore.create(json_file)
+            host, port = "127.0.0.1", start_local_server(json_file, args.max_batch)
+            print(f"local server on port {port}, store preloaded with {args.preload} machines{' (sharded)' if args.sharded else ''}")
+        asyncio.run(load(host, port, args.submissions, args.connections, args.per_request, args.clients))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the ingestion service with concurrent collector submissions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="Existing server; by default one is started on a temporary store.")
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--per-request", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--preload", type=int, default=10_000)
+    parser.add_argument("--sharded", action="store_true")
+    parser.add_argument("--max-batch", type=int, default=1000, help="Local server only; 1 writes every submission on its own.")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,49 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_stream import JsonStreamReader
+from synthetic_fleet import synthetic_fleet
+
+
+def measure(label: str, func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:7.2f} s  peak {peak / 2**20:8.1f} MiB")
+    return result
+
+
+def main(machines: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "client_system_info.json")
+        data = synthetic_fleet(machines)
+        with open(json_file, "w") as file:
+            json.dump(data, file, indent=4)
+        client = max(data, key=lambda name: len(data[name]))
+        del data
+        print(f"{machines} machines, {os.path.getsize(json_file) / 2**20:.1f} MiB on disk")
+
+        def full_load():
+            with open(json_file, "r") as file:
+                return json.load(file)
+
+        measure("json.load (full store)", full_load)
+        measure("client_names", lambda: JsonStreamReader.client_names(json_file))
+        measure(f"client_machines ({client})", lambda: JsonStreamReader.client_machines(json_file, client))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full JSON loads with the streaming reader.")
+    parser.add_argument("--machines", type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.machines)
@@ -0,0 +1,60 @@
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def rss_bytes() -> int:
+    """Return the resident set size of this process."""
+    with open("/proc/self/statm", "r") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def measure(mode: str, json_file: str):
+    """Load the store in one representation and print the resident-size growth (child process)."""
+    from json_stream import JsonStreamReader
+    from record_table import RecordTable
+
+    gc.collect()
+    before = rss_bytes()
+    if mode == "dict":
+        with open(json_file, "r") as file:
+            loaded = json.load(file)
+    else:
+        with open(json_file, "rb") as file:
+            loaded = RecordTable.from_machines(JsonStreamReader.iter_machines(file))
+    gc.collect()
+    print((rss_bytes() - before) / 2**20)
+    del loaded
+
+
+def main(machines: int):
+    from synthetic_fleet import synthetic_fleet
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "client_system_info.json")
+        with open(json_file, "w") as file:
+            json.dump(synthetic_fleet(machines), file, indent=4)
+        print(f"{machines} machines, {os.path.getsize(json_file) / 2**20:.1f} MiB on disk")
+        results = {}
+        for mode in ("dict", "table"):
+            output = subprocess.check_output([sys.executable, __file__, "--measure", mode, json_file])
+            results[mode] = float(output.decode().strip())
+            print(f"{mode:<6} resident growth: {results[mode]:8.1f} MiB")
+        print(f"reduction: {100 * (1 - results['table'] / results['dict']):.0f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident memory of dict records vs RecordTable.")
+    parser.add_argument("--machines", type=int, default=100_000)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "JSON_FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(*args.measure)
+    else:
+        main(args.machines)
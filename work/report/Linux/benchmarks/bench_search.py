@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_view import synthetic_table
+
+
+def keystrokes(query: str) -> list:
+    """Every prefix of a query, as the search bar sees it while typing."""
+    return [query[:length] for length in range(1, len(query) + 1)]
+
+
+def naive_filter(table, text: str) -> list:
+    """The pre-index ViewReport.filter_data: join and lowercase every row on every keystroke."""
+    from record_table import COLUMNS
+
+    words = text.strip().lower().split()
+    rows = []
+    for row in range(len(table)):
+        row_text = " ".join(table.display(row, column).lower() for column in range(len(COLUMNS)))
+        if all(word in row_text for word in words):
+            rows.append(row)
+    return rows
+
+
+def main(rows: int, queries: list, naive: bool):
+    from record_search import SearchIndex
+
+    table = synthetic_table(rows)
+    started = time.perf_counter()
+    index = SearchIndex(table)
+    print(f"{rows} rows, haystack and trigram build {time.perf_counter() - started:.2f} s")
+
+    model = None
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt6.QtCore import QCoreApplication
+        from record_model import RecordTableModel
+
+        app = QCoreApplication([])  # noqa: F841 - models need an application instance
+        model = RecordTableModel(table)
+        model.sort(1)
+    except ImportError:
+        print("PyQt6 not available: measuring search only")
+
+    for query in queries:
+        worst_search = worst_apply = 0.0
+        for text in keystrokes(query):
+            started = time.perf_counter()
+            hits = index.search(text)
+            searched = time.perf_counter()
+            if model is not None:
+                model.set_visible_rows(hits)
+            worst_search = max(worst_search, searched - started)
+            worst_apply = max(worst_apply, time.perf_counter() - searched)
+        count = len(table) if hits is None else len(hits)
+        line = f"{query!r:>24}: {count:>7} hits, worst keystroke search {worst_search * 1000:7.1f} ms, apply {worst_apply * 1000:6.1f} ms"
+
+        # A pasted query has no previous hits to refine: trigram index vs scanning every haystack.
+        index.search("")
+        started = time.perf_counter()
+        index.search(query)
+        pasted = time.perf_counter() - started
+        started = time.perf_counter()
+        scanned = None
+        for word in sorted(set(query.lower().split()), key=len, reverse=True):
+            scanned = index._match(word, scanned)
+        line += f", paste {pasted * 1000:6.1f} ms (scan {(time.perf_counter() - started) * 1000:6.1f} ms)"
+        if naive:
+            started = time.perf_counter()
+            naive_filter(table, query)
+            line += f", naive {(time.perf_counter() - started) * 1000:8.1f} ms per keystroke"
+        print(line)
+        index.search("")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-keystroke search latency of SearchIndex vs the naive filter.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", nargs="+", default=["client00042", "samsung 16gb", "wd-wx", "zzzz"])
+    parser.add_argument("--naive", action="store_true", help="Also time the pre-index full scan.")
+    args = parser.parse_args()
+    main(args.rows, args.queries, args.naive)
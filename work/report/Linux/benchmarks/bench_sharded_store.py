@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_handle import DataHandle
+from shard_store import ShardedStore
+from synthetic_fleet import synthetic_fleet, synthetic_machine
+
+
+def save_small_client(json_file: str, client: str, rng_seed: int) -> float:
+    """Add one machine to a client the way AddReport does and return the elapsed time."""
+    import random
+    machine_sn, record = synthetic_machine(random.Random(rng_seed))
+    started = time.perf_counter()
+    result = DataHandle.save_client_data(json_file, client, {machine_sn: record})
+    assert result == "Ok", result
+    return time.perf_counter() - started
+
+
+def main(machines: int, writers: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        data = synthetic_fleet(machines)
+        single = os.path.join(tmp, "single", "client_system_info.json")
+        sharded = os.path.join(tmp, "sharded", "client_system_info.json")
+        for path in (single, sharded):
+            os.makedirs(os.path.dirname(path))
+            with open(path, "w") as file:
+                json.dump(data, file, indent=4)
+        del data
+        ShardedStore.create(sharded)
+        DataHandle.locate_component(sharded, "warm-up")  # builds the bucketed component index
+        DataHandle.locate_component(single, "warm-up")
+
+        print(f"{machines} machines")
+        print(f"single-file save:  {save_small_client(single, 'small-client', 1):.3f} s")
+        print(f"sharded save:      {save_small_client(sharded, 'small-client', 1):.3f} s")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(writers) as pool:
+            list(pool.map(lambda n: save_small_client(sharded, f"parallel-{n}", 100 + n), range(writers)))
+        elapsed = time.perf_counter() - started
+        names = ShardedStore.client_names(ShardedStore.shard_dir(sharded))
+        landed = sum(1 for n in range(writers) if f"parallel-{n}" in names)
+        print(f"{writers} parallel sharded saves: {elapsed:.3f} s, {landed}/{writers} clients in the manifest")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare single-file and sharded saves.")
+    parser.add_argument("--machines", type=int, default=50_000)
+    parser.add_argument("--writers", type=int, default=8)
+    args = parser.parse_args()
+    main(args.machines, args.writers)
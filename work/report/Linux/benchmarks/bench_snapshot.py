@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run in a child process per reader, so resident memory starts from a clean interpreter.
+_READER = """
+import sys, time
+sys.path[:0] = [{path!r}, {benchmarks!r}]
+from bench_memory import rss_bytes
+from data_handle import DataHandle
+from inventory_snapshot import InventorySnapshot
+from record_table import RecordTable
+
+before = rss_bytes()
+started = time.perf_counter()
+if {mapped!r}:
+    table = InventorySnapshot.open({json_file!r}).table
+else:
+    table = RecordTable()
+    for _ in DataHandle.stream_records({json_file!r}, table):
+        pass
+    table.freeze()
+ready = time.perf_counter() - started
+cells = sum(len(table.display(row, 1)) for row in range(0, len(table), 101))
+shared = private = 0
+with open("/proc/self/smaps_rollup") as file:
+    for line in file:
+        if line.startswith(("Shared_Clean", "Shared_Dirty")):
+            shared += int(line.split()[1]) * 1024
+        elif line.startswith(("Private_Clean", "Private_Dirty")):
+            private += int(line.split()[1]) * 1024
+print(len(table), ready, rss_bytes() - before, shared, private)
+"""
+
+
+def read(json_file: str, mapped: bool) -> tuple:
+    """
+    Open the store in a fresh process; returns (rows, seconds, resident growth, and the process's
+    shared and private resident bytes, from /proc/self/smaps_rollup).
+    """
+    script = _READER.format(
+        path=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        benchmarks=os.path.dirname(os.path.abspath(__file__)),
+        json_file=json_file,
+        mapped=mapped,
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, QT_QPA_PLATFORM="offscreen")).stdout.split()
+    rows, seconds, growth, shared, private = output
+    return int(rows), float(seconds), int(growth), int(shared), int(private)
+
+
+def main(sizes: list):
+    from inventory_snapshot import InventorySnapshot
+    from record_sync import RecordSync
+    from record_table import RecordTable
+    from synthetic_fleet import synthetic_fleet
+
+    for machines in sizes:
+        data = synthetic_fleet(machines)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_file = os.path.join(tmp, "client_system_info.json")
+            started = time.perf_counter()
+            with open(json_file, "w") as file:
+                json.dump(data, file, indent=4)
+            write_seconds = time.perf_counter() - started
+            stamps = RecordSync.store_stamps(json_file)
+
+            started = time.perf_counter()
+            InventorySnapshot.publish(json_file, RecordTable.from_data(data), stamps)
+            publish_seconds = time.perf_counter() - started
+            del data
+
+            print(
+                f"{machines:>9,} machines: JSON {os.path.getsize(json_file) / 2**20:.0f} MiB written in {write_seconds:.1f} s; "
+                f"snapshot {os.path.getsize(InventorySnapshot.snapshot_path(json_file)) / 2**20:.0f} MiB published in {publish_seconds:.1f} s"
+            )
+            for label, mapped in (("stream JSON", False), ("open snapshot", True)):
+                rows, seconds, growth, shared, private = read(json_file, mapped)
+                print(
+                    f"    {label:>13}: {rows:,} rows ready in {seconds * 1000:8.1f} ms, resident growth {growth / 2**20:6.1f} MiB "
+                    f"({shared / 2**20:.0f} MiB shared, {private / 2**20:.0f} MiB private)"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Viewer load time and memory: streaming the JSON store vs opening its snapshot.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 500_000])
+    args = parser.parse_args()
+    main(args.sizes)
@@ -0,0 +1,80 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory import rss_bytes
+
+
+def synthetic_table(rows: int):
+    """Build a RecordTable of synthetic machines without materializing the whole fleet dict."""
+    from record_table import RecordTable
+    from synthetic_fleet import synthetic_machine
+
+    rng = random.Random(42)
+    table = RecordTable()
+    for row in range(rows):
+        machine_sn, record = synthetic_machine(rng)
+        table.append(f"client{row % 2000:05d}", machine_sn, record)
+    table.freeze()
+    return table
+
+
+def measure(mode: str, rows: int):
+    """Fill one kind of view with the synthetic table and print seconds and resident growth (child process)."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication, QTableView, QTableWidget, QTableWidgetItem
+    from record_model import RecordTableModel
+    from record_table import COLUMNS
+
+    app = QApplication([])
+    table = synthetic_table(rows)
+    before = rss_bytes()
+    started = time.perf_counter()
+    if mode == "widget":
+        # The pre-model ViewReport.load_data: insertRow and 11 items per machine, sorting enabled.
+        view = QTableWidget()
+        view.setColumnCount(len(COLUMNS))
+        view.setHorizontalHeaderLabels(list(COLUMNS))
+        view.setSortingEnabled(True)
+        for row in range(len(table)):
+            view.insertRow(row)
+            for column in range(len(COLUMNS)):
+                view.setItem(row, column, QTableWidgetItem(table.display(row, column)))
+    else:
+        view = QTableView()
+        model = RecordTableModel()
+        view.setModel(model)
+        view.setSortingEnabled(True)
+        model.set_records(table)
+    view.resize(1200, 800)
+    view.show()
+    app.processEvents()
+    print(time.perf_counter() - started, (rss_bytes() - before) / 2**20)
+
+
+def main(sizes: list, widget_max: int):
+    for rows in sizes:
+        for mode in ("widget", "model"):
+            if mode == "widget" and rows > widget_max:
+                print(f"{rows:>9} rows  {mode:<6}  skipped (above --widget-max)")
+                continue
+            output = subprocess.check_output([sys.executable, __file__, "--measure", mode, str(rows)])
+            seconds, mib = (float(value) for value in output.decode().split())
+            print(f"{rows:>9} rows  {mode:<6}  {seconds:8.2f} s  {mib:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QTableWidget vs RecordTableModel load time and memory.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--widget-max", type=int, default=100_000, help="Largest size to run the widget for.")
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure[0], int(args.measure[1]))
+    else:
+        main(args.sizes, args.widget_max)
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from warranty import DellAdapter, LenovoAdapter, RateLimiter, WarrantyLookup
+
+
+class VendorStandIn(ThreadingHTTPServer):
+    """
+    Local stand-in for the Dell and Lenovo warranty APIs, answering in their response shapes.
+    Every serial gets a fixed end date derived from its CRC (one in ten is unknown to the vendor).
+    Each request waits `latency` seconds, and requests beyond the vendor's rate get a 429.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.latency = latency
+        self.limits = {vendor: RateLimiter(adapter.rate * 1.1, adapter.concurrency) for vendor, adapter in
+                       (("dell", DellAdapter), ("lenovo", LenovoAdapter))}
+        self.lock = threading.Lock()
+        self.requests = {"dell": 0, "lenovo": 0, "throttled": 0}
+
+    @staticmethod
+    def end_date(serial: str):
+        code = zlib.crc32(serial.encode())
+        if code % 10 == 0:
+            return None
+        return f"{2022 + code % 6}-{1 + code % 12:02d}-28T23:59:59Z"
+
+    def allowed(self, vendor: str) -> bool:
+        """Take a token without waiting; False means the caller exceeded the vendor's rate."""
+        limit = self.limits[vendor]
+        with limit.lock:
+            now = limit.clock()
+            limit.tokens = min(limit.burst, limit.tokens + (now - limit.updated) * limit.rate)
+            limit.updated = now
+            if limit.tokens < 1:
+                return False
+            limit.tokens -= 1
+            return True
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        server = self.server
+        if url.path.endswith("/asset-entitlements"):
+            vendor, serials = "dell", query.get("servicetags", [""])[0].split(",")
+        elif url.path.endswith("/warranty"):
+            vendor, serials = "lenovo", query.get("Serial", [""])[0].split(",")
+        else:
+            self.send_error(404)
+            return
+        if not server.allowed(vendor):
+            with server.lock:
+                server.requests["throttled"] += 1
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with server.lock:
+            server.requests[vendor] += 1
+        time.sleep(server.latency)
+
+        answer = []
+        for serial in serials:
+            end = server.end_date(serial)
+            if vendor == "dell":
+                answer.append({"serviceTag": serial, "invalid": end is None, "productLineDescription": "LATITUDE 5420",
+                               "entitlements": [{"endDate": end}] if end else []})
+            else:
+                answer.append({"Serial": serial, "Product": "20XW-ThinkPad X1", "Warranty": [{"End": end}] if end else []})
+        body = json.dumps(answer).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stand_in(latency: float) -> VendorStandIn:
+    server = VendorStandIn(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fleet_serials(machines: int, seed: int = 3) -> list:
+    """Half Dell service tags with their system vendor (a 7-character tag alone is ambiguous), half Lenovo serials."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits
+    serials = []
+    for index in range(machines):
+        if index % 2:
+            serials.append(("".join(rng.choice(alphabet) for _ in range(7)), "Dell Inc."))
+        else:
+            serials.append(rng.choice(["PF", "R9", "MJ"]) + "".join(rng.choice(alphabet) for _ in range(6)))
+    return serials
+
+
+def adapters_for(server: VendorStandIn, one_by_one: bool = False) -> list:
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    adapters = [DellAdapter(f"{base}/dell", "key"), LenovoAdapter(f"{base}/lenovo", "key")]
+    if one_by_one:
+        for adapter in adapters:
+            adapter.batch_size, adapter.concurrency = 1, 1
+    return adapters
+
+
+def main(machines: int, latency: float, naive_machines: int):
+    server = start_stand_in(latency)
+    serials = fleet_serials(machines)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "client_system_info.json")
+
+        started = time.perf_counter()
+        WarrantyLookup(json_file, adapters_for(server, one_by_one=True)).lookup(serials[:naive_machines], refresh=True)
+        per_serial = (time.perf_counter() - started) / naive_machines
+        print(f"one serial per request: {per_serial * 1000:.0f} ms per serial, about {per_serial * machines:.0f} s for {machines:,}")
+
+        server.requests.update(dell=0, lenovo=0, throttled=0)
+        started = time.perf_counter()
+        results = WarrantyLookup(json_file, adapters_for(server)).lookup(serials, refresh=True)
+        seconds = time.perf_counter() - started
+        statuses = {}
+        for result in results.values():
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+        print(f"batched + concurrent: {machines:,} serials in {seconds:.1f} s with {server.requests}")
+        print(f"statuses: {statuses}")
+
+        started = time.perf_counter()
+        WarrantyLookup(json_file, adapters_for(server)).lookup(serials)
+        print(f"cached: {machines:,} serials in {(time.perf_counter() - started) * 1000:.0f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warranty lookups against a local stand-in vendor server.")
+    parser.add_argument("--machines", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds the stand-in takes per request.")
+    parser.add_argument("--naive-machines", type=int, default=100)
+    args = parser.parse_args()
+    main(args.machines, args.latency, args.naive_machines)
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import random
+import string
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DISK_MODELS = ["SAMSUNG_MZNLN512HAJQ-00007", "SanDisk_X400_M.2_2280_512GB", "WDC_PC_SN530_SDBPNPZ-512G-1006", "KINGSTON_SA400S37240G"]
+GPU_PREFIXES = ["GPU-", ""]
+PLACEHOLDERS = ["Unknown", "N/A", "Unknown", "Default string", "To be filled by O.E.M."]
+
+
+def _serial(rng, length, alphabet=string.ascii_uppercase + string.digits):
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def _mac(rng):
+    return ":".join(f"{rng.randrange(256):02x}" for _ in range(6))
+
+
+def synthetic_machine(rng):
+    """Return one (machine_sn, record) pair shaped like an AddReport submission."""
+    machine_sn = _serial(rng, 15, string.digits) if rng.random() > 0.05 else f"Unknown+{rng.randrange(1, 50)}"
+    record = {
+        "Disk S/N": [{"serial": f"{rng.choice(DISK_MODELS)}_{_serial(rng, 14)}"} for _ in range(rng.randint(1, 3))],
+        "RAM S/N": [{"serial": _serial(rng, 8, "0123456789ABCDEF")} for _ in range(rng.choice([1, 2, 2, 4]))],
+        "Battery S/N": _serial(rng, 5, string.digits) if rng.random() > 0.6 else "Unknown",
+        "CPU S/N": _serial(rng, 16, "0123456789ABCDEF"),
+        "BIOS S/N": f"{_serial(rng, 8, '0123456789abcdef')}-{_serial(rng, 4, '0123456789abcdef')}-{_serial(rng, 4, '0123456789abcdef')}",
+        "GPU S/N": rng.choice(GPU_PREFIXES) + _serial(rng, 12, "0123456789abcdef") if rng.random() > 0.3 else "Unknown",
+        "NIC S/N": [{"serial": _mac(rng), "slot": f"enp{i}s0"} for i in range(rng.randint(1, 2))],
+        "Power S/N": rng.choice(PLACEHOLDERS),
+        "Display S/N": [{"serial": _serial(rng, 10)}] if rng.random() > 0.4 else [],
+    }
+    return machine_sn, record
+
+
+def synthetic_fleet(machines: int, clients: int = None, seed: int = 42) -> dict:
+    """Build a store dictionary with the given number of machines spread over clients."""
+    rng = random.Random(seed)
+    clients = clients or max(1, machines // 50)
+    names = [f"client{n:05d}" for n in range(clients)]
+    data = {name: {} for name in names}
+    for _ in range(machines):
+        client = names[min(int(rng.paretovariate(1.2)) - 1, clients - 1)] if rng.random() < 0.3 else rng.choice(names)
+        machine_sn, record = synthetic_machine(rng)
+        data[client][machine_sn] = record
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic client_system_info.json fleet.")
+    parser.add_argument("machines", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--clients", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    with open(args.output, "w") as file:
+        json.dump(synthetic_fleet(args.machines, args.clients, args.seed), file, indent=4)
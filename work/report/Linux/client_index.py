@@ -0,0 +1,173 @@
+import heapq
+import json
+import os
+from bisect import bisect_left
+
+from json_stream import JsonStreamReader
+from shard_store import ShardedStore, atomic_write_json
+
+# Length of the grams indexed for substring matches; shorter text only completes prefixes.
+GRAM = 3
+
+
+class ClientIndex:
+    """
+    Sorted client names of a store, for completing the client field of AddReport.
+
+    The names are kept in a sidecar next to the store, and the store's (mtime_ns, size)
+    in a stamp file beside it, so opening the window reads two small files instead of
+    scanning the store, and a save that adds no client only rewrites the stamp; a
+    sharded store's manifest already lists its clients and is used as is.
+    complete() ranks names starting with the text before names merely containing it:
+    prefixes come from bisecting the sorted keys, substrings from intersecting the
+    names holding each trigram of the text, so a keystroke on the GUI thread only
+    looks at the names that can match. Both stop after `limit` names.
+    """
+
+    version = 2
+
+    def __init__(self, names, stamp: list = None):
+        self.stamp = stamp  # The store stat the names were read at (see store_stat)
+        self.names = sorted(set(names), key=str.casefold)
+        self.keys = [name.casefold() for name in self.names]
+        self._grams = None  # trigram -> set of names, built on the first substring query
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def index_path(json_file: str) -> str:
+        """Return the sidecar path of the client index for a store file."""
+        return os.path.splitext(json_file)[0] + ".clients.json"
+
+    @staticmethod
+    def stamp_path(json_file: str) -> str:
+        """Return the path of the store stat the client index was last written for."""
+        return os.path.splitext(json_file)[0] + ".clients.stamp"
+
+    def add(self, name: str):
+        """Add a client name (e.g. one just typed into AddReport) in sorted position."""
+        key = name.casefold()
+        position = bisect_left(self.keys, key)
+        if position < len(self.names) and self.names[position] == name:
+            return
+        self.names.insert(position, name)
+        self.keys.insert(position, key)
+        if self._grams is not None:
+            self._index_name(name, key)
+
+    @staticmethod
+    def grams(key: str) -> set:
+        return {key[start:start + GRAM] for start in range(len(key) - GRAM + 1)}
+
+    def _index_name(self, name: str, key: str):
+        for gram in self.grams(key):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def complete(self, text: str, limit: int = 20) -> list:
+        """
+        Return up to limit client names for typed text: names starting with it first, then
+        names containing it (for text of GRAM characters or more).
+        """
+        key = text.strip().casefold()
+        if not key:
+            return self.names[:limit]
+        matches = []
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and len(matches) < limit and self.keys[position].startswith(key):
+            matches.append(self.names[position])
+            position += 1
+
+        if len(matches) >= limit or len(key) < GRAM:
+            return matches
+
+        if self._grams is None:
+            self._grams = {}
+            for name, name_key in zip(self.names, self.keys):
+                self._index_name(name, name_key)
+        postings = sorted((self._grams.get(gram, set()) for gram in self.grams(key)), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        contained = (
+            name for name in candidates
+            # Names starting with the text are already listed
+            if key in (name_key := name.casefold()) and not name_key.startswith(key)
+        )
+        return matches + heapq.nsmallest(limit - len(matches), contained, key=str.casefold)
+
+    @classmethod
+    def read(cls, json_file: str):
+        """Read the sidecar index; returns None if it is missing or unreadable."""
+        try:
+            with open(cls.index_path(json_file), "r") as file:
+                raw = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if raw.get("version") != cls.version:
+            return None
+        return cls(raw["clients"], cls.read_stamp(json_file))
+
+    @classmethod
+    def read_stamp(cls, json_file: str):
+        try:
+            with open(cls.stamp_path(json_file), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def write(self, json_file: str):
+        """Atomically write the sidecar index for a store file, then its stamp."""
+        atomic_write_json(self.index_path(json_file), {"version": self.version, "clients": self.names})
+        atomic_write_json(self.stamp_path(json_file), self.stamp)
+
+    @staticmethod
+    def store_stat(json_file: str):
+        """Return the (mtime_ns, size) pair used to detect a store changed behind the index."""
+        try:
+            stat = os.stat(json_file)
+            return [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, json_file: str) -> "ClientIndex":
+        """
+        Load the client names of a store, rebuilding the sidecar when it is missing or
+        the store was modified without going through DataHandle.
+        """
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            return cls(ShardedStore.client_names(shard_dir))
+
+        index = cls.read(json_file)
+        stat = cls.store_stat(json_file)
+        if index is not None and index.stamp == stat:
+            return index
+        try:
+            # Only the top-level keys are kept; machine records are skipped client by client.
+            names = JsonStreamReader.client_names(json_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            names = []
+        index = cls(names, stat)
+        if stat is not None:
+            index.write(json_file)
+        return index
+
+    @classmethod
+    def update(cls, json_file: str, data: dict, previous: dict, stat_before: list):
+        """
+        Bring the sidecar up to date after DataHandle wrote a single-file store holding data.
+        - previous: {(client, machine_sn): record before the write, or None if it is new}.
+        - stat_before: the store stat before the write, to detect a stale sidecar.
+        The names are only rewritten when the write may have added a client: one whose
+        machines are all new. Otherwise only the stamp moves to the written store.
+        """
+        stat = cls.store_stat(json_file)
+        touched = {client for client, _ in previous}
+        added = any(
+            all(previous.get((client, machine_sn), False) is None for machine_sn in data.get(client, {}))
+            for client in touched
+        )
+        if added or cls.read_stamp(json_file) != stat_before:
+            cls(data, stat).write(json_file)
+        else:
+            atomic_write_json(cls.stamp_path(json_file), stat)
@@ -0,0 +1,174 @@
+import argparse
+import hashlib
+import http.client
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+
+from hardware_info import HardwareInfo
+from serials import is_numbered, is_placeholder
+from shard_store import atomic_write_json
+
+STATE_FILE = "collector_state.json"
+INTERVAL = 6 * 3600  # Seconds between collections
+INTERVAL_JITTER = 0.1  # Each wait varies by up to ±10%, so a fleet booted together does not report together
+RETRIES = 6
+BACKOFF_BASE = 1.0  # Seconds; the retry delay cap doubles per attempt from here
+BACKOFF_MAX = 300.0
+# Statuses meaning the receiver stored the submission (see DataHandle.save_batch).
+STORED = {"Ok", "Merged", "Add New", "Updated"}
+
+
+def canonical(snapshot: dict) -> dict:
+    """Return the snapshot as plain JSON values, so equal snapshots always serialize and hash the same."""
+    return json.loads(json.dumps(snapshot))
+
+
+def digest(value) -> str:
+    """Return the SHA-256 of a value's canonical JSON form (sorted keys, no whitespace)."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def backoff_delay(attempt: int, rng=random) -> float:
+    """Full-jitter backoff: a random delay up to BACKOFF_BASE * 2**attempt, capped at BACKOFF_MAX."""
+    return rng.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class UploadError(Exception):
+    """The receiver could not be reached or kept failing after every retry."""
+
+
+class CollectorAgent:
+    """
+    Re-collects this machine's serials on a schedule and reports only what changed.
+
+    Every collection is hashed in canonical form (and each field on its own). When the
+    hash equals the last one the receiver acknowledged, nothing is sent; otherwise only
+    Machine S/N and the changed fields go out as a delta, which the receiver applies
+    over the stored record (see DataHandle.save_batch). The first report, a new Machine
+    S/N or client, a placeholder Machine S/N ("Unknown", shared by unrelated machines) or
+    a receiver answering "Missing" get the full snapshot instead.
+    The acknowledged hashes are kept in a small state file, written only after the
+    receiver stored the report, so a lost upload is simply resent next time.
+    Uploads that fail to connect or get a 5xx are retried with jittered backoff.
+    """
+
+    def __init__(self, url: str, client: str, state_file: str = STATE_FILE, collect=None, sleep=time.sleep, rng=None):
+        self.url = url
+        self.client = client
+        self.state_file = state_file
+        self.collect = collect or self.collect_hardware
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.stats = {"collections": 0, "unchanged": 0, "full": 0, "delta": 0, "retries": 0, "bytes_sent": 0}
+
+    @staticmethod
+    def collect_hardware() -> dict:
+        """Probe every field HardwareInfo knows about."""
+        return {field: HardwareInfo.probe(field) for field in HardwareInfo.PROBES}
+
+    def load_state(self) -> dict:
+        try:
+            with open(self.state_file, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, state: dict):
+        """Atomically replace the state file."""
+        atomic_write_json(self.state_file, state)
+
+    def submission(self, snapshot: dict, state: dict):
+        """Return the submission to send for a snapshot (None when unchanged) and the state to keep once stored."""
+        fields = {field: digest(value) for field, value in snapshot.items()}
+        new_state = {"client": self.client, "machine_sn": snapshot.get("Machine S/N"), "hash": digest(fields), "fields": fields}
+        if state.get("hash") == new_state["hash"] and state.get("client") == self.client:
+            return None, new_state
+        machine_sn = new_state["machine_sn"]
+        # A placeholder S/N names no machine by itself: the receiver has to match the full snapshot.
+        keyed = not (is_placeholder(machine_sn) or is_numbered(machine_sn))
+        if keyed and state.get("client") == self.client and state.get("machine_sn") == machine_sn:
+            old = state.get("fields", {})
+            changed = {field: value for field, value in snapshot.items() if old.get(field) != fields[field]}
+            changed["Machine S/N"] = snapshot["Machine S/N"]
+            return {"client": self.client, "snapshot": changed, "delta": True}, new_state
+        return {"client": self.client, "snapshot": snapshot}, new_state
+
+    def post(self, submission: dict) -> dict:
+        """
+        POST one submission, retrying connection failures, 5xx answers and answers that are not
+        a {"results": [{...}]} object with jittered backoff.
+        """
+        data = json.dumps(submission).encode()
+        for attempt in range(RETRIES + 1):
+            request = urllib.request.Request(self.url, data=data, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    self.stats["bytes_sent"] += len(data)
+                    body = response.read()
+                result = json.loads(body)["results"][0]
+                if not isinstance(result, dict):
+                    raise TypeError("result is not an object")
+                if result.get("status") != "Error":
+                    return result
+                error = result.get("error", "receiver error")
+            except urllib.error.HTTPError as http_error:
+                if http_error.code < 500:
+                    raise UploadError(f"receiver rejected the upload: HTTP {http_error.code}")
+                error = f"HTTP {http_error.code}"
+            except (urllib.error.URLError, OSError, http.client.HTTPException) as connection_error:
+                error = str(connection_error) or type(connection_error).__name__
+            except (ValueError, KeyError, IndexError, TypeError) as answer_error:
+                # A receiver mid-restart or a proxy may answer 200 with something else entirely.
+                error = f"unreadable answer: {answer_error!r}"
+            if attempt == RETRIES:
+                raise UploadError(f"giving up after {RETRIES + 1} attempts: {error}")
+            self.stats["retries"] += 1
+            self.sleep(backoff_delay(attempt, self.rng))
+
+    def run_once(self) -> str:
+        """Collect, then send the full snapshot or a delta if anything changed. Returns the outcome."""
+        snapshot = canonical(self.collect())
+        self.stats["collections"] += 1
+        state = self.load_state()
+        submission, new_state = self.submission(snapshot, state)
+        if submission is None:
+            self.stats["unchanged"] += 1
+            return "Unchanged"
+
+        result = self.post(submission)
+        if result.get("status") == "Missing":
+            # The receiver lost the machine (or never had it): fall back to the full snapshot.
+            submission = {"client": self.client, "snapshot": snapshot}
+            result = self.post(submission)
+        status = result.get("status")
+        if status in STORED:
+            self.stats["delta" if submission.get("delta") else "full"] += 1
+            self.save_state(new_state)
+        return status
+
+    def run(self, iterations: int = None, interval: float = INTERVAL):
+        """Collect every interval (with jitter) until stopped, or for a number of iterations."""
+        count = 0
+        while iterations is None or count < iterations:
+            try:
+                status = self.run_once()
+                print(f"{'✅' if status in STORED or status == 'Unchanged' else '⚠'} {status}")
+            except UploadError as error:
+                print(f"⚠ {error}")
+            count += 1
+            if iterations is None or count < iterations:
+                self.sleep(interval * self.rng.uniform(1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report this machine's serials to an ingestion service when they change.")
+    parser.add_argument("url", help="e.g. http://inventory:8750/machines (see ingest_server.py)")
+    parser.add_argument("client")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="Seconds between collections.")
+    parser.add_argument("--once", action="store_true", help="Collect and report once, then exit.")
+    parser.add_argument("--state-file", default=STATE_FILE)
+    args = parser.parse_args()
+    CollectorAgent(args.url, args.client, args.state_file).run(1 if args.once else None, args.interval)
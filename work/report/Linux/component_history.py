@@ -0,0 +1,243 @@
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from component_index import ComponentIndex
+from components import RECORD_FIELDS, ComponentModel
+from json_stream import JsonStreamReader
+from serials import KEY_VERSION, canonical, lookup_keys
+from shard_store import ShardedStore, atomic_write_json
+
+CREATED, CHANGED, REMOVED = "created", "changed", "removed"
+
+
+def timestamp(when: float = None) -> str:
+    """Return a UTC ISO 8601 timestamp with microseconds; these sort in time order as plain strings."""
+    when = time.time() if when is None else when
+    return datetime.fromtimestamp(when, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def sortable(stamp: str) -> str:
+    """Give a whole-second UTC time (older log lines, a query) microseconds, so it sorts with timestamp()'s."""
+    if stamp.endswith("Z") and "." not in stamp:
+        return stamp[:-1] + ".000000Z"
+    return stamp
+
+
+class ComponentHistory:
+    """
+    Append-only log of component changes per machine, for warranty disputes.
+
+    Every DataHandle write appends one JSON line per machine whose components changed:
+        {"time": "2025-03-01T09:12:44.318207Z", "client": "acme", "machine": "PF3ABC12",
+         "event": "changed", "changes": [["Disk S/N", "-", "S3UANX0M508687"], ["Disk S/N", "+", "S4EWNX0R120731K"]]}
+    "created" and "removed" events list every component the machine gained or lost, so
+    a merge that folds a duplicate into another machine shows up on both. Only changes
+    are stored, so the log grows with swaps, not with saves or snapshots.
+
+    Queries index the log by machine (the offsets of its lines) and by serial (keyed like
+    the component index, so disk serials are found without their model prefix). The index
+    is kept in a sidecar next to the log with the log's inode and the offset it covers:
+    load() and refresh() only read lines appended since, and the index is rebuilt when
+    the log was replaced or truncated. A machine's state at a point in time is rebuilt
+    backwards from its current record, undoing the later changes, so no full snapshot
+    ever needs to be logged, not even for machines saved before the log existed.
+    """
+
+    version = KEY_VERSION
+
+    def __init__(self, json_file: str):
+        self.json_file = json_file
+        self.path = self.log_path(json_file)
+        self.offset = 0
+        self.log_id = None  # inode of the indexed log
+        self.by_machine = defaultdict(list)  # (client, machine_sn) -> offsets of its event lines, oldest first
+        self.by_serial = defaultdict(list)  # index key -> [time, client, machine_sn, field, "+" or "-"]
+
+    @staticmethod
+    def log_path(json_file: str) -> str:
+        """Return the history log of a store: next to the file, or inside the shard directory."""
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            return os.path.join(shard_dir, "history.jsonl")
+        return os.path.splitext(json_file)[0] + ".history.jsonl"
+
+    @staticmethod
+    def index_path(json_file: str) -> str:
+        """Return the sidecar path of the history index, next to the log."""
+        return os.path.splitext(ComponentHistory.log_path(json_file))[0] + ".index.json"
+
+    @staticmethod
+    def components(record: dict) -> dict:
+        """
+        Return {(field, canonical serial): serial} for a record, placeholders left out, so a
+        serial reported in another form (see serials) is not logged as a swap.
+        """
+        if not record:
+            return {}
+        return {
+            (field, canonical(field, serial) or serial): serial
+            for field in RECORD_FIELDS for serial in ComponentModel.serials(record, field)
+        }
+
+    @staticmethod
+    def event(client: str, machine_sn: str, old_record, new_record, when: str):
+        """Return the log event turning old_record into new_record (None for a missing machine), or None if nothing changed."""
+        if old_record is None and new_record is None:
+            return None
+        before, after = ComponentHistory.components(old_record), ComponentHistory.components(new_record)
+        changes = [[field, "-", before[field, key]] for field, key in sorted(before.keys() - after.keys())]
+        changes += [[field, "+", after[field, key]] for field, key in sorted(after.keys() - before.keys())]
+        if old_record is None:
+            kind = CREATED
+        elif new_record is None:
+            kind = REMOVED
+        elif changes:
+            kind = CHANGED
+        else:
+            return None
+        return {"time": when, "client": client, "machine": machine_sn, "event": kind, "changes": changes}
+
+    @classmethod
+    def record(cls, json_file: str, data: dict, previous: dict, when: str = None):
+        """
+        Log the changes of a DataHandle write.
+        previous maps (client, machine_sn) to the record before the write (None if it is new);
+        data holds the records after it.
+        """
+        when = when or timestamp()
+        lines = []
+        for (client, machine_sn), old_record in previous.items():
+            event = cls.event(client, machine_sn, old_record, data.get(client, {}).get(machine_sn), when)
+            if event is not None:
+                lines.append(json.dumps(event, separators=(",", ":")) + "\n")
+        if lines:
+            # One append per write keeps the lines of concurrent writers whole.
+            with open(cls.log_path(json_file), "a") as file:
+                file.write("".join(lines))
+
+    def refresh(self) -> "ComponentHistory":
+        """Index the lines appended since the last refresh; starts over if the log was replaced or truncated."""
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return self
+        with file:
+            stat = os.fstat(file.fileno())
+            if stat.st_ino != self.log_id or stat.st_size < self.offset:
+                self.offset, self.log_id = 0, stat.st_ino
+                self.by_machine.clear()
+                self.by_serial.clear()
+            file.seek(self.offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break  # A line still being written; read it next time
+                event = json.loads(line)
+                client, machine_sn = event["client"], event["machine"]
+                self.by_machine[(client, machine_sn)].append(self.offset)
+                for field, change, serial in event["changes"]:
+                    for key in ComponentIndex.keys(field, serial):
+                        self.by_serial[key].append([event["time"], client, machine_sn, field, change])
+                self.offset += len(line)
+        return self
+
+    def read_index(self) -> bool:
+        """Read the sidecar index; returns False (leaving this history empty) if it is missing or unreadable."""
+        try:
+            with open(self.index_path(self.json_file), "r") as file:
+                raw = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if raw.get("version") != self.version:
+            return False
+        self.offset, self.log_id = raw["offset"], raw["log_id"]
+        self.by_machine.update(((client, machine_sn), offsets) for client, machine_sn, offsets in raw["machines"])
+        self.by_serial.update(raw["serials"])
+        return True
+
+    def write_index(self):
+        """Atomically write the sidecar index."""
+        atomic_write_json(self.index_path(self.json_file), {
+            "version": self.version, "log_id": self.log_id, "offset": self.offset,
+            "machines": [[client, machine_sn, offsets] for (client, machine_sn), offsets in self.by_machine.items()],
+            "serials": self.by_serial,
+        })
+
+    @classmethod
+    def load(cls, json_file: str) -> "ComponentHistory":
+        """Load the history index from its sidecar, index the lines appended since and save it again if any were."""
+        history = cls(json_file)
+        history.read_index()
+        indexed = (history.log_id, history.offset)
+        history.refresh()
+        if (history.log_id, history.offset) != indexed:
+            history.write_index()
+        return history
+
+    def machine_events(self, client: str, machine_sn: str) -> list:
+        """Return a machine's logged events, oldest first, read from the log."""
+        offsets = self.by_machine.get((client, machine_sn))
+        if not offsets:
+            return []
+        events = []
+        with open(self.path, "rb") as file:
+            for offset in offsets:
+                file.seek(offset)
+                events.append(json.loads(file.readline()))
+        return events
+
+    def serial_events(self, serial: str) -> list:
+        """
+        Return when a component serial appeared in ("+") or left ("-") a machine, oldest first,
+        as dicts with Time, Client, Machine S/N, Field and Change.
+        """
+        # A disk is indexed under its serial and its udev form; each event is listed once, oldest first.
+        found = {tuple(event): None for key in lookup_keys(serial) for event in self.by_serial.get(key, [])}
+        return [
+            {"Time": when, "Client": client, "Machine S/N": machine_sn, "Field": field, "Change": change}
+            for when, client, machine_sn, field, change in sorted(found, key=lambda event: (sortable(event[0]),) + event[1:])
+        ]
+
+    def current_record(self, client: str, machine_sn: str):
+        """Return a machine's record from the store, or None if it is not there."""
+        shard_dir = ShardedStore.shard_dir(self.json_file)
+        try:
+            if shard_dir:
+                machines = ShardedStore.load_client(shard_dir, client)
+            else:
+                machines = JsonStreamReader.client_machines(self.json_file, client)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return machines.get(machine_sn)
+
+    def state_at(self, client: str, machine_sn: str, when: str, current=...):
+        """
+        Return a machine's components at a UTC ISO time, as {field: [serials]}, or None if
+        the machine did not exist then. The current record is read from the store unless given.
+        """
+        if current is ...:
+            current = self.current_record(client, machine_sn)
+        components = self.components(current)
+        exists = current is not None
+        when = sortable(when)
+        for event in reversed(self.machine_events(client, machine_sn)):
+            if sortable(event["time"]) <= when:
+                break
+            for field, change, serial in event["changes"]:
+                key = (field, canonical(field, serial) or serial)
+                if change == "+":
+                    components.pop(key, None)
+                else:
+                    components[key] = serial
+            if event["event"] == CREATED:
+                exists = False
+            elif event["event"] == REMOVED:
+                exists = True
+        if not exists:
+            return None
+        state = {}
+        for (field, _), serial in sorted(components.items()):
+            state.setdefault(field, []).append(serial)
+        return state
@@ -0,0 +1,170 @@
+import json
+import os
+
+from components import ComponentModel
+from json_stream import JsonStreamReader
+from serials import KEY_VERSION, canonical, compact, lookup_keys
+from shard_store import KeyBuckets, ShardedStore
+
+# Component fields whose serials are indexed (Machine S/N is the record key itself).
+INDEXED_FIELDS = (
+    "Disk S/N",
+    "RAM S/N",
+    "CPU S/N",
+    "GPU S/N",
+    "NIC S/N",
+    "Power S/N",
+    "Battery S/N",
+    "Display S/N",
+)
+
+
+class ComponentIndex:
+    """
+    Fleet-wide index mapping a normalized component serial to the machines that own it.
+
+    The index is split into hash buckets (see KeyBuckets) kept next to the store, or in a
+    sharded store's directory, and updated incrementally: each DataHandle write only
+    re-indexes the machine records it touched and rewrites the buckets of the serials
+    they hold, so a save costs the same whatever the fleet size. A single-file store's
+    buckets are stamped with the store's (mtime_ns, size) to detect a store modified
+    without going through DataHandle.
+    """
+
+    version = KEY_VERSION
+    # Name of the bucket directory, "<store>.components" or "components" in a shard directory.
+    directory_name = "components"
+
+    def __init__(self, postings: dict = None, buckets: KeyBuckets = None):
+        # normalized serial -> list of [client, machine_sn, field]
+        self.postings = postings if postings is not None else {}
+        self.buckets = buckets
+
+    @classmethod
+    def buckets_for(cls, json_file: str) -> KeyBuckets:
+        """Return the bucketed index of a store in either layout."""
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            return KeyBuckets(os.path.join(shard_dir, cls.directory_name), cls.version)
+        return KeyBuckets(f"{os.path.splitext(json_file)[0]}.{cls.directory_name}", cls.version)
+
+    @staticmethod
+    def store_stat(json_file: str):
+        """Return the (mtime_ns, size) pair used to detect a store changed behind the index."""
+        try:
+            stat = os.stat(json_file)
+            return [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def normalize(serial: str) -> str:
+        """Normalize a serial for lookups: case and MAC/UUID separators are ignored (see serials.compact)."""
+        return compact(serial)
+
+    @staticmethod
+    def keys(field: str, serial: str) -> set:
+        """
+        Return the index keys for one serial: its canonical key (see serials), plus the full
+        VENDOR_MODEL_SERIAL form udev reports disks as, so either form finds the disk.
+        """
+        key = canonical(field, serial)
+        if key is None:
+            return set()
+        return {key, compact(serial)} if field == "Disk S/N" else {key}
+
+    @staticmethod
+    def record_keys(record: dict) -> dict:
+        """Return {index key: field} for every indexed serial of one machine record."""
+        keys = {}
+        for field in INDEXED_FIELDS:
+            for serial in ComponentModel.serials(record, field):
+                for key in ComponentIndex.keys(field, serial):
+                    keys.setdefault(key, field)
+        return keys
+
+    def add_record(self, client: str, machine_sn: str, record: dict):
+        """Add postings for every indexed serial of one machine record."""
+        for key, field in self.record_keys(record).items():
+            self.postings.setdefault(key, []).append([client, machine_sn, field])
+
+    def owners(self, key: str) -> list:
+        """Return the postings of one key, from the buckets or the in-memory postings."""
+        return self.buckets.get(key) if self.buckets is not None else self.postings.get(key, [])
+
+    def locate(self, serial: str) -> list:
+        """Return the owners of a serial (in any of the forms serials.lookup_keys accepts) as dicts with Client, Machine S/N and Field."""
+        found = {}
+        for key in sorted(lookup_keys(serial)):
+            for owner in self.owners(key):
+                found.setdefault(tuple(owner), None)
+        return [{"Client": c, "Machine S/N": m, "Field": f} for c, m, f in found]
+
+    @classmethod
+    def build(cls, data) -> "ComponentIndex":
+        """Build an in-memory index from a full store dictionary or an iterable of (client, machines)."""
+        index = cls()
+        for client, machines in data.items() if isinstance(data, dict) else data:
+            for machine_sn, record in machines.items():
+                index.add_record(client, machine_sn, record)
+        return index
+
+    @classmethod
+    def _rebuild(cls, buckets: KeyBuckets, data, stat: list) -> "ComponentIndex":
+        """Replace every bucket with an index of data and stamp them with the store stat."""
+        buckets.write_all(cls.build(data).postings)
+        buckets.set_stamp(stat)
+        return cls(buckets=buckets)
+
+    @classmethod
+    def load(cls, json_file: str) -> "ComponentIndex":
+        """
+        Load the index for a store, rebuilding it when the buckets are missing, were built
+        with other keys or the store was modified without going through DataHandle.
+        """
+        buckets = cls.buckets_for(json_file)
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            if not buckets.exists():
+                return cls._rebuild(buckets, ShardedStore.iter_clients(shard_dir), None)
+            return cls(buckets=buckets)
+
+        stat = cls.store_stat(json_file)
+        if stat is None:
+            return cls()
+        if buckets.exists() and buckets.stamp() == stat:
+            return cls(buckets=buckets)
+        try:
+            with open(json_file, "rb") as file:
+                # One client in memory at a time (see JsonStreamReader.iter_clients).
+                return cls._rebuild(buckets, JsonStreamReader.iter_clients(file), stat)
+        except json.JSONDecodeError:
+            return cls._rebuild(buckets, {}, stat)
+
+    @classmethod
+    def update(cls, json_file: str, data: dict, previous: dict, stat_before: list):
+        """
+        Re-index the machines touched by a write, rewriting only the buckets of their keys.
+        - previous: {(client, machine_sn): record before the write, or None if it is new}.
+        - stat_before: a single-file store's stat before the write, to detect stale buckets
+          (None for a sharded store).
+        Falls back to a full rebuild from data when the buckets cannot be trusted.
+        """
+        buckets = cls.buckets_for(json_file)
+        if ShardedStore.shard_dir(json_file):
+            if not buckets.exists():
+                return cls.load(json_file)
+        elif not buckets.exists() or buckets.stamp() != stat_before:
+            return cls._rebuild(buckets, data, cls.store_stat(json_file))
+
+        removed, added = [], []
+        for (client, machine_sn), old_record in previous.items():
+            if old_record is not None:
+                removed.extend((key, client, machine_sn) for key in cls.record_keys(old_record))
+            record = data.get(client, {}).get(machine_sn)
+            if record is not None:
+                added.extend((key, [client, machine_sn, field]) for key, field in cls.record_keys(record).items())
+        buckets.update(removed, added)
+        if stat_before is not None:
+            buckets.set_stamp(cls.store_stat(json_file))
+        return cls(buckets=buckets)
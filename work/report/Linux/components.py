@@ -0,0 +1,161 @@
+from json_stream import JsonStreamReader
+from serials import canonical, is_placeholder, lookup_keys
+from shard_store import atomic_file
+from store_cache import encode_client
+
+# Fields that can hold several components per machine (one entry per disk, stick, port or screen).
+MULTI_VALUED_FIELDS = ("Disk S/N", "RAM S/N", "NIC S/N", "Display S/N")
+
+# Every component field of a machine record, in the order the store writes them.
+RECORD_FIELDS = (
+    "Disk S/N",
+    "RAM S/N",
+    "Battery S/N",
+    "CPU S/N",
+    "BIOS S/N",
+    "GPU S/N",
+    "NIC S/N",
+    "Power S/N",
+    "Display S/N",
+)
+
+
+class ComponentModel:
+    """
+    Typed component entries for machine records.
+
+    Multi-valued fields are stored as a list of entries instead of a comma-joined string:
+        "RAM S/N": [{"serial": "18806798"}, {"serial": "188063C7"}]
+        "NIC S/N": [{"serial": "3c:7c:3f:2b:39:cd", "slot": "enp0s31f6"}]
+    Single-valued fields (CPU, BIOS, GPU, Power, Battery) stay plain strings.
+    """
+
+    @staticmethod
+    def is_placeholder(value) -> bool:
+        """Return True if the value carries no serial information (see serials.PLACEHOLDERS)."""
+        return is_placeholder(value)
+
+    @staticmethod
+    def to_entries(value) -> list:
+        """
+        Convert a probe result or a legacy stored value into a list of component entries.
+        - str: legacy comma-joined serials ("a, b, c").
+        - list: serial strings or already typed entries.
+        - dict: slot -> serial mapping as returned by the NIC and display probes.
+        Placeholder values are dropped; an empty list means the component is unknown.
+        """
+        if isinstance(value, dict):
+            items = [(str(slot), serial) for slot, serial in value.items()]
+        elif isinstance(value, list):
+            items = []
+            for item in value:
+                if isinstance(item, dict):
+                    items.append((item.get("slot"), item.get("serial")))
+                else:
+                    items.append((None, item))
+        elif value is None:
+            items = []
+        else:
+            items = [(None, part) for part in str(value).split(",")]
+
+        entries = []
+        for slot, serial in items:
+            if ComponentModel.is_placeholder(serial):
+                continue
+            entry = {"serial": str(serial).strip()}
+            if slot:
+                entry["slot"] = slot
+            entries.append(entry)
+        return ComponentModel.merge_entries([], entries)
+
+    @staticmethod
+    def merge_entries(current: list, incoming: list, field: str = None) -> list:
+        """
+        Union two entry lists keyed by the field's canonical serial (see serials), keeping
+        first-seen order, so "3c:7c:3f:2b:39:cd" and "3C7C3F2B39CD" are one entry.
+        An incoming entry fills in a slot the existing entry did not know about.
+        Runs in O(len(current) + len(incoming)).
+        """
+        merged = {}
+        for entry in list(current) + list(incoming):
+            key = canonical(field, entry["serial"]) or entry["serial"]
+            if key not in merged:
+                merged[key] = dict(entry)
+            elif "slot" in entry and "slot" not in merged[key]:
+                merged[key]["slot"] = entry["slot"]
+        return list(merged.values())
+
+    @staticmethod
+    def normalize_record(record: dict) -> dict:
+        """Return a copy of the record with every multi-valued field stored as typed entries."""
+        normalized = dict(record)
+        for field in MULTI_VALUED_FIELDS:
+            if field in normalized:
+                normalized[field] = ComponentModel.to_entries(normalized[field])
+        return normalized
+
+    @staticmethod
+    def merge_into(merged: dict, record: dict):
+        """
+        Merge one record into another in place.
+        - Multi-valued fields: set union of the component entries.
+        - Single-valued fields: the latest known value wins; placeholders never overwrite.
+        """
+        for key, value in record.items():
+            if key in MULTI_VALUED_FIELDS:
+                merged[key] = ComponentModel.merge_entries(
+                    ComponentModel.to_entries(merged.get(key)), ComponentModel.to_entries(value), key
+                )
+            elif key not in merged or not ComponentModel.is_placeholder(value):
+                merged[key] = value
+
+    @staticmethod
+    def serials(record: dict, field: str) -> list:
+        """Return the known serial strings stored under a field (legacy or typed form)."""
+        value = record.get(field)
+        if isinstance(value, list) and all(isinstance(entry, dict) for entry in value):
+            # Fast path for records already stored as typed entries.
+            return [entry["serial"] for entry in value]
+        if field in MULTI_VALUED_FIELDS or isinstance(value, (list, dict)):
+            return [entry["serial"] for entry in ComponentModel.to_entries(value)]
+        return [] if ComponentModel.is_placeholder(value) else [str(value).strip()]
+
+    @staticmethod
+    def has_component(record: dict, serial: str) -> bool:
+        """Return True if any field of the record holds this serial, compared by canonical key (see serials)."""
+        wanted = lookup_keys(serial)
+        return any(canonical(field, value) in wanted for field in record for value in ComponentModel.serials(record, field))
+
+    @staticmethod
+    def format_value(value) -> str:
+        """Format a stored or probed value for display in a single line."""
+        if isinstance(value, (list, dict)):
+            serials = [entry["serial"] for entry in ComponentModel.to_entries(value)]
+            return ", ".join(serials) if serials else "Unknown"
+        if value is None:
+            return "Unknown"
+        return str(value)
+
+    @staticmethod
+    def migrate_store(json_file: str, output_file: str = None) -> int:
+        """
+        Convert a store file from comma-joined strings to typed component entries.
+        The input is streamed client by client and written to a temporary file that
+        atomically replaces the output (the input itself when no output is given).
+        Returns the number of migrated machine records.
+        """
+        output_file = output_file or json_file
+        migrated = 0
+        with open(json_file, "rb") as src, atomic_file(output_file) as dst:
+            dst.write("{")
+            first = True
+            for client, machines in JsonStreamReader.iter_clients(src):
+                machines = {
+                    machine_sn: ComponentModel.normalize_record(record)
+                    for machine_sn, record in machines.items()
+                }
+                migrated += len(machines)
+                dst.write(("\n" if first else ",\n") + encode_client(client, machines))
+                first = False
+            dst.write("\n}" if not first else "}")
+        return migrated
@@ -1,138 +1,501 @@
 import json
-from PyQt6.QtWidgets import QComboBox, QMessageBox
+import os
+from typing import TYPE_CHECKING
 
-from helpers import MessageHelper
+from components import ComponentModel
+from component_index import ComponentIndex
+from client_index import ClientIndex
+from component_history import ComponentHistory
+from machine_fingerprint import MIN_SIMILARITY, FingerprintIndex, similarity
+from json_stream import JsonStreamReader
+from serials import canonical, identity, is_numbered, is_placeholder
+from shard_store import ShardedStore, atomic_write_json
+from record_table import RecordTable
+from inventory_snapshot import InventorySnapshot
+from store_cache import StoreCache
+
+if TYPE_CHECKING:
+    from PyQt6.QtWidgets import QComboBox
 
 class DataHandle:
     """Class containing setup utilities for client data management."""
     json_file = "client_system_info.json"
     @staticmethod
-    def load_existing_clients(json_file: str, client_dropdown: QComboBox):
-        """Load existing clients from a JSON file and populate a dropdown."""
-        try:
-            with open(json_file, "r") as file:
-                data = json.load(file)
-                for client in data.keys():
-                    client_dropdown.addItem(client)
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass  # No existing data or invalid JSON format
+    def load_existing_clients(json_file: str, client_dropdown: "QComboBox") -> ClientIndex:
+        """
+        Populate a dropdown with the store's clients in one batch, sorted, and return the
+        ClientIndex used to complete typed names (see client_index.py).
+        The names come from the store's snapshot when it is fresh, else from the client index.
+        """
+        snapshot = InventorySnapshot.open(json_file)
+        index = ClientIndex(snapshot.client_names()) if snapshot is not None else ClientIndex.load(json_file)
+        client_dropdown.addItems(index.names)
+        return index
 
     @staticmethod
     def load_client_data(json_file: str):
         """Load existing client data from the JSON file."""
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            return ShardedStore.load_all(shard_dir)
         try:
             with open(json_file, "r") as file:
                 return json.load(file)
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
 
+    @staticmethod
+    def load_client_machines(json_file: str, client_name: str):
+        """Load a single client's machines from the JSON file, holding one client in memory at a time."""
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            return ShardedStore.load_client(shard_dir, client_name)
+        try:
+            return JsonStreamReader.client_machines(json_file, client_name)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def iter_machines(json_file: str):
+        """Yield (client, machine_sn, record) from the store, holding at most one client in memory."""
+        return ShardedStore.iter_store(json_file)
+
+    @staticmethod
+    def stream_records(json_file: str, records: RecordTable, batch_size: int = 2000):
+        """
+        Append the store's machines to records in batches, for loading off the GUI thread.
+        - Yields (row count, fraction of the store read) after every batch and once at the end.
+        - The fraction comes from the file position, or from the shards read when sharded.
+        - Stop iterating to cancel; records keeps the rows appended so far.
+        """
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            total = len(ShardedStore.client_names(shard_dir)) or 1
+            batch_end = batch_size
+            for done, (client, machines) in enumerate(ShardedStore.iter_clients(shard_dir), start=1):
+                for machine_sn, record in machines.items():
+                    records.append(client, machine_sn, record)
+                if len(records) >= batch_end:
+                    batch_end = len(records) + batch_size
+                    yield len(records), done / total
+            yield len(records), 1.0
+            return
+        try:
+            file = open(json_file, "rb")
+        except FileNotFoundError:
+            yield 0, 1.0
+            return
+        with file:
+            size = os.fstat(file.fileno()).st_size or 1
+            for client, machine_sn, record in JsonStreamReader.iter_machines(file):
+                if records.append(client, machine_sn, record) % batch_size == batch_size - 1:
+                    yield len(records), min(file.tell() / size, 1.0)
+        yield len(records), 1.0
+
+    @staticmethod
+    def load_records(json_file: str) -> RecordTable:
+        """Load the store into a compact columnar RecordTable (see record_table.py)."""
+        try:
+            return RecordTable.from_machines(DataHandle.iter_machines(json_file))
+        except json.JSONDecodeError:
+            return RecordTable()
+
     @staticmethod
     def save_client_data(json_file: str, client_name: str, new_record: dict):
         """Save client data to the JSON file with duplicate handling."""
-        existing_data = DataHandle.load_client_data(json_file)
-
-        if client_name not in existing_data:
-            existing_data[client_name] = {}
+        result, staged = DataHandle.stage_client_data(json_file, client_name, new_record)
+        if staged is None:
+            return result
+        return DataHandle.resolve_duplicates(json_file, staged, DataHandle.ask_duplicate_action(staged))
 
+    @staticmethod
+    def stage_client_data(json_file: str, client_name: str, new_record: dict):
+        """
+        The file work of save_client_data, safe to run off the GUI thread. Returns (result, staged):
+        - ("Ok" or "Add New", None) when the record was written.
+        - ("Duplicates", staged) when duplicates were found and nothing was written yet;
+          pass staged to ask_duplicate_action (GUI thread) and then resolve_duplicates.
+        """
         # Extract the machine serial from the new_record dictionary (there should be only one key)
         machine_sn = list(new_record.keys())[0]
+        new_record = {machine_sn: ComponentModel.normalize_record(new_record[machine_sn])}
 
-        if machine_sn in existing_data[client_name]:
-            # Duplicate found – check and handle duplicates.
-            return DataHandle.check_duplicate_and_handle(json_file, client_name, machine_sn, new_record[machine_sn], existing_data)
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            # Only this client's shard and the shards sharing its Machine/BIOS S/N are loaded.
+            existing_data = ShardedStore.load_candidates(
+                shard_dir, client_name, machine_sn, new_record[machine_sn].get("BIOS S/N")
+            )
         else:
+            existing_data = DataHandle.load_client_data(json_file)
+
+        if client_name not in existing_data:
+            existing_data[client_name] = {}
+
+        if machine_sn not in existing_data[client_name]:
+            # The same Machine S/N may be listed in another form ("abc-123" for "ABC123").
+            machine_key = canonical("Machine S/N", machine_sn)
+            same_serial = {
+                ex_machine_sn: record for ex_machine_sn, record in existing_data[client_name].items()
+                if machine_key is not None and canonical("Machine S/N", ex_machine_sn) == machine_key
+            }
+            if same_serial:
+                return "Duplicates", DataHandle._staged(client_name, machine_sn, new_record[machine_sn], {client_name: same_serial}, existing_data)
+            # A new Machine S/N may still be a known machine whose board was replaced.
+            likely, scores = DataHandle.find_similar(json_file, new_record[machine_sn], existing_data)
+            if likely:
+                return "Duplicates", DataHandle._staged(client_name, machine_sn, new_record[machine_sn], likely, existing_data, scores)
             # No duplicate found; simply add the record.
             existing_data[client_name][machine_sn] = new_record[machine_sn]
-            with open(json_file, "w") as file:
-                json.dump(existing_data, file, indent=4)
-            return "Ok"
+            DataHandle.write_client_data(json_file, existing_data, {(client_name, machine_sn): None})
+            return "Ok", None
+
+        # Duplicate found – check and handle duplicates.
+        duplicates = DataHandle.find_duplicates(client_name, machine_sn, new_record[machine_sn], existing_data)
+        scores = None
+        if not duplicates:
+            # A placeholder Machine S/N ("Unknown") matches nothing by itself; compare the components instead.
+            duplicates, scores = DataHandle.find_similar(json_file, new_record[machine_sn], existing_data)
+        if not duplicates:
+            return DataHandle.add_new_record(json_file, client_name, machine_sn, new_record[machine_sn], existing_data), None
+        return "Duplicates", DataHandle._staged(client_name, machine_sn, new_record[machine_sn], duplicates, existing_data, scores)
 
     @staticmethod
-    def check_duplicate_and_handle(json_file: str, client_name: str, machine_sn: str, new_record: dict, existing_data: dict):
+    def _staged(client_name: str, machine_sn: str, new_record: dict, duplicates: dict, existing_data: dict, scores: dict = None) -> dict:
+        """
+        Bundle what resolve_duplicates needs once the user has chosen an action.
+        scores maps (client, machine_sn) to a component similarity for duplicates found by fingerprint.
+        """
+        return {
+            "client_name": client_name,
+            "machine_sn": machine_sn,
+            "new_record": new_record,
+            "duplicates": duplicates,
+            "existing_data": existing_data,
+            "scores": scores or {},
+        }
+
+    @staticmethod
+    def write_client_data(json_file: str, existing_data: dict, previous: dict, cache: StoreCache = None):
+        """
+        Write the store, update the component index and log component changes for the touched machines.
+        previous maps (client, machine_sn) to the record before the write (None if it is new).
+        With the sharded layout only the touched clients' shards are written; a single-file store
+        loaded from a StoreCache is written through it, re-encoding only the touched clients.
+        Either way the snapshot (see inventory_snapshot.py) is then rebuilt on a background
+        thread, so viewers and AddReport map it instead of parsing the store.
+        """
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            ShardedStore.write_clients(shard_dir, existing_data, previous)
+            InventorySnapshot.schedule_rebuild(json_file)
+            ComponentIndex.update(json_file, existing_data, previous, None)
+            FingerprintIndex.update(json_file, existing_data, previous, None)
+            ComponentHistory.record(json_file, existing_data, previous)
+            return
+        stat_before = ComponentIndex.store_stat(json_file)
+        if cache is not None:
+            cache.write(existing_data, previous)
+        else:
+            atomic_write_json(json_file, existing_data, indent=4, sync=True)
+        InventorySnapshot.schedule_rebuild(json_file)
+        ComponentIndex.update(json_file, existing_data, previous, stat_before)
+        FingerprintIndex.update(json_file, existing_data, previous, stat_before)
+        ClientIndex.update(json_file, existing_data, previous, stat_before)
+        ComponentHistory.record(json_file, existing_data, previous)
+
+    @staticmethod
+    def locate_component(json_file: str, serial: str) -> list:
+        """Return the client and machine owning a component serial, using the component index."""
+        return ComponentIndex.load(json_file).locate(serial)
+
+    @staticmethod
+    def find_duplicates(client_name: str, machine_sn: str, new_record: dict, existing_data: dict, index: dict = None) -> dict:
         """
         Check if a record with the same machine serial number or BIOS serial number exists.
         - If the record is in the same client, a match on either machine_sn or BIOS S/N triggers a duplicate.
         - If the record is in a different client, both machine_sn and BIOS S/N must match to trigger a duplicate.
-        If duplicates are found, show them in a table and ask the user whether to merge or add new.
+        Serials are compared by canonical key (see serials), so case and separators do not matter.
+        Placeholder serials ("Unknown", "Default string", ...) are shared by unrelated machines and never match.
+        With an index from identity_index(), only the machines sharing a key are compared.
+        Returns the duplicates as {client: {machine_sn: record}}.
         """
         duplicates = {}
-        new_bios = new_record.get("BIOS S/N", None)
-
-        # Loop over every client and every machine record in the existing data.
-        for ex_client, machines in existing_data.items():
-            for ex_machine_sn, record in machines.items():
-                # For the same client: trigger duplicate if either field matches.
-                if ex_client == client_name:
-                    condition = (ex_machine_sn == machine_sn) or (new_bios and record.get("BIOS S/N") == new_bios)
-                else:
-                    # For a different client, both machine_sn and BIOS S/N must match.
-                    condition = (ex_machine_sn == machine_sn) and (new_bios is not None and record.get("BIOS S/N") == new_bios)
-                
-                if condition:
-                    if ex_client not in duplicates:
-                        duplicates[ex_client] = {}
-                    duplicates[ex_client][ex_machine_sn] = record
-
-        if duplicates:
-            message_helper = MessageHelper()
-            # Show duplicates in a table and ask the user for an action.
-            result = message_helper.show_duplicate_dialog(machine_sn, new_bios, duplicates, new_record)
-            if result == "Merge":
-                return DataHandle.merge_records(json_file, client_name, machine_sn, duplicates, new_record, existing_data)
-            elif result == "Add New":
-                if message_helper.confirm("Confirm Add New", "Duplicates were found. Do you really want to add this as a new entry?"):
-                    return DataHandle.add_new_record(json_file, client_name, machine_sn, new_record, existing_data)
-                else:
-                    return "Cancelled"
-            else:
-                return "Cancelled"
+        new_bios = canonical("BIOS S/N", new_record.get("BIOS S/N", None))
+        machine_key = canonical("Machine S/N", machine_sn)
+
+        if index is None:
+            # Loop over every client and every machine record in the existing data.
+            candidates = (
+                (ex_client, ex_machine_sn, record)
+                for ex_client, machines in existing_data.items()
+                for ex_machine_sn, record in machines.items()
+            )
         else:
+            owners = set(index.get(f"sn:{machine_key}", ())) | set(index.get(f"bios:{new_bios}", ()))
+            candidates = (
+                (ex_client, ex_machine_sn, existing_data[ex_client][ex_machine_sn])
+                for ex_client, ex_machine_sn in sorted(owners)
+            )
+        for ex_client, ex_machine_sn, record in candidates:
+            same_machine = machine_key is not None and canonical("Machine S/N", ex_machine_sn) == machine_key
+            same_bios = new_bios is not None and canonical("BIOS S/N", record.get("BIOS S/N")) == new_bios
+            # For the same client: trigger duplicate if either field matches.
+            if ex_client == client_name:
+                condition = same_machine or same_bios
+            else:
+                # For a different client, both machine_sn and BIOS S/N must match.
+                condition = same_machine and same_bios
+            
+            if condition:
+                if ex_client not in duplicates:
+                    duplicates[ex_client] = {}
+                duplicates[ex_client][ex_machine_sn] = record
+        return duplicates
+
+    @staticmethod
+    def identity_index(existing_data: dict) -> dict:
+        """Map the canonical Machine S/N ("sn:KEY") and BIOS S/N ("bios:KEY") to the machines holding them, for find_duplicates."""
+        index = {}
+        for client, machines in existing_data.items():
+            for machine_sn, record in machines.items():
+                DataHandle._index_machine(index, client, machine_sn, record)
+        return index
+
+    @staticmethod
+    def _stored_sn(index: dict, client_name: str, machine_sn: str, machines: dict):
+        """Return the key a client stores a Machine S/N under (itself or a case or separator variant), or None."""
+        if machine_sn in machines:
+            return machine_sn
+        owners = index.get(f"sn:{canonical('Machine S/N', machine_sn)}", ())
+        return min((sn for client, sn in owners if client == client_name), default=None)
+
+    @staticmethod
+    def _index_machine(index: dict, client: str, machine_sn: str, record: dict, remove: bool = False):
+        """Add a machine's keys to an identity_index(), or remove them."""
+        keys = [f"sn:{canonical('Machine S/N', machine_sn)}", f"bios:{canonical('BIOS S/N', record.get('BIOS S/N'))}"]
+        for key in keys:
+            if key.endswith(":None"):
+                continue
+            owners = index.setdefault(key, set())
+            if remove:
+                owners.discard((client, machine_sn))
+            else:
+                owners.add((client, machine_sn))
+
+    @staticmethod
+    def find_similar(json_file: str, new_record: dict, existing_data: dict):
+        """
+        Find machines whose components largely match a record (see FingerprintIndex), for
+        machines that come back under a new Machine or BIOS S/N after a board swap.
+        Candidates in shards not loaded yet are added to existing_data.
+        Returns ({client: {machine_sn: record}}, {(client, machine_sn): similarity}).
+        """
+        shard_dir = ShardedStore.shard_dir(json_file)
+        likely, scores = {}, {}
+        for client, candidate_sn in FingerprintIndex.load(json_file).candidates(new_record):
+            if client not in existing_data and shard_dir:
+                existing_data[client] = ShardedStore.load_client(shard_dir, client)
+            record = existing_data.get(client, {}).get(candidate_sn)
+            score = similarity(new_record, record) if record is not None else 0.0
+            if score >= MIN_SIMILARITY:
+                likely.setdefault(client, {})[candidate_sn] = record
+                scores[(client, candidate_sn)] = score
+        return likely, scores
+
+    @staticmethod
+    def ask_duplicate_action(staged: dict) -> str:
+        """
+        Show the duplicates in a table and ask the user whether to merge or add new (GUI thread only).
+        Returns "Merge", "Add New" or "Cancelled".
+        """
+        # Imported here so that headless users of DataHandle (ingest_server.py) do not need Qt.
+        from helpers import MessageHelper
+
+        message_helper = MessageHelper()
+        new_record = staged["new_record"]
+        result = message_helper.show_duplicate_dialog(
+            staged["machine_sn"], new_record.get("BIOS S/N", None), staged["duplicates"], new_record, staged.get("scores")
+        )
+        if result == "Merge":
+            return "Merge"
+        if result == "Add New" and message_helper.show_confirmation(
+            "Confirm Add New", "Duplicates were found. Do you really want to add this as a new entry?"
+        ):
+            return "Add New"
+        return "Cancelled"
+
+    @staticmethod
+    def resolve_duplicates(json_file: str, staged: dict, action: str):
+        """Apply the user's choice for staged duplicates: "Merge", "Add New" or "Cancelled"."""
+        client_name, machine_sn = staged["client_name"], staged["machine_sn"]
+        if action == "Merge":
+            return DataHandle.merge_records(
+                json_file, client_name, machine_sn, staged["duplicates"], staged["new_record"], staged["existing_data"]
+            )
+        if action == "Add New":
+            return DataHandle.add_new_record(json_file, client_name, machine_sn, staged["new_record"], staged["existing_data"])
+        return "Cancelled"
+
+    @staticmethod
+    def check_duplicate_and_handle(json_file: str, client_name: str, machine_sn: str, new_record: dict, existing_data: dict):
+        """
+        Find duplicates of a record (see find_duplicates). If duplicates are found, show them
+        in a table and ask the user whether to merge or add new.
+        """
+        duplicates = DataHandle.find_duplicates(client_name, machine_sn, new_record, existing_data)
+        scores = None
+        if not duplicates:
+            duplicates, scores = DataHandle.find_similar(json_file, new_record, existing_data)
+        if not duplicates:
             # No duplicates found, add record directly.
             return DataHandle.add_new_record(json_file, client_name, machine_sn, new_record, existing_data)
+        staged = DataHandle._staged(client_name, machine_sn, new_record, duplicates, existing_data, scores)
+        return DataHandle.resolve_duplicates(json_file, staged, DataHandle.ask_duplicate_action(staged))
 
     @staticmethod
     def merge_records(json_file: str, client_name: str, machine_sn: str, duplicates: dict, new_record: dict, existing_data: dict):
         """
         Merge all duplicate records with the new record. Previous duplicate entries will be overwritten.
+        Component lists are merged as sets (see ComponentModel.merge_into).
         """
-        merged_record = {}
-
-        def merge_into(merged, record):
-            for key, value in record.items():
-                if key not in merged or merged[key] == "Unknown":
-                    merged[key] = value
-                else:
-                    if value not in merged[key]:
-                        merged[key] = f"{merged[key]}, {value}"
+        previous = DataHandle._merge_into(client_name, machine_sn, duplicates, new_record, existing_data)
+        DataHandle.write_client_data(json_file, existing_data, previous)
+        return "Merged"
 
+    @staticmethod
+    def _merge_into(client_name: str, machine_sn: str, duplicates: dict, new_record: dict, existing_data: dict) -> dict:
+        """Apply merge_records to existing_data in memory and return the previous records it replaced."""
+        merged_record = {}
         for dup_client, machines in duplicates.items():
             for dup_machine, record in machines.items():
-                merge_into(merged_record, record)
-        merge_into(merged_record, new_record)
+                ComponentModel.merge_into(merged_record, record)
+        ComponentModel.merge_into(merged_record, new_record)
 
         # Remove all duplicates and add the merged record.
+        previous = {(client_name, machine_sn): existing_data[client_name].get(machine_sn)}
         for dup_client, machines in duplicates.items():
             for dup_machine in list(machines.keys()):
-                del existing_data[dup_client][dup_machine]
+                previous[(dup_client, dup_machine)] = existing_data[dup_client].pop(dup_machine)
         existing_data[client_name][machine_sn] = merged_record
-
-        with open(json_file, "w") as file:
-            json.dump(existing_data, file, indent=4)
-        return "Merged"
+        return previous
 
     @staticmethod
     def add_new_record(json_file: str, client_name: str, machine_sn: str, new_record: dict, existing_data: dict):
         """Add a new entry for the machine serial number, ensuring uniqueness if needed."""
-        if machine_sn.lower() in ["unknown", "restricted by bios"]:
+        previous = DataHandle._add_new_into(client_name, machine_sn, new_record, existing_data)
+        DataHandle.write_client_data(json_file, existing_data, previous)
+        return "Add New"
+
+    @staticmethod
+    def _add_new_into(client_name: str, machine_sn: str, new_record: dict, existing_data: dict) -> dict:
+        """Apply add_new_record to existing_data in memory and return the previous record it replaced."""
+        if is_placeholder(machine_sn):
             base_sn = machine_sn
             counter = 1
             while f"{base_sn}+{counter}" in existing_data[client_name]:
                 counter += 1
             machine_sn = f"{base_sn}+{counter}"
 
+        previous = {(client_name, machine_sn): existing_data[client_name].get(machine_sn)}
         existing_data[client_name][machine_sn] = new_record
+        return previous
 
-        with open(json_file, "w") as file:
-            json.dump(existing_data, file, indent=4)
-        return "Add New"
+    @staticmethod
+    def save_batch(json_file: str, submissions: list, cache: StoreCache = None) -> list:
+        """
+        Save many (client_name, {machine_sn: record}) submissions with one store write (group commit),
+        deciding duplicates without asking, as an unattended ingestion has no one to ask. Every full
+        submission is checked with find_duplicates, as the interactive save does:
+        - "Ok": no duplicate was found and the machine was added.
+        - "Updated" / "Missing": a (client_name, {machine_sn: fields}, True) submission carries only the
+          fields that changed since the machine last reported; they replace the stored ones, under the
+          key the Machine S/N is stored with in any case or separator variant ("Missing"
+          when the machine is not in the store or its S/N is a placeholder, and the full record has to be sent).
+        - "Merged": the machine was already listed under the same client with the same Machine S/N
+          (by canonical key; any placeholder S/N counts as the same) and was merged into the stored
+          entry, as AddReport's Merge does.
+        - "Add New": the serial is a placeholder ("Unknown") listed already, with no duplicate by
+          BIOS S/N, so the machine was added under a numbered serial.
+        - "Conflict": the machine duplicates one of another client (same Machine and BIOS S/N), or
+          one of the same client under another Machine S/N (same BIOS S/N); nothing was written,
+          AddReport decides.
+        Returns one result per submission, in order; a later submission sees the earlier ones.
+        A long-running caller passes a StoreCache (see store_cache.py) so that a single-file store
+        and its identity index stay in memory between batches; it is unused for a sharded store.
+        """
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            cache = None
+            existing_data = {}
+            for client_name, new_record, *_ in submissions:
+                machine_sn, record = next(iter(new_record.items()))
+                candidates = ShardedStore.load_candidates(shard_dir, client_name, machine_sn, record.get("BIOS S/N"))
+                for client, machines in candidates.items():
+                    existing_data.setdefault(client, machines)
+        elif cache is not None:
+            existing_data = cache.load()
+        else:
+            existing_data = DataHandle.load_client_data(json_file)
+        # Built once for the batch (or kept by the cache), so each duplicate check only compares the machines sharing a key.
+        if cache is not None and cache.index is None:
+            cache.index = DataHandle.identity_index(existing_data)
+        index = DataHandle.identity_index(existing_data) if cache is None else cache.index
+        try:
+            return DataHandle._save_batch(json_file, submissions, existing_data, index, cache)
+        except BaseException:
+            if cache is not None:
+                cache.invalidate()  # The cached store may be changed in memory but not on disk
+            raise
+
+    @staticmethod
+    def _save_batch(json_file: str, submissions: list, existing_data: dict, index: dict, cache: StoreCache) -> list:
+        """Apply save_batch to the loaded store and its identity index, and write it."""
+        results, previous = [], {}
+        for client_name, new_record, *partial in submissions:
+            machine_sn = next(iter(new_record))
+            record = ComponentModel.normalize_record(new_record[machine_sn])
+            machines = existing_data.get(client_name, {})
+            if partial and partial[0]:
+                stored_sn = DataHandle._stored_sn(index, client_name, machine_sn, machines)
+                if stored_sn is None or is_placeholder(machine_sn) or is_numbered(machine_sn):
+                    # A placeholder S/N may be keyed to another machine: only a full snapshot is matched.
+                    results.append("Missing")
+                    continue
+                # Replace rather than merge, so a swapped-out component disappears.
+                changes = {(client_name, stored_sn): machines[stored_sn]}
+                machines[stored_sn] = dict(machines[stored_sn], **record)
+                results.append("Updated")
+            else:
+                duplicates = DataHandle.find_duplicates(client_name, machine_sn, record, existing_data, index)
+                machine_key = identity(machine_sn)
+                if not duplicates:
+                    if machine_sn in machines:
+                        # Only a placeholder serial can be listed already without being a duplicate.
+                        changes = DataHandle._add_new_into(client_name, machine_sn, record, existing_data)
+                        results.append("Add New")
+                    else:
+                        changes = {(client_name, machine_sn): None}
+                        existing_data.setdefault(client_name, machines)[machine_sn] = record
+                        results.append("Ok")
+                elif set(duplicates) - {client_name} or any(
+                    identity(duplicate_sn) != machine_key for duplicate_sn in duplicates[client_name]
+                ):
+                    results.append("Conflict")
+                    continue
+                else:
+                    # Merged under the stored key: a placeholder S/N may be stored numbered ("Unknown+1").
+                    target_sn = next(iter(duplicates[client_name]))
+                    changes = DataHandle._merge_into(client_name, target_sn, duplicates, record, existing_data)
+                    results.append("Merged")
+            for (client, changed_sn), old_record in changes.items():
+                # The index update needs each machine as it was before the batch, not between submissions.
+                previous.setdefault((client, changed_sn), old_record)
+                if old_record is not None:
+                    DataHandle._index_machine(index, client, changed_sn, old_record, remove=True)
+                if changed_sn in existing_data.get(client, {}):
+                    DataHandle._index_machine(index, client, changed_sn, existing_data[client][changed_sn])
 
+        if previous:
+            DataHandle.write_client_data(json_file, existing_data, previous, cache)
+        return results
@@ -0,0 +1,230 @@
+import hashlib
+import json
+from array import array
+
+from data_handle import DataHandle
+from machine_fingerprint import MIN_SIMILARITY, SIGNATURE_SIZE, signature, tokens
+from serials import identity
+from shard_store import ShardedStore
+
+# Components whose serials identify a single machine; RAM serials (8 hex digits) and the
+# CPU processor ID repeat across machines, so they only count towards similarity.
+KEY_FIELDS = {"Disk S/N", "NIC S/N", "Display S/N", "GPU S/N"}
+# Keys shared by more machines than this (a board vendor's dummy UUID, a cloned disk image)
+# are not used to link machines.
+MAX_GROUP = 64
+# Keys are grouped one hash partition at a time, so only 1/PASSES of them is in a dict at once.
+PASSES = 8
+
+# Bytes of the record digest a plan carries per machine.
+DIGEST_SIZE = 8
+
+MACHINE_AND_BIOS, SAME_BIOS, COMPONENTS = "machine+bios", "bios", "components"
+
+
+class DuplicateClusters:
+    """
+    Find machines filed more than once in a store: under two clients, or as "Unknown+N" siblings.
+
+    One streaming pass emits hashed keys per machine (Machine S/N, BIOS S/N and the
+    serials of identifying components) and keeps a MinHash signature of its full
+    component set (see machine_fingerprint). Machines sharing a key are compared
+    with the first machine holding it and linked with union-find when they:
+    - share both Machine S/N and BIOS S/N ("machine+bios"),
+    - have similar components, estimated from the signatures ("components"),
+    - or share a BIOS S/N within one client while their Machine S/N is a placeholder ("bios").
+    Every step is linear in the number of machines; the linked components are the clusters.
+    """
+
+    def __init__(self, json_file: str):
+        self.json_file = json_file
+        self.clients = []
+        self.client_sizes = []
+        self.machines = []  # (client id, machine_sn)
+        self.machine_keys = array("q")
+        self.bios_keys = array("q")
+        self.sizes = array("H")  # Components per machine, to pick the most complete record to keep
+        self.digests = bytearray()  # DIGEST_SIZE bytes per machine: its record when scanned, see record_digest()
+        self.signatures = []
+        self.parent = array("I")
+        self.edges = []  # (machine id, machine id, reason, similarity) for every link made
+
+    def scan(self):
+        """Read the store once and link duplicate machines; returns self."""
+        client_ids = {}
+        keys = [array("q") for _ in range(PASSES)]
+        owners = [array("I") for _ in range(PASSES)]
+        for client, machine_sn, record in ShardedStore.iter_store(self.json_file):
+            if client not in client_ids:
+                client_ids[client] = len(self.clients)
+                self.clients.append(client)
+                self.client_sizes.append(0)
+            machine = len(self.machines)
+            self.machines.append((client_ids[client], machine_sn))
+            self.client_sizes[client_ids[client]] += 1
+
+            machine_key, bios_key = identity(machine_sn), identity(record.get("BIOS S/N"))
+            self.machine_keys.append(hash(machine_key) if machine_key else 0)
+            self.bios_keys.append(hash(bios_key) if bios_key else 0)
+            record_tokens = tokens(record)
+            self.sizes.append(min(len(record_tokens), 0xFFFF))
+            self.signatures.append(signature(record_tokens).tobytes())
+            self.digests += bytes.fromhex(self.record_digest(record))
+
+            emitted = [f"sn:{machine_key}"] if machine_key else []
+            if bios_key:
+                emitted.append(f"bios:{bios_key}")
+            emitted.extend(token for token in record_tokens if token.split(":", 1)[0] in KEY_FIELDS)
+            for key in map(hash, emitted):
+                keys[key % PASSES].append(key)
+                owners[key % PASSES].append(machine)
+
+        self.parent = array("I", range(len(self.machines)))
+        for part in range(PASSES):
+            groups = {}
+            for key, machine in zip(keys[part], owners[part]):
+                groups.setdefault(key, []).append(machine)
+            keys[part] = owners[part] = None
+            for members in groups.values():
+                if 1 < len(members) <= MAX_GROUP:
+                    for other in members[1:]:
+                        self.link(members[0], other)
+        return self
+
+    @staticmethod
+    def record_digest(record: dict) -> str:
+        """Return a digest of a machine record, to tell whether it changed since a plan was made."""
+        text = json.dumps(record, sort_keys=True, separators=(",", ":"))
+        return hashlib.blake2b(text.encode(), digest_size=DIGEST_SIZE).hexdigest()
+
+    def similarity(self, first: int, second: int) -> float:
+        """Estimate the Jaccard similarity of two machines' components from their signatures."""
+        a, b = self.signatures[first], self.signatures[second]
+        if not a or not b:
+            return 0.0
+        a, b = array("I", a), array("I", b)
+        return sum(x == y for x, y in zip(a, b)) / SIGNATURE_SIZE
+
+    def reason(self, first: int, second: int):
+        """Return why two machines sharing a key are the same machine, as (reason, similarity), or None."""
+        score = self.similarity(first, second)
+        same_bios = self.bios_keys[first] != 0 and self.bios_keys[first] == self.bios_keys[second]
+        if same_bios and self.machine_keys[first] != 0 and self.machine_keys[first] == self.machine_keys[second]:
+            return MACHINE_AND_BIOS, score
+        if score >= MIN_SIMILARITY:
+            return COMPONENTS, score
+        if same_bios and self.machines[first][0] == self.machines[second][0] and not (self.machine_keys[first] and self.machine_keys[second]):
+            return SAME_BIOS, score
+        return None
+
+    def find(self, machine: int) -> int:
+        parent = self.parent
+        while parent[machine] != machine:
+            parent[machine] = parent[parent[machine]]
+            machine = parent[machine]
+        return machine
+
+    def link(self, first: int, second: int):
+        first_root, second_root = self.find(first), self.find(second)
+        if first_root == second_root:
+            return
+        found = self.reason(first, second)
+        if found is None:
+            return
+        self.parent[second_root] = first_root
+        self.edges.append((first, second, *found))
+
+    def clusters(self) -> list:
+        """Return the clusters of two or more machine ids, largest first."""
+        linked = sorted({machine for first, second, *_ in self.edges for machine in (first, second)})
+        members = {}
+        for machine in linked:
+            members.setdefault(self.find(machine), []).append(machine)
+        return sorted(members.values(), key=len, reverse=True)
+
+    def keeper(self, cluster: list) -> int:
+        """
+        Pick the machine to keep: a real Machine S/N over a placeholder, then the client with
+        more machines in the store, then the record with more components.
+        """
+        return min(cluster, key=lambda machine: (
+            self.machine_keys[machine] == 0,
+            -self.client_sizes[self.machines[machine][0]],
+            -self.sizes[machine],
+            self.clients[self.machines[machine][0]],
+            self.machines[machine][1],
+        ))
+
+    def describe(self, machine: int) -> dict:
+        client, machine_sn = self.machines[machine]
+        digest = self.digests[machine * DIGEST_SIZE:(machine + 1) * DIGEST_SIZE].hex()
+        return {"client": self.clients[client], "machine": machine_sn, "digest": digest}
+
+    def plan(self) -> list:
+        """
+        Return the suggested merge plan, one entry per cluster:
+            {"keep": {"client", "machine", "digest"}, "merge": [{"client", "machine", "digest", "reason", "similarity"}, ...]}
+        The reason and estimated similarity are those of the link that put the machine in the cluster;
+        digest is the record's record_digest() when scanned.
+        """
+        found = {}
+        for first, second, reason, score in self.edges:
+            found.setdefault(first, (reason, score))
+            found.setdefault(second, (reason, score))
+        entries = []
+        for cluster in self.clusters():
+            keep = self.keeper(cluster)
+            merge = []
+            for machine in cluster:
+                if machine != keep:
+                    reason, score = found[machine]
+                    merge.append(dict(self.describe(machine), reason=reason, similarity=round(score, 2)))
+            entries.append({"keep": self.describe(keep), "merge": merge})
+        return entries
+
+    @staticmethod
+    def write_plan(plan: list, path: str):
+        with open(path, "w") as file:
+            json.dump(plan, file, indent=4)
+
+    @staticmethod
+    def read_plan(path: str) -> list:
+        with open(path, "r") as file:
+            return json.load(file)
+
+    @staticmethod
+    def apply(json_file: str, plan: list) -> tuple:
+        """
+        Merge every cluster of a plan into its kept machine (as AddReport's Merge does) with one
+        store write. Clusters with a machine that is no longer in the store, or whose record
+        changed since the plan was made (its digest differs), are skipped.
+        Returns (clusters merged, machines removed).
+        """
+        shard_dir = ShardedStore.shard_dir(json_file)
+        existing_data = ShardedStore.load_all(shard_dir) if shard_dir else DataHandle.load_client_data(json_file)
+        previous, merged, removed = {}, 0, 0
+        for entry in plan:
+            keep_client, keep_sn = entry["keep"]["client"], entry["keep"]["machine"]
+            duplicates = {}
+            for machine in entry["merge"]:
+                duplicates.setdefault(machine["client"], {})[machine["machine"]] = None
+            wanted = [(keep_client, keep_sn)] + [(client, sn) for client, machines in duplicates.items() for sn in machines]
+            if any(sn not in existing_data.get(client, {}) for client, sn in wanted):
+                continue
+            planned = [entry["keep"]] + entry["merge"]
+            if any(
+                machine.get("digest") != DuplicateClusters.record_digest(existing_data[machine["client"]][machine["machine"]])
+                for machine in planned
+            ):
+                continue
+            for client, machines in duplicates.items():
+                for machine_sn in machines:
+                    machines[machine_sn] = existing_data[client][machine_sn]
+            changes = DataHandle._merge_into(keep_client, keep_sn, duplicates, existing_data[keep_client][keep_sn], existing_data)
+            for key, old_record in changes.items():
+                previous.setdefault(key, old_record)
+            merged += 1
+            removed += len(wanted) - 1
+        if previous:
+            DataHandle.write_client_data(json_file, existing_data, previous)
+        return merged, removed
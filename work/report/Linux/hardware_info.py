@@ -1,12 +1,17 @@
 import os
-import platform
 import subprocess
 import glob
 import hashlib
 import json
 
+from serials import is_placeholder
+
 class HardwareInfo:
-    """Class to fetch various hardware serial numbers on Linux (and Windows for display)."""
+    """
+    Class to fetch various hardware serial numbers on Linux (and Windows for display).
+    Values that are not serials ("Default string", "To be filled by O.E.M.", all-zero UUIDs, ...)
+    are recognized by serials.is_placeholder, so every probe skips the same ones.
+    """
 
     @staticmethod
     def get_machine_serial():
@@ -18,14 +23,12 @@ class HardwareInfo:
         5. Use dmidecode for chassis-serial-number.
         6. Use dmidecode for baseboard-serial-number.
         """
-        invalid_serials = {"", "unknown", "none", "system serial number",'default string'}
-        
         # Method 1: Try standard DMI files.
         for path in ["/sys/class/dmi/id/product_serial", "/sys/class/dmi/id/product_uuid"]:
             try:
                 with open(path, "r") as f:
                     sn = f.read().strip()
-                    if sn and sn.lower() not in invalid_serials:
+                    if not is_placeholder(sn):
                         return sn
             except Exception:
                 continue
@@ -35,7 +38,7 @@ class HardwareInfo:
             sn = subprocess.check_output(
                 "sudo dmidecode -s system-serial-number", shell=True
             ).decode().strip()
-            if sn and sn.lower() not in invalid_serials:
+            if not is_placeholder(sn):
                 return sn
         except Exception:
             pass
@@ -44,7 +47,7 @@ class HardwareInfo:
         try:
             with open("/sys/class/dmi/id/board_serial", "r") as f:
                 board_sn = f.read().strip()
-                if board_sn and board_sn.lower() not in invalid_serials:
+                if not is_placeholder(board_sn):
                     return board_sn
         except Exception:
             pass
@@ -55,7 +58,7 @@ class HardwareInfo:
             if os.path.exists(chassis_path):
                 with open(chassis_path, "r") as f:
                     chassis_sn = f.read().strip()
-                    if chassis_sn and chassis_sn.lower() not in invalid_serials:
+                    if not is_placeholder(chassis_sn):
                         return chassis_sn
         except Exception:
             pass
@@ -65,7 +68,7 @@ class HardwareInfo:
             sn = subprocess.check_output(
                 "sudo dmidecode -s chassis-serial-number", shell=True
             ).decode().strip()
-            if sn and sn.lower() not in invalid_serials:
+            if not is_placeholder(sn):
                 return sn
         except Exception:
             pass
@@ -75,7 +78,7 @@ class HardwareInfo:
             sn = subprocess.check_output(
                 "sudo dmidecode -s baseboard-serial-number", shell=True
             ).decode().strip()
-            if sn and sn.lower() not in invalid_serials:
+            if not is_placeholder(sn):
                 return sn
         except Exception:
             pass
@@ -95,15 +98,13 @@ class HardwareInfo:
         As a result, swapping peripheral components (like RAM, hard drives, or even the CPU) usually doesn't affect the UUID. 
         However, if replace or update the motherboard or if the firmware is re-flashed, the UUID may change.
         """
-        invalids = {"", "n/a", "unknown", "system serial number", "to be filled by o.e.m."}
-
         # Method 1: Read from /sys/class/dmi/id/bios_serial.
         bios_serial_path = "/sys/class/dmi/id/bios_serial"
         if os.path.exists(bios_serial_path):
             try:
                 with open(bios_serial_path, "r") as f:
                     serial = f.read().strip()
-                    if serial and serial.lower() not in invalids:
+                    if not is_placeholder(serial):
                         return serial
             except Exception:
                 pass
@@ -120,11 +121,11 @@ class HardwareInfo:
                 line = line.strip()
                 if line.startswith("Serial Number:") and bios_serial is None:
                     candidate = line.split(":", 1)[1].strip()
-                    if candidate and candidate.lower() not in invalids:
+                    if not is_placeholder(candidate):
                         bios_serial = candidate
                 elif line.startswith("Asset Tag:") and asset_tag is None:
                     candidate = line.split(":", 1)[1].strip()
-                    if candidate and candidate.lower() not in invalids:
+                    if not is_placeholder(candidate):
                         asset_tag = candidate
 
             if bios_serial:
@@ -144,7 +145,7 @@ class HardwareInfo:
                 if line.startswith("UUID:"):
                     candidate = line.split(":", 1)[1].strip()
                     # Ensure the candidate is valid.
-                    if candidate and candidate.lower() not in invalids and candidate != "Not Specified":
+                    if not is_placeholder(candidate):
                         return candidate
         except Exception:
             pass
@@ -175,20 +176,20 @@ class HardwareInfo:
                 except Exception:
                     serial = None
 
-                if not serial or serial.lower() in ["", "unknown", "none"]:
+                if is_placeholder(serial):
                     try:
                         udev_output = subprocess.check_output(
                             f"udevadm info --query=property --name=/dev/{name}",
                             shell=True,
                         ).decode()
-                        for udev_line in udev_output.splitlines():
-                            if udev_line.startswith("ID_SERIAL="):
-                                serial = udev_line.split("=", 1)[1].strip()
-                                break
+                        # ID_SERIAL_SHORT is the serial sysfs reports; ID_SERIAL prefixes it with vendor and model.
+                        properties = dict(line.split("=", 1) for line in udev_output.splitlines() if "=" in line)
+                        serial = properties.get("ID_SERIAL_SHORT") or properties.get("ID_SERIAL")
+                        serial = serial.strip() if serial else None
                     except Exception:
                         serial = None
 
-                if serial and serial.lower() not in ["", "unknown", "none"]:
+                if not is_placeholder(serial):
                     disk_serials.append(serial)
         except Exception:
             pass
@@ -207,7 +208,7 @@ class HardwareInfo:
                 line = line.strip()
                 if line.startswith("Serial Number:"):
                     serial = line.split(":", 1)[1].strip()
-                    if serial and serial.lower() not in ["", "unknown", "none"]:
+                    if not is_placeholder(serial):
                         ram_serials.append(serial)
         except Exception:
             pass
@@ -224,7 +225,8 @@ class HardwareInfo:
             if "ID:" in output:
                 hex_str = output.split("ID:")[1].strip()
                 decoded_serial = hex_str.replace(" ", "")
-                return decoded_serial
+                if not is_placeholder(decoded_serial):
+                    return decoded_serial
         except Exception:
             pass
         return "Unknown"
@@ -239,7 +241,7 @@ class HardwareInfo:
             for line in output.splitlines():
                 if "Serial Number" in line:
                     serial = line.split(":", 1)[1].strip()
-                    if serial and serial.upper() != "N/A":
+                    if not is_placeholder(serial):
                         return serial
             # If Serial Number is not available, try the "GPU UUID".
             for line in output.splitlines():
@@ -256,7 +258,7 @@ class HardwareInfo:
             for line in output.splitlines():
                 if "serial:" in line.lower():
                     serial = line.split(":", 1)[1].strip()
-                    if serial and serial.lower() not in ["n/a", "unknown", ""]:
+                    if not is_placeholder(serial):
                         return serial
         except Exception:
             pass
@@ -296,7 +298,7 @@ class HardwareInfo:
                 try:
                     with open(address_file, "r") as f:
                         mac = f.read().strip()
-                        if mac:
+                        if not is_placeholder(mac):
                             nic_serials[iface] = mac
                 except Exception:
                     continue
@@ -322,8 +324,6 @@ class HardwareInfo:
         Returns:
             str: The power supply serial number if found; otherwise, "Unknown".
         """
-        invalids = {"", "n/a", "unknown"}
-        
         # Method 1 & 2: Use dmidecode -t 39 to search for serial info.
         try:
             output = subprocess.check_output("sudo dmidecode -t 39", shell=True).decode()
@@ -331,7 +331,7 @@ class HardwareInfo:
                 for line in output.splitlines():
                     if line.strip().startswith(key):
                         value = line.split(":", 1)[1].strip()
-                        if value.lower() not in invalids:
+                        if not is_placeholder(value):
                             return value
         except Exception:
             pass
@@ -342,7 +342,7 @@ class HardwareInfo:
             try:
                 with open(serial_path, "r") as f:
                     value = f.read().strip()
-                    if value.lower() not in invalids:
+                    if not is_placeholder(value):
                         return value
             except Exception:
                 continue
@@ -356,7 +356,7 @@ class HardwareInfo:
                 for line in result.splitlines():
                     if line.startswith("POWER_SUPPLY_SERIAL="):
                         value = line.split("=", 1)[1].strip()
-                        if value.lower() not in invalids:
+                        if not is_placeholder(value):
                             return value
             except Exception:
                 continue
@@ -367,7 +367,7 @@ class HardwareInfo:
             for line in output.splitlines():
                 if "serial:" in line.lower():
                     value = line.split("serial:", 1)[1].strip()
-                    if value.lower() not in invalids:
+                    if not is_placeholder(value):
                         return value
         except Exception:
             pass
@@ -378,7 +378,7 @@ class HardwareInfo:
             if os.path.exists(dt_serial_path):
                 with open(dt_serial_path, "r") as f:
                     value = f.read().strip()
-                    if value.lower() not in invalids:
+                    if not is_placeholder(value):
                         return value
         except Exception:
             pass
@@ -391,7 +391,7 @@ class HardwareInfo:
                     parts = line.split(":", 1)
                     if len(parts) == 2:
                         value = parts[1].strip()
-                        if value.lower() not in invalids:
+                        if not is_placeholder(value):
                             return value
         except Exception:
             pass
@@ -404,7 +404,7 @@ class HardwareInfo:
                     for line in f:
                         if line.startswith("POWER_SUPPLY_SERIAL="):
                             value = line.split("=", 1)[1].strip()
-                            if value.lower() not in invalids:
+                            if not is_placeholder(value):
                                 return value
             except Exception:
                 continue
@@ -422,15 +422,13 @@ class HardwareInfo:
         Returns:
             str: The battery serial number if found; otherwise, "Unknown".
         """
-        invalids = {"", "unknown", "none"}
-
         # Method 1: Look for battery serial in /sys/class/power_supply/BAT*
         for bat_path in glob.glob("/sys/class/power_supply/BAT*"):
             serial_path = os.path.join(bat_path, "serial_number")
             try:
                 with open(serial_path, "r") as f:
                     value = f.read().strip()
-                    if value.lower() not in invalids:
+                    if not is_placeholder(value):
                         return value
             except Exception:
                 continue
@@ -443,7 +441,7 @@ class HardwareInfo:
                     for line in f:
                         if "Serial Number:" in line:
                             value = line.split(":", 1)[1].strip()
-                            if value.lower() not in invalids:
+                            if not is_placeholder(value):
                                 return value
             except Exception:
                 pass
@@ -527,21 +525,38 @@ class HardwareInfo:
                 continue
         return identifiers
 
+    @staticmethod
+    def get_system_vendor():
+        """Read the system manufacturer ("Dell Inc.", "LENOVO", ...) from DMI; used to pick a warranty vendor."""
+        try:
+            with open("/sys/class/dmi/id/sys_vendor", "r") as f:
+                return f.read().strip() or "Unknown"
+        except Exception:
+            return "Unknown"
+
+    # Record field -> probe method, in the order the probes have always run.
+    PROBES = {
+        "Machine S/N": "get_machine_serial",
+        "CPU S/N": "get_cpu_serial",
+        "BIOS S/N": "get_bios_serial",
+        "GPU S/N": "get_gpu_serial",
+        "NIC S/N": "get_nic_serial",
+        "Power S/N": "get_power_supply_serial",
+        "Battery S/N": "get_battery_serial",
+        "RAM S/N": "get_ram_serials",
+        "Display S/N": "get_display_identifiers",
+        "Disk S/N": "get_disk_serials",
+    }
+
+    @classmethod
+    def probe(cls, field: str):
+        """Run the probe of one record field (see PROBES), e.g. on a worker thread."""
+        return getattr(cls, cls.PROBES[field])()
+
     @classmethod
     def get_serial_numbers(cls):
         """Fetch all serial numbers and return them in JSON format."""
-        serial_numbers = {
-            "Machine S/N": cls.get_machine_serial(),
-            "CPU S/N": cls.get_cpu_serial(),
-            "BIOS S/N": cls.get_bios_serial(),
-            "GPU S/N": cls.get_gpu_serial(),
-            "NIC S/N": cls.get_nic_serial(),
-            "Power S/N": cls.get_power_info().get("Power S/N", "N/A"),
-            "Battery S/N": cls.get_power_info().get("Battery S/N", "N/A"),
-            "RAM S/N": cls.get_ram_serials(),
-            "Display S/N": cls.get_display_identifiers(),
-            "Disk S/N" : cls.get_disk_serials()
-        }
+        serial_numbers = {field: cls.probe(field) for field in cls.PROBES}
         return json.dumps(serial_numbers, indent=4)
 
 if __name__ == '__main__':
@@ -21,18 +21,25 @@ class MessageHelper(QWidget):
                                      QMessageBox.StandardButton.No)
         return reply == QMessageBox.StandardButton.Yes
     
-    def show_duplicate_dialog(self, machine_sn: str, new_bios: str, duplicates: dict, new_record: dict) -> str:
+    def show_duplicate_dialog(self, machine_sn: str, new_bios: str, duplicates: dict, new_record: dict, scores: dict = None) -> str:
         """
         Show a duplicate dialog with details and return the user's choice:
         "Merge", "Add New", or "Cancel".
+        scores maps (client, machine_sn) to the share of components in common, for duplicates found by fingerprint.
         """
         msg_box = QMessageBox(self)
         msg_box.setIcon(QMessageBox.Icon.Warning)
         msg_box.setWindowTitle("Duplicate Entry Detected")
         duplicate_text = json.dumps(duplicates, indent=4)
-        msg_box.setText(
-            f"Duplicate record(s) found for Machine S/N '{machine_sn}' or BIOS S/N '{new_bios}'."
-        )
+        if scores:
+            likely = ", ".join(
+                f"'{client} / {sn}' ({score:.0%})" for (client, sn), score in sorted(scores.items(), key=lambda item: -item[1])
+            )
+            msg_box.setText(f"Machine S/N '{machine_sn}' is new, but its components match {likely}.")
+        else:
+            msg_box.setText(
+                f"Duplicate record(s) found for Machine S/N '{machine_sn}' or BIOS S/N '{new_bios}'."
+            )
         comparison_text = (
             f"Existing Duplicate Data:\n{duplicate_text}\n\n"
             f"New Data:\n{json.dumps(new_record, indent=4)}\n\n"
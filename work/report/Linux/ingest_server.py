@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+
+from data_handle import DataHandle
+from hardware_info import HardwareInfo
+from store_cache import StoreCache
+from warranty import WarrantyLookup
+
+MAX_BODY = 1 << 20  # Largest request body accepted, in bytes
+MAX_BATCH = 1000  # Most submissions written by one group commit
+BATCH_WINDOW = 0.005  # Seconds a commit waits for more submissions after the first one
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+def validate(submission) -> tuple:
+    """
+    Check one submission, {"client": name, "snapshot": {field: value}} where the snapshot is
+    shaped like HardwareInfo.get_serial_numbers(), and return (client, {machine_sn: record}, delta).
+    With "delta": true the snapshot holds only Machine S/N and the fields that changed
+    (see collector_agent.py). Raises ValueError with a message for the submitter.
+    """
+    if not isinstance(submission, dict):
+        raise ValueError("submission must be an object")
+    client = submission.get("client")
+    snapshot = submission.get("snapshot")
+    if not isinstance(client, str) or not client.strip():
+        raise ValueError("client must be a non-empty string")
+    if not isinstance(snapshot, dict):
+        raise ValueError("snapshot must be an object")
+    unknown = set(snapshot) - set(HardwareInfo.PROBES)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    machine_sn = snapshot.get("Machine S/N")
+    if not isinstance(machine_sn, str) or not machine_sn.strip():
+        raise ValueError("Machine S/N must be a non-empty string")
+    for field, value in snapshot.items():
+        if not isinstance(value, (str, list, dict)) and value is not None:
+            raise ValueError(f"{field} must be a string, a list or an object")
+    delta = submission.get("delta", False)
+    if not isinstance(delta, bool):
+        raise ValueError("delta must be true or false")
+    record = {field: value for field, value in snapshot.items() if field != "Machine S/N"}
+    return client.strip(), {machine_sn.strip(): record}, delta
+
+
+class IngestService:
+    """
+    Accepts machine snapshots over HTTP and writes them to the store in batches.
+
+    Requests only validate and queue their submissions; one committer task takes
+    everything queued (waiting up to BATCH_WINDOW for stragglers) and saves it with a
+    single DataHandle.save_batch call on a worker thread, so a thousand machines
+    reporting at once cost a few store writes rather than a thousand. While a batch
+    is being written the next one accumulates: this is group commit, and a response
+    is only sent once its records are on disk.
+
+    A single-file store stays loaded between batches (see StoreCache), so a batch does
+    not re-read the store and only re-encodes the clients it touched; the indexes only
+    rewrite the buckets of the keys it changed. The file itself is still rewritten whole
+    by every batch, so a batch costs at least one write of the store: for large fleets
+    with many small batches the sharded layout, which writes only the touched clients'
+    shards, is the better fit.
+
+    POST /machines  {"client": ..., "snapshot": {...}, "delta": false} or {"submissions": [...]}
+                    -> {"results": [{"machine_sn": ..., "status": ...}, ...]}
+                    status is a DataHandle.save_batch result, or "Invalid" with an error
+    GET  /health    -> counters: submissions, batches, largest batch, queued
+
+    With a WarrantyLookup, machines new to the store get their warranty looked up in the
+    background after their batch is written, so the cache is warm when someone asks.
+    """
+
+    def __init__(self, json_file: str = DataHandle.json_file, max_batch: int = MAX_BATCH, window: float = BATCH_WINDOW,
+                 warranty: WarrantyLookup = None):
+        self.json_file = json_file
+        self.cache = StoreCache(json_file)
+        self.max_batch = max_batch
+        self.window = window
+        self.warranty = warranty
+        self.queue = None
+        self.lookups = set()
+        self.stats = {"submissions": 0, "batches": 0, "largest_batch": 0}
+
+    async def commit_loop(self):
+        """Write queued submissions in batches until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            submissions = [submission for submission, _ in batch]
+            try:
+                results = await asyncio.to_thread(DataHandle.save_batch, self.json_file, submissions, self.cache)
+            except Exception as error:
+                results = [error] * len(batch)
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            if self.warranty is not None:
+                added = [next(iter(new_record)) for (_, new_record, _), result in zip(submissions, results) if result == "Ok"]
+                if added:
+                    lookup = asyncio.create_task(asyncio.to_thread(self.warranty.lookup, added))
+                    self.lookups.add(lookup)
+                    lookup.add_done_callback(self.lookups.discard)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue  # The client went away
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def submit(self, submissions: list) -> list:
+        """Validate submissions, queue the valid ones and return one outcome per submission once written."""
+        loop = asyncio.get_running_loop()
+        outcomes = []
+        for submission in submissions:
+            try:
+                client, new_record, delta = validate(submission)
+            except ValueError as error:
+                outcomes.append({"status": "Invalid", "error": str(error)})
+                continue
+            future = loop.create_future()
+            await self.queue.put(((client, new_record, delta), future))
+            outcomes.append({"machine_sn": next(iter(new_record)), "client": client, "future": future})
+
+        self.stats["submissions"] += len(submissions)
+        for outcome in outcomes:
+            future = outcome.pop("future", None)
+            if future is None:
+                continue
+            try:
+                outcome["status"] = await future
+            except Exception as error:
+                outcome["status"], outcome["error"] = "Error", str(error)
+        return outcomes
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple:
+        """Return (status code, JSON-serializable payload) for one request."""
+        if path == "/health":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, dict(self.stats, queued=self.queue.qsize())
+        if path != "/machines":
+            return 404, {"error": f"no route {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            payload = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as error:
+            return 400, {"error": f"invalid JSON: {error}"}
+        submissions = payload.get("submissions", [payload]) if isinstance(payload, dict) else None
+        if not isinstance(submissions, list):
+            return 400, {"error": "expected a submission or {\"submissions\": [...]}"}
+        return 200, {"results": await self.submit(submissions)}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The body cannot be found, so neither can the next request: answer and close.
+                    status, payload = 400, {"error": "Content-Length must be a non-negative integer"}
+                    headers["connection"] = "close"
+                elif length > MAX_BODY:
+                    status, payload = 413, {"error": f"body larger than {MAX_BODY} bytes"}
+                    headers["connection"] = "close"
+                else:
+                    body = await reader.readexactly(length)
+                    status, payload = await self.route(method, path.split("?", 1)[0], body)
+
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8750, started=None):
+        """Serve until cancelled; started(port) is called once listening (port 0 picks a free one)."""
+        self.queue = asyncio.Queue()
+        committer = asyncio.create_task(self.commit_loop())
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            if started is not None:
+                started(server.sockets[0].getsockname()[1])
+            async with server:
+                await server.serve_forever()
+        finally:
+            committer.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accept machine snapshots over HTTP and group-commit them to the store.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--json-file", default=DataHandle.json_file)
+    parser.add_argument("--warranty", action="store_true", help="Look up the warranty of new machines in the background.")
+    args = parser.parse_args()
+    service = IngestService(args.json_file, warranty=WarrantyLookup(args.json_file) if args.warranty else None)
+    try:
+        asyncio.run(service.serve(args.host, args.port, lambda port: print(f"✅ Listening on http://{args.host}:{port}/machines")))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,216 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from record_groups import ClientGroups
+from record_sync import RecordSync
+from record_table import COLUMNS, RecordTable, ValuePool
+from shard_store import ShardedStore, atomic_file
+
+# Layout version; a snapshot of another version is ignored and published again.
+VERSION = 1
+MAGIC = b"INVSNAP\0"
+# magic, version, byte order (0 little, 1 big endian), rows, sections, digest of the store stamps
+_HEADER = struct.Struct("<8sHHII16s")
+# name, offset, size of one section; every section starts on an 8-byte boundary
+_SECTION = struct.Struct("<24sQQ")
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+# Seconds a scheduled rebuild waits, so the writes of a burst are published once.
+REBUILD_DELAY = 0.5
+
+# Snapshot path -> [rebuild thread, whether a write came in since its last build]
+_rebuilds = {}
+_rebuilds_lock = threading.Lock()
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class InventorySnapshot:
+    """
+    Read-only binary copy of the store for viewers, opened with mmap.
+
+    The JSON store stays the format every tool reads and writes; the snapshot is derived
+    from it and published next to it. After a header and a section table it holds:
+    - pool{c}.offsets / pool{c}.blob: the distinct values of column c (its string table),
+    - codes{c}: one uint32 value code per row, so row n of a column is at offset 4 * n,
+    - groups.*: each client's rows and unknown-serial counts, as ClientGroups builds them.
+    open() checks the header and maps the file: the RecordTable it hands out reads values
+    straight from the mapped pages, so opening costs the same for any store size and
+    every process viewing the store shares one copy in the page cache.
+    The header carries a digest of the store stamps (see RecordSync.store_stamps); a
+    snapshot whose store changed since it was published is stale and never opened.
+    """
+
+    def __init__(self, path: str, rows: int, sections: dict, stamps: dict):
+        # The sections are views of the mapping, which stays open for as long as any of them is used.
+        self.path = path
+        self.rows = rows
+        self.stamps = stamps
+        self._sections = sections
+        self.table = RecordTable.from_buffers(
+            [ValuePool.from_buffers(sections[f"pool{column}.offsets"].cast("I"), sections[f"pool{column}.blob"])
+             for column in range(len(COLUMNS))],
+            [sections[f"codes{column}"].cast("I") for column in range(len(COLUMNS))],
+        )
+
+    @staticmethod
+    def snapshot_path(json_file: str) -> str:
+        """Return the snapshot path of a store: a sidecar file, or snapshot.bin in the shard directory."""
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            return os.path.join(shard_dir, "snapshot.bin")
+        return os.path.splitext(json_file)[0] + ".snapshot.bin"
+
+    @staticmethod
+    def digest(path: str, stamps: dict) -> bytes:
+        """Digest store stamps, with paths taken relative to the snapshot so any working directory agrees."""
+        base = os.path.dirname(os.path.abspath(path))
+        items = sorted((os.path.relpath(os.path.abspath(file), base), stamp) for file, stamp in stamps.items())
+        return hashlib.blake2b(repr(items).encode("utf-8"), digest_size=16).digest()
+
+    @staticmethod
+    def publish(json_file: str, records: RecordTable, stamps: dict, rows: int = None) -> str:
+        """
+        Write the first rows of a frozen table (all of it by default) as the store's snapshot
+        and return its path. stamps are the store stamps taken before the table was read, so
+        a store changed while it was read leaves a snapshot that is already stale.
+        Rows appended after the table was frozen may be left out with rows, but not included.
+        """
+        rows = len(records) if rows is None else rows
+        codes = [column[:rows] for column in records.codes]
+        groups = ClientGroups(RecordTable.from_buffers(records.pools, codes))
+        clients, ends, totals, grouped = array("I"), array("I"), array("I"), array("I")
+        for client, client_rows in groups.rows.items():
+            clients.append(codes[0][client_rows[0]])
+            grouped.extend(client_rows)
+            ends.append(len(grouped))
+            totals.append(groups.unknown_totals[client])
+
+        sections = []
+        for column, pool in enumerate(records.pools):
+            offsets, blob = pool.buffers()
+            sections += [(f"pool{column}.offsets", offsets), (f"pool{column}.blob", blob), (f"codes{column}", codes[column])]
+        sections += [
+            ("groups.unknown", groups.unknown), ("groups.clients", clients), ("groups.ends", ends),
+            ("groups.totals", totals), ("groups.rows", grouped),
+        ]
+
+        path = InventorySnapshot.snapshot_path(json_file)
+        offset = _align(_HEADER.size + _SECTION.size * len(sections))
+        table = []
+        for name, data in sections:
+            size = memoryview(data).nbytes
+            table.append(_SECTION.pack(name.encode("ascii"), offset, size))
+            offset = _align(offset + size)
+
+        with atomic_file(path, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, _BYTE_ORDER, rows, len(sections), InventorySnapshot.digest(path, stamps)))
+            file.write(b"".join(table))
+            for name, data in sections:
+                file.write(b"\0" * (_align(file.tell()) - file.tell()))
+                file.write(data)
+        return path
+
+    @staticmethod
+    def rebuild(json_file: str):
+        """
+        Publish a snapshot of the store as it is on disk and return its path, or None when the
+        store cannot be read. It is stamped before the store is read, like the viewer's.
+        """
+        stamps = RecordSync.store_stamps(json_file)
+        try:
+            records = RecordTable.from_machines(ShardedStore.iter_store(json_file))
+        except (FileNotFoundError, ValueError):
+            return None
+        return InventorySnapshot.publish(json_file, records, stamps)
+
+    @staticmethod
+    def schedule_rebuild(json_file: str, delay: float = REBUILD_DELAY):
+        """
+        Rebuild the store's snapshot on a background thread after a write, so the next viewer,
+        AddReport or script maps it instead of parsing the JSON store.
+        - The thread waits `delay` seconds first; writes made meanwhile share its rebuild.
+        - One thread per store: a write during a rebuild makes it build again once done.
+        - The thread is not a daemon, so a short-lived process publishes before it exits.
+        """
+        path = InventorySnapshot.snapshot_path(json_file)
+        with _rebuilds_lock:
+            if path in _rebuilds:
+                _rebuilds[path][1] = True
+                return
+            thread = threading.Thread(target=InventorySnapshot._rebuild_loop, args=(json_file, path, delay), name="snapshot-rebuild")
+            _rebuilds[path] = [thread, True]
+        thread.start()
+
+    @staticmethod
+    def _rebuild_loop(json_file: str, path: str, delay: float):
+        while True:
+            time.sleep(delay)
+            with _rebuilds_lock:
+                if not _rebuilds[path][1]:
+                    del _rebuilds[path]
+                    return
+                _rebuilds[path][1] = False
+            try:
+                InventorySnapshot.rebuild(json_file)
+            except OSError:
+                pass  # The snapshot is optional: readers fall back to the JSON store
+
+    @staticmethod
+    def wait_rebuilds():
+        """Wait for the scheduled rebuilds to finish (e.g. before a service exits, or in tests)."""
+        while True:
+            with _rebuilds_lock:
+                threads = [thread for thread, _ in _rebuilds.values()]
+            if not threads:
+                return
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    def open(json_file: str, stamps: dict = None):
+        """
+        Map the store's snapshot and return it, or None when it is missing, stale (the store
+        stamps differ from those it was published at), of another layout or damaged.
+        Pass the stamps when they were just taken, to compare with exactly those.
+        """
+        path = InventorySnapshot.snapshot_path(json_file)
+        stamps = RecordSync.store_stamps(json_file) if stamps is None else stamps
+        try:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: an empty file cannot be mapped
+            return None
+        try:
+            magic, version, byte_order, rows, count, digest = _HEADER.unpack_from(mapped)
+            if (magic, version, byte_order) != (MAGIC, VERSION, _BYTE_ORDER) or digest != InventorySnapshot.digest(path, stamps):
+                return None
+            view, sections = memoryview(mapped), {}
+            for index in range(count):
+                name, offset, size = _SECTION.unpack_from(mapped, _HEADER.size + _SECTION.size * index)
+                if offset + size > len(mapped):
+                    return None
+                sections[name.rstrip(b"\0").decode("ascii")] = view[offset:offset + size]
+            return InventorySnapshot(path, rows, sections, stamps)
+        except (struct.error, KeyError, TypeError, UnicodeDecodeError):
+            return None
+
+    def client_names(self) -> list:
+        """Return the store's client names, in the order the snapshot groups them."""
+        client_pool = self.table.pools[0]
+        return [client_pool[code] for code in self._sections["groups.clients"].cast("I")]
+
+    def groups(self) -> ClientGroups:
+        """Return the table's ClientGroups, read from the snapshot instead of rebuilt row by row."""
+        sections = self._sections
+        return ClientGroups.from_sections(
+            self.table, sections["groups.unknown"], sections["groups.clients"].cast("I"),
+            sections["groups.ends"].cast("I"), sections["groups.rows"].cast("I"), sections["groups.totals"].cast("I"),
+        )
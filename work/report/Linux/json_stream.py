@@ -0,0 +1,257 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]*")
+# Text without brackets, its strings included, then the next bracket outside a string, for
+# skip_value(). Containers holding no other container (e.g. {"serial": ...} entries) are
+# stepped over whole on the way; that needs possessive quantifiers (Python 3.11) to stay linear.
+_FLAT = r'[^"{}\[\]]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"{}\[\]]*+)*+'
+try:
+    _TO_BRACKET = re.compile(rf"{_FLAT}(?:(?:\{{{_FLAT}\}}|\[{_FLAT}\]){_FLAT})*+[{{}}\[\]]", re.DOTALL)
+except re.error:
+    _TO_BRACKET = re.compile(r'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*[{}\[\]]', re.DOTALL)
+_LITERALS = {"true": ("boolean", True), "false": ("boolean", False), "null": ("null", None)}
+
+
+class JsonStreamReader:
+    """
+    Incremental, event-based reader for the store format.
+
+    The reader pulls events one at a time from a binary file, like ijson:
+        start_map, end_map, start_array, end_array, map_key, string, number, boolean, null
+    Between events, skip_value() and read_value() consume the next value as a whole
+    without emitting its inner events: a skipped value is scanned without being built,
+    so memory is bounded by the largest value read (one client's machines) rather than
+    by the whole store, and only the values read are decoded into objects.
+    """
+
+    def __init__(self, file, chunk_size: int = 1 << 20):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._stack = []
+        self._key_next = False
+
+    def _fill(self, keep_from: int = None, size: int = None) -> int:
+        """
+        Read the next chunk into the buffer.
+        Everything before keep_from (default: the current position) is dropped;
+        returns how many characters the buffer was shifted by.
+        """
+        keep_from = self._pos if keep_from is None else keep_from
+        chunk = self.file.read(size or self.chunk_size)
+        self.bytes_read += len(chunk)
+        self._eof = not chunk
+        self._buffer = self._buffer[keep_from:] + self._decoder.decode(chunk, final=self._eof)
+        self._pos -= keep_from
+        return keep_from
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end of the input."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                return ""
+            self._fill()
+
+    def _error(self, message: str):
+        raise json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def _match(self, pattern) -> str:
+        """Match a token at the current position, reading more input if it may be cut off."""
+        while True:
+            match = pattern.match(self._buffer, self._pos)
+            if match and (match.end() < len(self._buffer) or self._eof):
+                self._pos = match.end()
+                return match.group()
+            if self._eof:
+                self._error("Unterminated or invalid token")
+            self._fill()
+
+    def _read_string(self) -> str:
+        token = self._match(_STRING)
+        return token[1:-1] if "\\" not in token else json.loads(token)
+
+    def _separator(self) -> str:
+        """Consume a ',' or ':' between tokens and return the character after it."""
+        ch = self._peek()
+        if ch == ",":
+            if not self._stack:
+                self._error("Unexpected ','")
+            self._pos += 1
+            self._key_next = self._stack[-1] == "{"
+            ch = self._peek()
+        elif ch == ":":
+            self._pos += 1
+            ch = self._peek()
+        return ch
+
+    def next_event(self):
+        """Return the next (event, value) pair, or None at the end of the input."""
+        ch = self._separator()
+        if ch == "":
+            if self._stack:
+                self._error("Unexpected end of input")
+            return None
+        if ch in "{[":
+            self._pos += 1
+            self._stack.append(ch)
+            self._key_next = ch == "{"
+            return ("start_map", None) if ch == "{" else ("start_array", None)
+        if ch in "}]":
+            if not self._stack or "{[".index(self._stack[-1]) != "}]".index(ch):
+                self._error(f"Unexpected {ch!r}")
+            self._pos += 1
+            self._stack.pop()
+            self._key_next = False
+            return ("end_map", None) if ch == "}" else ("end_array", None)
+        if ch == '"':
+            value = self._read_string()
+            if self._key_next:
+                self._key_next = False
+                return ("map_key", value)
+            return ("string", value)
+        if ch == "-" or ch.isdigit():
+            # A number cut at the end of the buffer ("12." or "1e") needs the next chunk first.
+            while not self._eof and _NUMBER_CHARS.match(self._buffer, self._pos).end() == len(self._buffer):
+                self._fill()
+            token = self._match(_NUMBER)
+            return ("number", json.loads(token))
+        for literal, event in _LITERALS.items():
+            while len(self._buffer) - self._pos < len(literal) and not self._eof:
+                self._fill()
+            if self._buffer.startswith(literal, self._pos):
+                self._pos += len(literal)
+                return event
+        self._error(f"Unexpected character {ch!r}")
+
+    def _read_container(self):
+        """
+        Decode the container starting at the current position with the C decoder.
+        When it is cut off by the end of the buffer, at least as much input again is
+        read before retrying, so a value of n bytes costs O(n) decoding in total.
+        """
+        start = self._pos
+        while True:
+            try:
+                value, self._pos = self._json.raw_decode(self._buffer, start)
+                return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._fill(start, max(self.chunk_size, len(self._buffer) - start))
+                start = 0
+
+    def skip_value(self):
+        """
+        Skip the next value without building it: one regex match steps over strings and flat
+        containers up to the next bracket, only brackets are counted in Python, and the buffer
+        is dropped as the scan moves on, so memory stays at one chunk however large the value.
+        The scan costs about what json.load spends on the same bytes; it is not validated.
+        """
+        ch = self._separator()
+        if ch not in "{[":
+            self.read_value()  # Scalars are small; reading one also checks it
+            return
+        # The opening bracket is taken here, or _TO_BRACKET would step over a flat value and past its end.
+        self._pos += 1
+        depth = 1
+        while True:
+            match = _TO_BRACKET.match(self._buffer, self._pos)
+            if match is None:
+                # No bracket before the end of the buffer, or a string is cut off by it: read at
+                # least as much again, so a long stretch without brackets is scanned O(n) times in total.
+                if self._eof:
+                    self._error("Unexpected end of input")
+                self._fill(size=max(self.chunk_size, len(self._buffer) - self._pos))
+                continue
+            self._pos = match.end()
+            if self._buffer[self._pos - 1] in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def read_value(self):
+        """Build and return the next value only."""
+        ch = self._separator()
+        if ch in "{[":
+            return self._read_container()
+        event, value = self.next_event()
+        if event in ("map_key", "end_map", "end_array"):
+            self._error(f"Expected a value, got {event}")
+        return value
+
+    def expect(self, expected: str):
+        """Consume the next event and fail unless it is of the expected type."""
+        event = self.next_event()
+        if event is None or event[0] != expected:
+            self._error(f"Expected {expected}, got {event[0] if event else 'end of input'}")
+        return event[1]
+
+    def iter_map(self):
+        """
+        Yield each key of the map whose start_map was just consumed.
+        The caller must read or skip the value before asking for the next key.
+        """
+        while True:
+            event, value = self.next_event()
+            if event == "end_map":
+                return
+            if event != "map_key":
+                self._error(f"Expected a key, got {event}")
+            yield value
+
+    @staticmethod
+    def client_names(json_file: str) -> list:
+        """Return the client names of a store; machine records are skipped without being built (see skip_value)."""
+        with open(json_file, "rb") as file:
+            reader = JsonStreamReader(file)
+            reader.expect("start_map")
+            names = []
+            for client in reader.iter_map():
+                names.append(client)
+                reader.skip_value()
+            return names
+
+    @staticmethod
+    def client_machines(json_file: str, client_name: str) -> dict:
+        """Return one client's machines, decoded by the C decoder; every other client is skipped without being built. {} if it is absent."""
+        with open(json_file, "rb") as file:
+            reader = JsonStreamReader(file)
+            reader.expect("start_map")
+            for client in reader.iter_map():
+                if client == client_name:
+                    return reader.read_value()
+                reader.skip_value()
+        return {}
+
+    @staticmethod
+    def iter_clients(file):
+        """Yield (client, machines) pairs from an open binary store file, one client at a time."""
+        reader = JsonStreamReader(file)
+        reader.expect("start_map")
+        for client in reader.iter_map():
+            yield client, reader.read_value()
+
+    @staticmethod
+    def iter_machines(file):
+        """Yield (client, machine_sn, record) from an open binary store file, one machine at a time."""
+        reader = JsonStreamReader(file)
+        reader.expect("start_map")
+        for client in reader.iter_map():
+            reader.expect("start_map")
+            for machine_sn in reader.iter_map():
+                yield client, machine_sn, reader.read_value()
@@ -0,0 +1,87 @@
+import hashlib
+from array import array
+
+from component_index import INDEXED_FIELDS, ComponentIndex
+from components import ComponentModel
+from serials import canonical
+
+# Fields making up a machine's fingerprint: every component plus the board's BIOS S/N.
+FINGERPRINT_FIELDS = INDEXED_FIELDS + ("BIOS S/N",)
+
+BANDS = 10
+BAND_ROWS = 2
+SIGNATURE_SIZE = BANDS * BAND_ROWS
+# Lowest share of components two records must have in common to be offered as the same machine.
+MIN_SIMILARITY = 0.4
+# Band buckets holding more machines than this are skipped at lookup: they come from components
+# many machines report alike (a CPU model's processor ID) and would only add weak candidates.
+MAX_BUCKET = 64
+
+
+def tokens(record: dict) -> set:
+    """Return the normalized component serials of a record as "field:serial" tokens; placeholders are left out."""
+    found = set()
+    for field in FINGERPRINT_FIELDS:
+        for serial in ComponentModel.serials(record, field):
+            key = canonical(field, serial)
+            if key:
+                found.add(f"{field}:{key}")
+    return found
+
+
+def signature(record_tokens: set) -> array:
+    """
+    Return the MinHash signature of a token set: for each of SIGNATURE_SIZE hash functions,
+    the smallest hash over the tokens. Each token's SIGNATURE_SIZE hashes come from one SHAKE-128 digest.
+    """
+    hashes = [array("I", hashlib.shake_128(token.encode()).digest(4 * SIGNATURE_SIZE)) for token in record_tokens]
+    return array("I", map(min, *hashes)) if len(hashes) > 1 else (hashes[0] if hashes else array("I"))
+
+
+def similarity(record: dict, other: dict) -> float:
+    """Return the Jaccard similarity of two records' component sets (0.0 when either has none)."""
+    ours, theirs = tokens(record), tokens(other)
+    if not ours or not theirs:
+        return 0.0
+    return len(ours & theirs) / len(ours | theirs)
+
+
+class FingerprintIndex(ComponentIndex):
+    """
+    Locality-sensitive index of machine fingerprints, for finding likely-same machines.
+
+    A machine's fingerprint is the set of its component serials. Its MinHash signature
+    is cut into BANDS bands of BAND_ROWS values, and each band is a bucket key: two
+    machines land in a common bucket with probability 1 - (1 - s**BAND_ROWS)**BANDS for
+    Jaccard similarity s, so a machine with one or two of ten components swapped is
+    found, while unrelated machines are not. A lookup reads BANDS buckets whatever the
+    fleet size; candidates are then scored exactly against their records.
+
+    Stored and updated exactly like the component index: hash buckets next to the store,
+    or in a sharded store's directory.
+    """
+
+    directory_name = "fingerprints"
+
+    @staticmethod
+    def record_keys(record: dict) -> dict:
+        """Return {band key: ""} for a record's LSH bands; a record without components has none."""
+        values = signature(tokens(record))
+        if not values:
+            return {}
+        keys = {}
+        for band in range(BANDS):
+            rows = values[band * BAND_ROWS:(band + 1) * BAND_ROWS].tobytes()
+            keys[f"{band}{hashlib.blake2b(rows, digest_size=6).hexdigest()}"] = ""
+        return keys
+
+    def candidates(self, record: dict) -> list:
+        """Return the [client, machine_sn] pairs sharing a band with a record, most shared bands first."""
+        shared = {}
+        for key in self.record_keys(record):
+            owners = self.owners(key)
+            if len(owners) > MAX_BUCKET:
+                continue
+            for client, machine_sn, _ in owners:
+                shared[(client, machine_sn)] = shared.get((client, machine_sn), 0) + 1
+        return [list(owner) for owner in sorted(shared, key=shared.get, reverse=True)]
@@ -1,15 +1,27 @@
-import json
+import argparse
 import os
+import shutil
 import subprocess
 import glob
 
+from components import ComponentModel
+from serials import canonical, is_placeholder
+from component_index import ComponentIndex
+from component_history import ComponentHistory
+from data_handle import DataHandle
+from duplicate_clusters import DuplicateClusters
+from shard_store import ShardedStore
+from record_export import EXPORT_FORMATS, RecordExport
+from snapshot_diff import SnapshotDiff
+from warranty import WarrantyLookup, describe
+
 def get_machine_serial():
     """Fetch the system's machine serial number using Linux methods."""
     # First attempt: Read from the sysfs entry (usually available on most Linux systems)
     try:
         with open("/sys/class/dmi/id/product_serial", "r") as f:
             machine_sn = f.read().strip()
-            if machine_sn and machine_sn.lower() not in ["", "unknown", "none"]:
+            if not is_placeholder(machine_sn):
                 return machine_sn
     except Exception:
         pass
@@ -17,7 +29,7 @@ def get_machine_serial():
     # Fallback: Use dmidecode command (may require sudo)
     try:
         machine_sn = subprocess.check_output("sudo dmidecode -s system-serial-number", shell=True).decode().strip()
-        if machine_sn and machine_sn.lower() not in ["", "unknown", "none"]:
+        if not is_placeholder(machine_sn):
             return machine_sn
     except Exception:
         pass
@@ -25,7 +37,7 @@ def get_machine_serial():
     try:
         with open("/sys/class/dmi/id/product_uuid", "r") as f:
             machine_uuid = f.read().strip()
-            if machine_uuid and machine_uuid.lower() not in ["", "unknown", "none"]:
+            if not is_placeholder(machine_uuid):
                 return machine_uuid
     except Exception:
         pass
@@ -39,19 +51,20 @@ def get_disk_serial():
     try:
         with open("/sys/block/sda/device/serial", "r") as f:
             disk_sn = f.read().strip()
-            if disk_sn:
+            if not is_placeholder(disk_sn):
                 return disk_sn
     except Exception:
         pass
 
-    # Fallback: Use udevadm to query the device properties
+    # Fallback: Use udevadm to query the device properties (ID_SERIAL_SHORT is the serial alone,
+    # ID_SERIAL prefixes it with the vendor and model)
     try:
         output = subprocess.check_output("udevadm info --query=property --name=/dev/sda", shell=True).decode()
-        for line in output.splitlines():
-            if line.startswith("ID_SERIAL="):
-                disk_sn = line.split("=", 1)[1].strip()
-                if disk_sn:
-                    return disk_sn
+        properties = dict(line.split("=", 1) for line in output.splitlines() if "=" in line)
+        for key in ("ID_SERIAL_SHORT", "ID_SERIAL"):
+            disk_sn = properties.get(key, "").strip()
+            if not is_placeholder(disk_sn):
+                return disk_sn
     except Exception:
         pass
 
@@ -67,7 +80,7 @@ def get_ram_serial():
             line = line.strip()
             if line.startswith("Serial Number:"):
                 serial = line.split(":", 1)[1].strip()
-                if serial and serial.lower() not in ["not installed", "none", ""]:
+                if not is_placeholder(serial):
                     ram_serials.append(serial)
         if ram_serials:
             return ", ".join(ram_serials)
@@ -85,7 +98,7 @@ def get_battery_serial():
             try:
                 with open(serial_path, "r") as f:
                     battery_sn = f.read().strip()
-                    if battery_sn:
+                    if not is_placeholder(battery_sn):
                         return battery_sn
             except Exception:
                 pass
@@ -106,27 +119,23 @@ def save_to_json():
 
     json_file = "client_system_info.json"
 
-    # Load existing data if the JSON file exists
-    if os.path.exists(json_file):
-        with open(json_file, "r") as file:
-            try:
-                existing_data = json.load(file)
-            except json.JSONDecodeError:
-                existing_data = {}
-    else:
-        existing_data = {}
+    # Load existing data (a sharded store is read from its shards)
+    existing_data = DataHandle.load_client_data(json_file)
 
     # Ensure the client entry exists in the JSON data
     if client_name not in existing_data:
         existing_data[client_name] = {}
 
-    # Prevent duplicate machine serial numbers for the same client
-    if machine_sn in existing_data[client_name]:
+    # Prevent duplicate machine serial numbers for the same client, in any case or separator variant
+    machine_key = canonical("Machine S/N", machine_sn)
+    if machine_sn in existing_data[client_name] or machine_key is not None and any(
+        canonical("Machine S/N", listed_sn) == machine_key for listed_sn in existing_data[client_name]
+    ):
         print(f"⚠ Warning: Machine S/N '{machine_sn}' already exists for client '{client_name}'. Not adding a duplicate entry.")
         return
 
     # Handle ambiguous serial numbers (like "Unknown") by appending a counter
-    if machine_sn.lower() in ["unknown", "restricted"]:
+    if is_placeholder(machine_sn):
         base_sn = machine_sn
         counter = 1
         while f"{base_sn}+{counter}" in existing_data[client_name]:
@@ -135,14 +144,13 @@ def save_to_json():
 
     # Add the new machine entry
     existing_data[client_name][machine_sn] = {
-        "Disk S/N": disk_sn,
-        "RAM S/N": ram_sn,
+        "Disk S/N": ComponentModel.to_entries(disk_sn),
+        "RAM S/N": ComponentModel.to_entries(ram_sn),
         "Battery S/N": battery_sn
     }
 
-    # Save updated data to the JSON file
-    with open(json_file, "w") as file:
-        json.dump(existing_data, file, indent=4)
+    # Save updated data, updating the component index, history and viewer snapshot as the GUI does
+    DataHandle.write_client_data(json_file, existing_data, {(client_name, machine_sn): None})
 
     # Display fetched system information
     print("\n✅ **System Information Saved:**")
@@ -152,5 +160,180 @@ def save_to_json():
     print(f"🔋 Battery S/N:  {battery_sn}\n")
     print(f"✅ Data successfully saved to '{json_file}'.")
 
+def migrate_store(json_file):
+    """Convert a store file from comma-joined serial strings to typed component entries."""
+    migrated = ComponentModel.migrate_store(json_file)
+    print(f"✅ Migrated {migrated} machine record(s) in '{json_file}'.")
+
+def locate_component(json_file, serial):
+    """Print which client and machine currently own a component serial."""
+    owners = ComponentIndex.load(json_file).locate(serial)
+    if not owners:
+        print(f"⚠ No machine found with component serial '{serial}'.")
+        return
+    for owner in owners:
+        print(f"🖥  {owner['Client']} / {owner['Machine S/N']}  ({owner['Field']})")
+
+def shard_store(json_file, shard_dir=None):
+    """Split a store file into the sharded per-client layout."""
+    history = ComponentHistory.log_path(json_file)
+    shard_dir = ShardedStore.create(json_file, shard_dir)
+    ComponentIndex.load(shard_dir)
+    if os.path.exists(history):
+        shutil.copyfile(history, ComponentHistory.log_path(shard_dir))
+    print(f"✅ Sharded '{json_file}' into '{shard_dir}' ({len(ShardedStore.client_names(shard_dir))} client(s)).")
+
+def show_history(json_file, serial=None, client=None, machine_sn=None, when=None):
+    """Print where a component serial has been, or a machine's component changes and its state at a time."""
+    history = ComponentHistory.load(json_file)
+    if serial:
+        events = history.serial_events(serial)
+        if not events:
+            print(f"⚠ No history for component serial '{serial}'.")
+        for event in events:
+            action = "added to" if event["Change"] == "+" else "removed from"
+            print(f"{event['Time']}  {action} {event['Client']} / {event['Machine S/N']}  ({event['Field']})")
+        return
+    if not client or not machine_sn:
+        print("⚠ Give a component serial, or --client and --machine.")
+        return
+    if when:
+        state = history.state_at(client, machine_sn, when)
+        if state is None:
+            print(f"⚠ {client} / {machine_sn} did not exist at {when}.")
+            return
+        for field, serials in state.items():
+            print(f"{field}: {', '.join(serials)}")
+        return
+    events = history.machine_events(client, machine_sn)
+    if not events:
+        print(f"⚠ No history for {client} / {machine_sn}.")
+    for event in events:
+        changes = ", ".join(f"{change}{serial} ({field})" for field, change, serial in event["changes"])
+        print(f"{event['time']}  {event['event']}  {changes}")
+
+def export_store(json_file, output, query="", export_format=None):
+    """Stream the machines matching a query to a CSV or XLSX file."""
+    try:
+        written = RecordExport.write_store(json_file, output, query, export_format)
+    except ValueError as error:
+        print(f"⚠ {error}")
+        return
+    print(f"✅ Exported {written} machine(s) to '{output}'.")
+
+def diff_stores(old_file, new_file, output):
+    """Write the differences between two snapshots as JSON lines and print a summary."""
+    with open(output, "w") as file:
+        counts = SnapshotDiff(old_file, new_file).write(file)
+    print(f"✅ {', '.join(f'{count} {change}' for change, count in counts.items())} (details in '{output}').")
+
+def check_warranty(json_file, serials=None, client=None, everything=False, vendor=None, refresh=False):
+    """Print the warranty status of machines given by serial, of one client or of the whole store."""
+    if serials:
+        machines = [(machine_sn, vendor) for machine_sn in serials]
+    elif client or everything:
+        machines = [(machine_sn, vendor) for owner, machine_sn, _ in ShardedStore.iter_store(json_file) if everything or owner == client]
+    else:
+        print("⚠ Give Machine S/Ns, --client or --all.")
+        return
+    results = WarrantyLookup(json_file).lookup(machines, refresh)
+    for machine_sn in dict.fromkeys(machine_sn for machine_sn, _ in machines):
+        result = results[machine_sn]
+        icon = "✅" if result["status"] == "active" else "⚠"
+        print(f"{icon} {machine_sn}  {result.get('vendor') or '-'}  {describe(result)}")
+
+def find_duplicate_clusters(json_file, plan_file=None, apply_plan=None, shown=20):
+    """
+    Print the store's duplicate clusters and their suggested merge plan, optionally saving the plan.
+    apply_plan: "" applies the plan just computed, a path applies a (reviewed) saved plan instead.
+    """
+    if apply_plan:
+        plan = DuplicateClusters.read_plan(apply_plan)
+    else:
+        plan = DuplicateClusters(json_file).scan().plan()
+        for entry in plan[:shown]:
+            keep = entry["keep"]
+            print(f"🖥  keep {keep['client']} / {keep['machine']}")
+            for machine in entry["merge"]:
+                print(f"   ← {machine['client']} / {machine['machine']}  ({machine['reason']}, {machine['similarity']:.0%} similar)")
+        if len(plan) > shown:
+            print(f"... and {len(plan) - shown} more cluster(s); use --plan to save them all.")
+        print(f"✅ {len(plan)} duplicate cluster(s), {sum(len(entry['merge']) for entry in plan)} machine(s) to merge.")
+        if plan_file:
+            DuplicateClusters.write_plan(plan, plan_file)
+            print(f"✅ Merge plan saved to '{plan_file}'.")
+    if apply_plan is not None:
+        merged, removed = DuplicateClusters.apply(json_file, plan)
+        print(f"✅ Merged {merged} cluster(s), {removed} duplicate machine(s) removed.")
+        if merged < len(plan):
+            print(f"⚠ Skipped {len(plan) - merged} cluster(s) whose machines were changed or removed since the plan was made.")
+
+def build_parser():
+    """Build the command line parser; without a command the machine is added interactively."""
+    parser = argparse.ArgumentParser(description="Client system info inventory tools.")
+    commands = parser.add_subparsers(dest="command")
+
+    migrate = commands.add_parser("migrate", help="Convert a store to typed component entries.")
+    migrate.add_argument("json_file", nargs="?", default="client_system_info.json")
+
+    locate = commands.add_parser("locate", help="Find the machine owning a component serial.")
+    locate.add_argument("serial")
+    locate.add_argument("--json-file", default="client_system_info.json")
+
+    shard = commands.add_parser("shard", help="Split a store into one file per client plus a manifest.")
+    shard.add_argument("json_file", nargs="?", default="client_system_info.json")
+    shard.add_argument("--shard-dir", default=None)
+
+    history = commands.add_parser("history", help="Show a component serial's or a machine's component changes.")
+    history.add_argument("serial", nargs="?", default=None)
+    history.add_argument("--client", default=None)
+    history.add_argument("--machine", default=None, help="Machine S/N.")
+    history.add_argument("--at", default=None, help="UTC time such as 2025-03-01T09:00:00Z: print the machine's components then.")
+    history.add_argument("--json-file", default="client_system_info.json")
+
+    diff = commands.add_parser("diff", help="Compare two snapshots: added, removed, moved and changed machines.")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--output", default="snapshot_diff.jsonl", help="JSON lines, one difference per line.")
+
+    duplicates = commands.add_parser("duplicates", help="Find machines filed more than once and suggest how to merge them.")
+    duplicates.add_argument("--json-file", default="client_system_info.json")
+    duplicates.add_argument("--plan", default=None, help="Save the merge plan (JSON) to review or edit.")
+    duplicates.add_argument("--apply", nargs="?", const="", default=None, metavar="PLAN",
+                            help="Merge the clusters: the plan just found, or a saved plan file.")
+
+    warranty = commands.add_parser("warranty", help="Look up the warranty status of machines (cached per vendor).")
+    warranty.add_argument("serials", nargs="*", help="Machine S/Ns; or use --client / --all.")
+    warranty.add_argument("--client", default=None, help="Check every machine of a client.")
+    warranty.add_argument("--all", action="store_true", help="Check every machine in the store.")
+    warranty.add_argument("--vendor", default=None, help="System vendor (e.g. 'Dell Inc.'); guessed from the serial otherwise.")
+    warranty.add_argument("--refresh", action="store_true", help="Ask the vendors again even if cached.")
+    warranty.add_argument("--json-file", default="client_system_info.json")
+
+    export = commands.add_parser("export", help="Export machines matching a query to CSV or XLSX.")
+    export.add_argument("output")
+    export.add_argument("--query", default="", help="Viewer search syntax; use --query='-disk:unknown' when it starts with '-'.")
+    export.add_argument("--json-file", default="client_system_info.json")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default=None, help="Defaults to the output extension.")
+    return parser
+
 if __name__ == "__main__":
-    save_to_json()
+    args = build_parser().parse_args()
+    if args.command == "migrate":
+        migrate_store(args.json_file)
+    elif args.command == "locate":
+        locate_component(args.json_file, args.serial)
+    elif args.command == "shard":
+        shard_store(args.json_file, args.shard_dir)
+    elif args.command == "history":
+        show_history(args.json_file, args.serial, args.client, args.machine, args.at)
+    elif args.command == "diff":
+        diff_stores(args.old, args.new, args.output)
+    elif args.command == "duplicates":
+        find_duplicate_clusters(args.json_file, args.plan, args.apply)
+    elif args.command == "warranty":
+        check_warranty(args.json_file, args.serials, args.client, args.all, args.vendor, args.refresh)
+    elif args.command == "export":
+        export_store(args.json_file, args.output, args.query, args.format)
+    else:
+        save_to_json()
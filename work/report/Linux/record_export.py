@@ -0,0 +1,234 @@
+import csv
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from inventory_snapshot import InventorySnapshot
+from record_query import match_cells, parse_query
+from record_table import COLUMNS, RecordTable
+from shard_store import ShardedStore
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+# Characters XML 1.0 cannot carry; dropped from cell text.
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    "{sheets}</Types>"
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    "<sheets>{sheets}</sheets></workbook>"
+)
+_WORKBOOK_SHEET = '<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>'
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    "{sheets}</Relationships>"
+)
+_WORKBOOK_REL = (
+    '<Relationship Id="rId{index}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>'
+)
+_SHEET_START = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = b"</sheetData></worksheet>"
+
+
+class XlsxWriter:
+    """
+    Minimal streaming XLSX writer.
+
+    Rows are written straight into the deflated worksheet entry of the zip file, as inline
+    strings (no shared-string table), so memory stays flat whatever the row count. A sheet
+    holds at most MAX_ROWS rows; further rows continue on "<name> 2", "<name> 3", ...
+    each starting with the header again. The workbook parts listing the sheets are
+    written on close().
+    """
+
+    MAX_ROWS = 1_048_576  # Excel's row limit per sheet
+    FLUSH_ROWS = 512
+
+    def __init__(self, path: str, header: list = None, sheet_name: str = "Machines"):
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.header = header
+        self.sheet_name = sheet_name
+        self.sheets = 0
+        self._sheet = None
+        self._rows = 0
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush(self):
+        if self._pending:
+            self._sheet.write("".join(self._pending).encode("utf-8"))
+            self._pending = []
+
+    def _close_sheet(self):
+        if self._sheet is not None:
+            self._flush()
+            self._sheet.write(_SHEET_END)
+            self._sheet.close()
+            self._sheet = None
+
+    def _open_sheet(self):
+        self._close_sheet()
+        self.sheets += 1
+        self._sheet = self.zip.open(f"xl/worksheets/sheet{self.sheets}.xml", "w", force_zip64=True)
+        self._sheet.write(_SHEET_START)
+        self._rows = 0
+        if self.header:
+            self._append(self.header)
+
+    def _append(self, values):
+        self._rows += 1
+        cells = "".join(
+            f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_XML_INVALID.sub("", str(value)))}</t></is></c>'
+            for value in values
+        )
+        self._pending.append(f'<row r="{self._rows}">{cells}</row>')
+        if len(self._pending) >= self.FLUSH_ROWS:
+            self._flush()
+
+    def writerow(self, values):
+        if self._sheet is None or self._rows >= self.MAX_ROWS:
+            self._open_sheet()
+        self._append(values)
+
+    def close(self):
+        if self.zip is None:
+            return
+        if self._sheet is None:
+            self._open_sheet()  # An empty export still gets a sheet with its header
+        self._close_sheet()
+        indexes = range(1, self.sheets + 1)
+        names = [escape(self.sheet_name if index == 1 else f"{self.sheet_name} {index}", {'"': "&quot;"}) for index in indexes]
+        self.zip.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+            sheets="".join(_SHEET_CONTENT_TYPE.format(index=index) for index in indexes)))
+        self.zip.writestr("_rels/.rels", _ROOT_RELS)
+        self.zip.writestr("xl/workbook.xml", _WORKBOOK.format(
+            sheets="".join(_WORKBOOK_SHEET.format(name=name, index=index) for name, index in zip(names, indexes))))
+        self.zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.format(
+            sheets="".join(_WORKBOOK_REL.format(index=index) for index in indexes)))
+        self.zip.close()
+        self.zip = None
+
+
+class CsvWriter:
+    """CSV with a UTF-8 byte order mark, so spreadsheet programs detect the encoding."""
+
+    def __init__(self, path: str, header: list = None):
+        self.file = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.file)
+        if header:
+            self.writer.writerow(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writerow(self, values):
+        self.writer.writerow(values)
+
+    def close(self):
+        self.file.close()
+
+
+class RecordExport:
+    """Write machine records to CSV or XLSX one row at a time, never holding the whole sheet."""
+
+    @staticmethod
+    def export_format(path: str, export_format: str = None) -> str:
+        """Return the export format, given explicitly or taken from the file extension."""
+        export_format = (export_format or os.path.splitext(path)[1].lstrip(".")).lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{export_format}' (use {' or '.join(EXPORT_FORMATS)}).")
+        return export_format
+
+    @staticmethod
+    def open_writer(path: str, export_format: str = None):
+        """Open a CSV or XLSX writer with the table header already written."""
+        writer = XlsxWriter if RecordExport.export_format(path, export_format) == "xlsx" else CsvWriter
+        return writer(path, list(COLUMNS))
+
+    @staticmethod
+    def write_table(records: RecordTable, rows, path: str, export_format: str = None, progress=None, every: int = 10_000) -> int:
+        """
+        Write table rows (e.g. the viewer's filtered, sorted order) and return how many were written.
+        progress(count) is called every `every` rows.
+        """
+        count = 0
+        columns = range(len(COLUMNS))
+        with RecordExport.open_writer(path, export_format) as writer:
+            for row in rows:
+                writer.writerow([records.display(row, column) for column in columns])
+                count += 1
+                if progress and count % every == 0:
+                    progress(count)
+        return count
+
+    @staticmethod
+    def write_machines(machines, path: str, query: str = "", export_format: str = None, progress=None, every: int = 10_000) -> int:
+        """
+        Write (client, machine_sn, record) tuples matching a query (see record_query.parse_query)
+        as they arrive, and return how many were written.
+        """
+        terms = parse_query(query)
+        count = 0
+        with RecordExport.open_writer(path, export_format) as writer:
+            for client, machine_sn, record in machines:
+                cells = RecordTable.display_cells(client, machine_sn, record)
+                if terms and not match_cells(terms, cells):
+                    continue
+                writer.writerow(cells)
+                count += 1
+                if progress and count % every == 0:
+                    progress(count)
+        return count
+
+    @staticmethod
+    def write_store(json_file: str, path: str, query: str = "", export_format: str = None, progress=None, every: int = 10_000) -> int:
+        """
+        Stream the store's machines matching a query straight to a file, holding one machine
+        (or one client, when sharded) at a time. Returns the number written.
+        A fresh viewer snapshot (see inventory_snapshot.py) is read instead of parsing the JSON.
+        """
+        snapshot = InventorySnapshot.open(json_file)
+        if snapshot is None:
+            return RecordExport.write_machines(ShardedStore.iter_store(json_file), path, query, export_format, progress, every)
+        terms = parse_query(query)
+        table, columns = snapshot.table, range(len(COLUMNS))
+        rows = range(len(table))
+        if terms:
+            rows = (row for row in rows if match_cells(terms, [table.display(row, column) for column in columns]))
+        return RecordExport.write_table(table, rows, path, export_format, progress, every)
@@ -0,0 +1,138 @@
+from array import array
+from collections import Counter, defaultdict, deque
+from itertools import chain, repeat
+
+from record_table import COLUMNS, RecordTable
+from serials import is_numbered, is_placeholder
+
+# Characters misread on stickers fold to the digit they look like; separators are dropped.
+CONFUSABLES = str.maketrans("OQILZSB", "0011258", " -_:./")
+
+GRAM = 3
+# Shortest folded query worth a fuzzy lookup; shorter ones match too much to be useful.
+MIN_FUZZY_LENGTH = 5
+MAX_DISTANCE = 2
+# Trigrams found in more than 1/STOP_FRACTION of the cells (hex runs, common prefixes) are
+# not counted: they filter nothing and would dominate every lookup.
+STOP_FRACTION = 16
+# Postings hold row * CELL_STRIDE + column.
+CELL_STRIDE = 16
+
+
+def fold(serial: str) -> str:
+    """
+    Normalize a serial for fuzzy matching: uppercase, confusables folded, separators removed.
+    Disk serials carry their model ("MODEL_SERIAL", as udev reports them); only the serial is kept.
+    """
+    return serial.rpartition("_")[2].upper().translate(CONFUSABLES)
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    """Return the Levenshtein distance between a and b, or bound + 1 once it exceeds bound."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """
+    Typo-tolerant lookup of the serials of a RecordTable (every column but Client).
+
+    Serials are folded (see fold()) so O/0, I/1 and similar misreadings cost nothing,
+    then indexed by trigram. A query of n distinct trigrams within edit distance d of a
+    serial shares at least n - 3d of them with it (one edit breaks at most 3), so only
+    cells reaching that count are verified with a bounded edit distance. The count is
+    taken in C over the query's posting lists, which keeps a lookup in the milliseconds
+    at 100k machines.
+
+    Postings point at cells rather than at serial strings, and a candidate cell is
+    folded again to verify it, so the index holds no copy of the serials.
+    Rows appended to the table are indexed on the next lookup.
+    """
+
+    def __init__(self, records: RecordTable):
+        self.records = records
+        self.indexed = 0
+        self.cells = 0
+        self.postings = defaultdict(lambda: array("I"))
+        self.add_rows(range(len(records)))
+
+    @staticmethod
+    def grams(serial: str) -> set:
+        return {serial[start:start + GRAM] for start in range(len(serial) - GRAM + 1)}
+
+    def cell_serials(self, row: int, column: int) -> list:
+        """Return (serial, folded serial) for a cell, leaving out placeholders and very short values."""
+        serials = []
+        for serial in self.records.serials(row, column):
+            if is_placeholder(serial) or is_numbered(serial):
+                continue
+            folded = fold(serial)
+            if len(folded) >= MIN_FUZZY_LENGTH:
+                serials.append((serial, folded))
+        return serials
+
+    def add_rows(self, rows):
+        """Index table rows appended since the last call."""
+        append, get_posting = array.append, self.postings.__getitem__
+        for row in rows:
+            for column in range(1, len(COLUMNS)):
+                serials = self.cell_serials(row, column)
+                if not serials:
+                    continue
+                grams = set().union(*(self.grams(folded) for _, folded in serials))
+                cell = row * CELL_STRIDE + column
+                # Append the cell to every posting list in C instead of a Python loop.
+                deque(map(append, map(get_posting, grams), repeat(cell)), maxlen=0)
+                self.cells += 1
+            self.indexed = max(self.indexed, row + 1)
+
+    def _candidates(self, query: str, distance: int):
+        """Return the cells sharing enough trigrams with the query to hold a serial within distance."""
+        grams = self.grams(query)
+        stop = self.cells // STOP_FRACTION + 1
+        postings = [self.postings[gram] for gram in grams if gram in self.postings]
+        counted = [posting for posting in postings if len(posting) <= stop]
+        if not counted:
+            # Every trigram is common (e.g. a serial of hex runs): count the rarest of them. A serial
+            # within distance shares at least one of any GRAM * distance + 1 of its trigrams.
+            counted = sorted(postings, key=len)[:GRAM * distance + 1]
+            if not counted:
+                return ()
+        # Trigrams too common to count are assumed shared, which keeps the filter safe.
+        required = max(len(grams) - GRAM * distance - (len(postings) - len(counted)), 1)
+        shared = Counter(chain.from_iterable(counted))
+        return [cell for cell, count in shared.items() if count >= required]
+
+    def closest(self, text: str, limit: int = 10, column: int = None, removed=(), max_distance: int = MAX_DISTANCE) -> list:
+        """
+        Return up to limit machines holding a serial close to text, as (distance, row, column, serial)
+        sorted by distance, then row, optionally in one column and leaving out removed rows.
+        Distances above max_distance are not considered, and short queries allow fewer edits so
+        the trigram filter stays exact. Returns [] for a query too short.
+        """
+        if self.indexed < len(self.records):
+            self.add_rows(range(self.indexed, len(self.records)))
+        query = fold(text.strip())
+        if len(query) < MIN_FUZZY_LENGTH:
+            return []
+        distance = min(max_distance, (len(query) - GRAM) // GRAM)
+
+        best = {}
+        for cell in self._candidates(query, distance):
+            row, cell_column = divmod(cell, CELL_STRIDE)
+            if row in removed or column is not None and cell_column != column:
+                continue
+            for serial, folded in self.cell_serials(row, cell_column):
+                found = edit_distance(query, folded, distance)
+                if found <= distance and (row not in best or found < best[row][0]):
+                    best[row] = (found, row, cell_column, serial)
+        return sorted(best.values())[:limit]
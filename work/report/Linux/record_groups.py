@@ -0,0 +1,111 @@
+from array import array
+
+from components import MULTI_VALUED_FIELDS, ComponentModel
+from record_table import COLUMNS, RecordTable
+
+
+class ClientGroups:
+    """
+    Machines of a RecordTable grouped by client, with aggregates precomputed once per load.
+
+    - unknown[row] is the number of component serials of a machine that are missing or
+      placeholders; it is computed from a flag per distinct value, so each value is only
+      classified once however many machines share it.
+    - rows maps each client to its live rows, in table order; unknown_totals sums them.
+    apply() keeps both in step with live store changes (see RecordSync.apply).
+    """
+
+    def __init__(self, records: RecordTable, build: bool = True):
+        self.records = records
+        self.unknown = bytearray()
+        self._unknown_codes = [bytearray() for _ in COLUMNS]
+        self.rows = {}
+        self.unknown_totals = {}
+        if build:
+            self.add_rows(range(len(records)))
+
+    @classmethod
+    def from_sections(cls, records: RecordTable, unknown, clients, ends, rows, totals) -> "ClientGroups":
+        """
+        Rebuild groups saved by inventory_snapshot without a pass over the rows: unknown[] per row,
+        and per group its client's value code, the end of its slice of rows and its unknown total.
+        """
+        groups = cls(records, build=False)
+        groups.unknown = bytearray(unknown)
+        pool, start = records.pools[0], 0
+        for code, end, total in zip(clients, ends, totals):
+            client_rows = array("I")
+            client_rows.frombytes(rows[start:end].cast("B"))
+            groups.rows[pool[code]] = client_rows
+            groups.unknown_totals[pool[code]] = total
+            start = end
+        return groups
+
+    def _unknown_flags(self, column: int) -> bytearray:
+        """Return, per value code of a component column, 1 if the value counts as an unknown serial."""
+        flags, pool = self._unknown_codes[column], self.records.pools[column]
+        multi_valued = COLUMNS[column] in MULTI_VALUED_FIELDS
+        for code in range(len(flags), len(pool)):
+            value = pool[code]
+            flags.append(not value if multi_valued else ComponentModel.is_placeholder(value))
+        return flags
+
+    def _count_unknown(self, rows):
+        """Extend unknown[] up to the last of rows (new rows only)."""
+        end = max(rows, default=-1) + 1
+        if end <= len(self.unknown):
+            return
+        start = len(self.unknown)
+        # One flag string per column, then summed row-wise; both loops run in C.
+        flags = [
+            bytes(map(self._unknown_flags(column).__getitem__, self.records.codes[column][start:end]))
+            for column in range(2, len(COLUMNS))
+        ]
+        self.unknown.extend(map(sum, zip(*flags)))
+
+    def add_rows(self, rows):
+        """Group new table rows under their clients."""
+        rows = list(rows)
+        self._count_unknown(rows)
+        pool, codes = self.records.pools[0], self.records.codes[0]
+        clients = {}
+        for row in rows:
+            code = codes[row]
+            client = clients.get(code)
+            if client is None:
+                client = clients[code] = pool[code]
+            self.rows.setdefault(client, array("I")).append(row)
+            self.unknown_totals[client] = self.unknown_totals.get(client, 0) + self.unknown[row]
+
+    def remove_rows(self, rows):
+        """
+        Drop retired table rows from their clients (a client left without machines is removed).
+        Each client touched is filtered in one pass, however many of its rows go.
+        """
+        dropped = {}
+        for row in rows:
+            dropped.setdefault(self.records.value(row, 0), set()).add(row)
+        for client, client_dropped in dropped.items():
+            client_rows = array("I", (row for row in self.rows[client] if row not in client_dropped))
+            self.unknown_totals[client] -= sum(map(self.unknown.__getitem__, client_dropped))
+            if client_rows:
+                self.rows[client] = client_rows
+            else:
+                del self.rows[client], self.unknown_totals[client]
+
+    def apply(self, removed, replaced, inserted):
+        """Apply the result of RecordSync.apply(): removed rows, {old row: new row} and inserted rows."""
+        self.remove_rows(list(removed) + list(replaced))
+        self.add_rows(list(replaced.values()) + list(inserted))
+
+    def subset(self, rows) -> dict:
+        """Group only the given rows (e.g. a search result), as {client: array of rows}."""
+        pool, codes = self.records.pools[0], self.records.codes[0]
+        by_code = {}
+        for row in rows:
+            by_code.setdefault(codes[row], array("I")).append(row)
+        grouped = {}
+        for code, client_rows in by_code.items():
+            # Values added after freezing may repeat a client under a second code.
+            grouped.setdefault(pool[code], array("I")).extend(client_rows)
+        return grouped
@@ -0,0 +1,485 @@
+from array import array
+from bisect import bisect_right
+from itertools import compress
+
+from PyQt6.QtCore import QAbstractItemModel, QAbstractTableModel, QModelIndex, Qt
+
+from components import RECORD_FIELDS
+from record_table import COLUMNS, RecordTable
+
+# A store diff inserting or removing more rows than this rebuilds the view order in one pass
+# instead of moving the order arrays once per row.
+BULK_CHANGES = 256
+
+
+def _positions(rows: array, wanted) -> dict:
+    """Return {row: index in rows} for the wanted rows found, in one pass that stops once all are found."""
+    wanted = set(wanted)
+    position = {}
+    if not wanted:
+        return position
+    for index, row in enumerate(rows):
+        if row in wanted:
+            position[row] = index
+            if len(position) == len(wanted):
+                break
+    return position
+
+
+class RecordTableModel(QAbstractTableModel):
+    """
+    Table model over a columnar RecordTable.
+
+    Cells are produced lazily in data(), so only the rows the view actually paints cost
+    anything. The model keeps the view order as an array of table row numbers, which is
+    what sorting (and filtering) rearrange; the RecordTable itself is never copied.
+    The full sorted order is kept, so applying a filter is one linear pass over a row mask.
+
+    The model only shows the table rows it has been told about (set_records, append_rows),
+    so a loader thread may keep appending to the table while the view paints earlier rows.
+    """
+
+    def __init__(self, records: RecordTable = None, parent=None):
+        super().__init__(parent)
+        self._records = records if records is not None else RecordTable()
+        self._size = len(self._records)
+        self._order = array("I", range(self._size))
+        self._sort_column = None
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        self._ranks = {}
+        self._sorted = None  # Every table row in sort order, None while unsorted
+        self._visible = None  # Row mask of the current filter, None when showing all rows
+
+    @property
+    def records(self) -> RecordTable:
+        return self._records
+
+    def set_records(self, records: RecordTable):
+        """Replace the backing table and show all of its rows."""
+        self.beginResetModel()
+        self._records = records
+        self._size = len(records)
+        self._order = array("I", range(self._size))
+        self._ranks = {}
+        self._sorted = None
+        self._visible = None
+        self.endResetModel()
+        if self._sort_column is not None:
+            self.sort(self._sort_column, self._sort_order)
+
+    def append_rows(self, size: int):
+        """
+        Show the table rows appended up to size. They are added at the end of the view;
+        call sort() again to place them, and set_visible_rows() to filter them.
+        """
+        first = self._size
+        if size <= first:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._order), len(self._order) + size - first - 1)
+        self._order.extend(range(first, size))
+        if self._sorted is not None:
+            self._sorted.extend(range(first, size))
+        if self._visible is not None:
+            self._visible.extend(b"\x01" * (size - first))
+        self._size = size
+        self._ranks = {}  # New rows can bring new values
+        self.endInsertRows()
+
+    def resort(self):
+        """Sort again by the current sort column, e.g. once appended rows are complete."""
+        if self._sort_column is not None:
+            self.sort(self._sort_column, self._sort_order)
+
+    def source_row(self, view_row: int) -> int:
+        """Return the RecordTable row shown at a view row."""
+        return self._order[view_row]
+
+    def view_rows(self) -> array:
+        """Return a copy of the RecordTable rows in view order (filtered and sorted), e.g. for export."""
+        return array("I", self._order)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        return self._records.display(self._order[index.row()], index.column())
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section]
+        return section + 1
+
+    def _rank(self, column: int) -> array:
+        """Return the sort rank of every distinct value of a column, indexed by value code."""
+        if column in self._ranks:
+            return self._ranks[column]
+        pool = self._records.pools[column]
+        by_value = sorted(range(len(pool)), key=lambda code: pool[code].lower())
+        ranks = array("I", bytes(4 * len(pool)))
+        for rank, code in enumerate(by_value):
+            ranks[code] = rank
+        self._ranks[column] = ranks
+        return ranks
+
+    def _set_order(self, order: array):
+        """Change the view order while keeping selections and other persistent indexes."""
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        kept_rows = [self._order[index.row()] for index in persistent]
+        self._order = order
+        position = _positions(order, kept_rows)
+        self.changePersistentIndexList(
+            persistent,
+            [
+                self.index(position[row], index.column()) if row in position else QModelIndex()
+                for index, row in zip(persistent, kept_rows)
+            ],
+        )
+        self.layoutChanged.emit()
+
+    def _view_order(self) -> array:
+        """Return the sorted rows that pass the current filter."""
+        rows = self._sorted if self._sorted is not None else range(self._size)
+        if self._visible is None:
+            return array("I", rows)
+        if self._sorted is None:
+            return array("I", compress(rows, self._visible))
+        return array("I", compress(rows, map(self._visible.__getitem__, rows)))
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        """Sort by comparing precomputed value ranks instead of cell strings."""
+        self._sort_column, self._sort_order = column, order
+        if not self._size:
+            return
+        ranks = self._rank(column)
+        codes = self._records.codes[column]
+        self._sorted = array("I", sorted(
+            self._sorted if self._sorted is not None else range(self._size),
+            key=lambda row: ranks[codes[row]],
+            reverse=order == Qt.SortOrder.DescendingOrder,
+        ))
+        self._set_order(self._view_order())
+
+    def _sort_key(self, row: int) -> str:
+        return self._records.value(row, self._sort_column).lower()
+
+    def _sorted_position(self, rows: array, row: int) -> int:
+        """Binary search for where a row belongs in sorted rows (after rows with an equal value)."""
+        key, low, high = self._sort_key(row), 0, len(rows)
+        descending = self._sort_order == Qt.SortOrder.DescendingOrder
+        while low < high:
+            middle = (low + high) // 2
+            other = self._sort_key(rows[middle])
+            if (key > other) if descending else (key < other):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def apply_changes(self, removed=(), replaced=None, inserted=()):
+        """
+        Apply a store diff to the view in place, at a cost that follows the number of changes:
+        - removed: table rows to drop
+        - replaced: {old row: new row} for updated machines, swapped in at the same position
+        - inserted: new table rows, placed at their sorted position
+        Rows are inserted and removed with the matching model signals, so the view keeps its
+        selection and scroll position; a diff of more than BULK_CHANGES rows resets the model
+        after one pass instead. Inserted rows are shown until the next set_visible_rows().
+        """
+        replaced = replaced or {}
+        if self._sorted is None:
+            # From now on retired rows must stay out of the order, so it is kept explicitly.
+            self._sorted = array("I", range(self._size))
+        size = len(self._records)
+        if self._visible is not None:
+            self._visible.extend(bytes(size - len(self._visible)))
+        self._ranks = {}  # New rows can bring new values
+        self._size = size
+
+        # Every changed row is located once per diff, not searched for one at a time.
+        changed = set(replaced) | set(removed)
+        in_sorted, in_order = _positions(self._sorted, changed), _positions(self._order, changed)
+
+        resort = False
+        for old, new in replaced.items():
+            self._sorted[in_sorted[old]] = new
+            if self._visible is not None:
+                self._visible[new] = self._visible[old]
+            if self._sort_column is not None and self._sort_key(old) != self._sort_key(new):
+                resort = True
+            if old in in_order:
+                view_row = in_order[old]
+                self._order[view_row] = new
+                self.dataChanged.emit(self.index(view_row, 0), self.index(view_row, self.columnCount() - 1))
+
+        if len(removed) + len(inserted) > BULK_CHANGES:
+            # One pass over the order, and one reset instead of a signal per row.
+            self.beginResetModel()
+            dropped = set(removed)
+            self._sorted = array("I", (row for row in self._sorted if row not in dropped))
+            self._sorted.extend(inserted)
+            if self._visible is not None:
+                for row in inserted:
+                    self._visible[row] = 1
+            if self._sort_column is not None:
+                ranks, codes = self._rank(self._sort_column), self._records.codes[self._sort_column]
+                self._sorted = array("I", sorted(
+                    self._sorted, key=lambda row: ranks[codes[row]],
+                    reverse=self._sort_order == Qt.SortOrder.DescendingOrder,
+                ))
+            self._order = self._view_order()
+            self.endResetModel()
+            return
+
+        # Removed from the end backwards, so the positions found above stay valid.
+        for position in sorted((in_sorted[row] for row in removed), reverse=True):
+            del self._sorted[position]
+        for view_row in sorted((in_order[row] for row in removed if row in in_order), reverse=True):
+            self.beginRemoveRows(QModelIndex(), view_row, view_row)
+            del self._order[view_row]
+            self.endRemoveRows()
+
+        for row in inserted:
+            if self._visible is not None:
+                self._visible[row] = 1
+            if self._sort_column is None:
+                self._sorted.append(row)
+                view_row = len(self._order)
+            else:
+                self._sorted.insert(self._sorted_position(self._sorted, row), row)
+                view_row = self._sorted_position(self._order, row)
+            self.beginInsertRows(QModelIndex(), view_row, view_row)
+            self._order.insert(view_row, row)
+            self.endInsertRows()
+
+        if resort:
+            self.resort()
+
+    def set_visible_rows(self, rows):
+        """Show only the given RecordTable rows (in the current sort order) as one batch; None shows all."""
+        if rows is None:
+            self._visible = None
+        else:
+            visible = bytearray(self._size)
+            for row in rows:
+                if row < self._size:
+                    visible[row] = 1
+            self._visible = visible
+        self._set_order(self._view_order())
+
+
+# Tree columns: client rows show aggregates in the first three, machine rows show every field.
+TREE_COLUMNS = ("Client / Machine S/N", "Machines", "Unknown S/N") + RECORD_FIELDS
+
+
+class ClientTreeModel(QAbstractItemModel):
+    """
+    Machines grouped under one node per client (see record_groups.ClientGroups).
+
+    Client rows show the machine count and unknown-serial count, which are known without
+    touching any machine. Machines are only added to the model when a client is
+    expanded, FETCH_BATCH at a time (canFetchMore/fetchMore), so a client with
+    thousands of machines costs nothing until it is opened.
+
+    Each client gets a stable node id, used as the internal id of its machines' indexes,
+    so clients can be added and removed without invalidating other clients' children.
+    """
+
+    FETCH_BATCH = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._groups = None
+        self._nodes = []  # node id - 1 -> [client, rows array, fetched count, unknown total]
+        self._top = []  # node ids in display order (client name, case-insensitive)
+        self._top_rows = {}  # node id -> its row in _top, for parent() which Qt calls constantly
+        self._subset = False  # True while the nodes hold a subset of the rows, e.g. a search result
+        self._fetching = False
+
+    def set_groups(self, groups, grouped: dict = None):
+        """Show groups.rows, or a subset of them such as groups.subset(search result); None clears the tree."""
+        self.beginResetModel()
+        self._groups = groups
+        self._subset = grouped is not None
+        grouped = {} if groups is None else groups.rows if grouped is None else grouped
+        unknown = groups.unknown if groups is not None else b""
+        self._nodes = [
+            [client, array("I", rows), 0, sum(map(unknown.__getitem__, rows))]
+            for client, rows in grouped.items()
+        ]
+        self._top = sorted(range(1, len(self._nodes) + 1), key=lambda node: self._nodes[node - 1][0].lower())
+        self._top_rows = {}
+        self._renumber_top(0)
+        self.endResetModel()
+
+    def _renumber_top(self, start: int):
+        """Update _top_rows for the top-level rows from start on, after a client row was inserted or removed there."""
+        for top_row in range(start, len(self._top)):
+            self._top_rows[self._top[top_row]] = top_row
+
+    def _node(self, index: QModelIndex):
+        """Return the client node of a client index or of a machine index."""
+        node = index.internalId() or self._top[index.row()]
+        return self._nodes[node - 1]
+
+    def index(self, row: int, column: int, parent=QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+        return self.createIndex(row, column, self._top[parent.row()])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid() or not index.internalId():
+            return QModelIndex()
+        return self.createIndex(self._top_rows[index.internalId()], 0, 0)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if not parent.isValid():
+            return len(self._top)
+        if parent.internalId() or parent.column():
+            return 0
+        return self._node(parent)[2]
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return len(TREE_COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()) -> bool:
+        if not parent.isValid():
+            return bool(self._top)
+        return not parent.internalId() and not parent.column() and bool(self._node(parent)[1])
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if self._fetching or not parent.isValid() or parent.internalId():
+            return False
+        node = self._node(parent)
+        return node[2] < len(node[1])
+
+    def fetchMore(self, parent: QModelIndex):
+        if not self.canFetchMore(parent):
+            return
+        node = self._node(parent)
+        count = min(self.FETCH_BATCH, len(node[1]) - node[2])
+        # Views may ask to fetch again from inside the insert signals; not before it is done.
+        self._fetching = True
+        self.beginInsertRows(parent, node[2], node[2] + count - 1)
+        node[2] += count
+        self.endInsertRows()
+        self._fetching = False
+
+    def source_row(self, index: QModelIndex):
+        """Return the RecordTable row of a machine index, or None for a client index."""
+        if not index.isValid() or not index.internalId():
+            return None
+        return self._nodes[index.internalId() - 1][1][index.row()]
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        column = index.column()
+        if not index.internalId():
+            client, rows, _, unknown = self._node(index)
+            return (client, f"{len(rows):,}", f"{unknown:,}")[column] if column < 3 else None
+        row = self.source_row(index)
+        if column == 0:
+            return self._groups.records.value(row, 1)
+        if column == 1:
+            return None
+        if column == 2:
+            return str(self._groups.unknown[row])
+        return self._groups.records.display(row, column - 1)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return TREE_COLUMNS[section]
+        return None
+
+    def _client_changed(self, node_id: int):
+        top_row = self._top_rows[node_id]
+        self.dataChanged.emit(self.index(top_row, 1), self.index(top_row, 2))
+
+    def apply_changes(self, removed=(), replaced=None, inserted=()):
+        """
+        Apply a store diff (see RecordTableModel.apply_changes) to the client nodes in place.
+        While a subset is shown, changed rows outside it are skipped and inserted rows are left
+        out: whether they match is up to the search, which regroups the tree when it runs again.
+        """
+        replaced = replaced or {}
+        records, unknown = self._groups.records, self._groups.unknown
+        by_client = {node[0]: node_id for node_id, node in enumerate(self._nodes, start=1) if node[0] is not None}
+
+        # Every changed row is located with one pass over its client's rows, not searched for one at a time.
+        changed = {}
+        for row in list(replaced) + list(removed):
+            node_id = by_client.get(records.value(row, 0))
+            if node_id is not None:
+                changed.setdefault(node_id, []).append(row)
+        positions = {node_id: _positions(self._nodes[node_id - 1][1], rows) for node_id, rows in changed.items()}
+
+        for old, new in replaced.items():
+            node_id = by_client.get(records.value(old, 0))
+            position = positions.get(node_id, {}).get(old)
+            if position is None:
+                continue  # Not in the shown subset
+            node = self._nodes[node_id - 1]
+            node[1][position] = new
+            node[3] += unknown[new] - unknown[old]
+            self._client_changed(node_id)
+            if position < node[2]:
+                parent = self.index(self._top_rows[node_id], 0)
+                self.dataChanged.emit(self.index(position, 0, parent), self.index(position, len(TREE_COLUMNS) - 1, parent))
+
+        dropped = {}
+        for row in removed:
+            node_id = by_client.get(records.value(row, 0))
+            position = positions.get(node_id, {}).get(row)
+            if position is not None:  # Else not in the shown subset
+                dropped.setdefault(node_id, []).append((position, row))
+        for node_id, node_dropped in dropped.items():
+            node = self._nodes[node_id - 1]
+            # Removed from the end backwards, so the positions found above stay valid.
+            for position, row in sorted(node_dropped, reverse=True):
+                fetched = position < node[2]
+                if fetched:
+                    self.beginRemoveRows(self.index(self._top_rows[node_id], 0), position, position)
+                del node[1][position]
+                node[3] -= unknown[row]
+                if fetched:
+                    node[2] -= 1
+                    self.endRemoveRows()
+            if node[1]:
+                self._client_changed(node_id)
+                continue
+            # The client has no machines left: drop its row; the node id is retired with it.
+            top_row = self._top_rows[node_id]
+            self.beginRemoveRows(QModelIndex(), top_row, top_row)
+            del self._top[top_row], self._top_rows[node_id]
+            self._renumber_top(top_row)
+            self.endRemoveRows()
+            del by_client[node[0]]
+            node[0] = None
+
+        for row in () if self._subset else inserted:
+            client = records.value(row, 0)
+            node_id = by_client.get(client)
+            if node_id is None:
+                # A new client: its node id is never reused, the top-level row is placed by name.
+                self._nodes.append([client, array("I"), 0, 0])
+                node_id = by_client[client] = len(self._nodes)
+                keys = [self._nodes[other - 1][0].lower() for other in self._top]
+                top_row = bisect_right(keys, client.lower())
+                self.beginInsertRows(QModelIndex(), top_row, top_row)
+                self._top.insert(top_row, node_id)
+                self._renumber_top(top_row)
+                self.endInsertRows()
+            node = self._nodes[node_id - 1]
+            node[1].append(row)
+            node[3] += unknown[row]
+            self._client_changed(node_id)
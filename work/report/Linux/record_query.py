@@ -0,0 +1,246 @@
+import shlex
+from array import array
+from bisect import bisect_left
+from itertools import compress
+
+from components import MULTI_VALUED_FIELDS, RECORD_FIELDS
+from record_search import SearchIndex
+from record_table import COLUMNS, RecordTable
+from serials import canonical, compact
+
+# Field prefixes accepted in queries: the first word of each column name ("client:", "disk:", ...).
+FIELD_ALIASES = {column.split()[0].lower(): column_index for column_index, column in enumerate(COLUMNS)}
+
+# Columns whose exact and prefix terms compare serial keys rather than the displayed text.
+SERIAL_COLUMNS = ("Machine S/N",) + RECORD_FIELDS
+
+SUBSTRING, PREFIX, EXACT = "substring", "prefix", "exact"
+# Cheapest terms are evaluated first, so the expensive ones only check what is left.
+MODE_COST = {EXACT: 0, PREFIX: 1, SUBSTRING: 2}
+
+
+class QueryTerm:
+    """One parsed query term: a lowercase value, the column it is scoped to (None for any) and how it matches."""
+
+    __slots__ = ("column", "value", "mode", "negate")
+
+    def __init__(self, column, value: str, mode: str = SUBSTRING, negate: bool = False):
+        self.column = column
+        self.value = value
+        self.mode = mode
+        self.negate = negate
+
+
+def parse_query(text: str) -> list:
+    """
+    Parse a search bar query into QueryTerms. Terms are ANDed together:
+    - word            the word appears in any column
+    - disk:word       the word appears in the Disk S/N column (any field alias, see FIELD_ALIASES)
+    - disk:=serial    a disk serial is exactly this value
+    - disk:prefix*    a disk serial starts with this value
+    - -term           negation of any of the above
+    - client:"a b"    quotes keep spaces inside one value
+    Matching is case-insensitive; exact and prefix serials also ignore separators and the
+    vendor/model prefix udev puts on disks (see entry_keys). A prefix that is not a known field is part of the
+    word, so MAC addresses such as 52:00:a5 are searched as they are.
+    """
+    try:
+        tokens = shlex.split(text)
+    except ValueError:
+        tokens = text.split()  # Unbalanced quote while the user is still typing
+
+    terms = []
+    for token in tokens:
+        negate = token.startswith("-") and len(token) > 1
+        if negate:
+            token = token[1:]
+        column, mode = None, SUBSTRING
+        field, separator, value = token.partition(":")
+        if separator and field.lower() in FIELD_ALIASES:
+            column, token = FIELD_ALIASES[field.lower()], value
+            if token.startswith("="):
+                mode, token = EXACT, token[1:]
+            elif token.endswith("*"):
+                mode, token = PREFIX, token[:-1]
+        if token:  # "disk:" alone is an unfinished term
+            terms.append(QueryTerm(column, token.lower(), mode, negate))
+    return terms
+
+
+def entry_keys(column: int, entry: str) -> set:
+    """
+    Return the lowercase keys one entry of a cell is found by with exact and prefix terms.
+    Serials are found by their canonical and compact forms (see serials), so "disk:=S3UANX0M508687"
+    finds the disk udev lists as "SAMSUNG_..._S3UANX0M508687" and "nic:=3c7c3f2b39cd" a MAC
+    written with colons; other columns by their text.
+    """
+    if COLUMNS[column] not in SERIAL_COLUMNS:
+        return {entry}
+    return {key.lower() for key in (canonical(COLUMNS[column], entry), compact(entry)) if key} or {entry}
+
+
+def term_key(term: "QueryTerm") -> str:
+    """Return the key an exact or prefix term is compared with (see entry_keys)."""
+    return compact(term.value).lower() if COLUMNS[term.column] in SERIAL_COLUMNS else term.value
+
+
+def match_cells(terms: list, cells: list) -> bool:
+    """
+    Evaluate parsed terms against one row's displayed cells, without any index.
+    Used when streaming records from the store; gives the same result as RecordQuery.search.
+    """
+    lowered = [cell.lower() for cell in cells]
+    for term in terms:
+        if term.column is None:
+            found = any(term.value in cell for cell in lowered)
+        elif term.mode == SUBSTRING:
+            found = term.value in lowered[term.column]
+        else:
+            cell, value = lowered[term.column], term_key(term)
+            entries = cell.split(", ") if COLUMNS[term.column] in MULTI_VALUED_FIELDS else (cell,)
+            keys = [key for entry in entries for key in entry_keys(term.column, entry)]
+            if term.mode == EXACT:
+                found = value in keys
+            else:
+                found = any(key.startswith(value) for key in keys)
+        if found == term.negate:
+            return False
+    return True
+
+
+class ColumnIndex:
+    """
+    Hash and sorted indexes over the lowercase entries of one column, by their entry_keys.
+    Multi-valued cells contribute one entry per serial (an empty cell is "unknown", as displayed).
+    - rows maps each key to the array of rows holding it (exact matches)
+    - keys is the sorted list of keys (prefix matches by bisection)
+    """
+
+    def __init__(self, records: RecordTable, column: int):
+        self.records = records
+        self.column = column
+        self.rows = {}
+        self.keys = []
+        self.add_rows(range(len(records)))
+
+    def add_rows(self, rows):
+        codes, pool = self.records.codes[self.column], self.records.pools[self.column]
+        multi_valued = COLUMNS[self.column] in MULTI_VALUED_FIELDS
+        new_keys = []
+        for row in rows:
+            value = pool[codes[row]].lower()
+            entries = (value.split(", ") if value else ("unknown",)) if multi_valued else (value,)
+            for key in {key for entry in entries for key in entry_keys(self.column, entry)}:
+                posting = self.rows.get(key)
+                if posting is None:
+                    posting = self.rows[key] = array("I")
+                    new_keys.append(key)
+                posting.append(row)
+        if len(new_keys) > 64:
+            self.keys = sorted(self.rows)
+        else:
+            for key in new_keys:
+                self.keys.insert(bisect_left(self.keys, key), key)
+
+    def exact(self, value: str) -> array:
+        return self.rows.get(value, array("I"))
+
+    def prefix(self, value: str) -> set:
+        rows = set()
+        keys = self.keys
+        position = bisect_left(keys, value)
+        while position < len(keys) and keys[position].startswith(value):
+            rows.update(self.rows[keys[position]])
+            position += 1
+        return rows
+
+
+class RecordQuery:
+    """
+    Evaluates parsed queries against a RecordTable.
+
+    Unscoped words use the SearchIndex (trigram index and row haystacks); exact and
+    prefix terms use a ColumnIndex, built the first time its column is queried; scoped
+    substring terms take the SearchIndex candidates and verify them against the column.
+    A query made only of plain words goes straight to SearchIndex.search, which keeps
+    its fast path for a query that refines the previous one while typing.
+    """
+
+    def __init__(self, records: RecordTable):
+        self.records = records
+        self.search_index = SearchIndex(records)
+        self.columns = {}
+        self.removed = set()
+        self.indexed = len(records)
+        self.fuzzy = None  # FuzzyIndex, attached once built (see closest())
+
+    def column_index(self, column: int) -> ColumnIndex:
+        if column not in self.columns:
+            self.columns[column] = ColumnIndex(self.records, column)
+        return self.columns[column]
+
+    def add_rows(self, rows):
+        """Index table rows appended since the last call."""
+        rows = list(rows)
+        self.search_index.add_rows(rows)
+        for index in self.columns.values():
+            index.add_rows(rows)
+        if rows:
+            self.indexed = max(self.indexed, rows[-1] + 1)
+
+    def remove_rows(self, rows):
+        """Stop matching table rows that were deleted or superseded."""
+        rows = list(rows)
+        self.removed.update(rows)
+        self.search_index.remove_rows(rows)
+
+    def _term_rows(self, term: QueryTerm, candidates=None):
+        """Return the rows matching a term (ignoring negation), among sorted candidates if given."""
+        if term.column is None:
+            return self.search_index.match(term.value, candidates)
+        if term.mode == SUBSTRING:
+            if candidates is None:
+                candidates = self.search_index.match(term.value)
+            value, display, column = term.value, self.records.display, term.column
+            return array("I", (row for row in candidates if value in display(row, column).lower()))
+
+        index = self.column_index(term.column)
+        found = index.exact(term_key(term)) if term.mode == EXACT else index.prefix(term_key(term))
+        if candidates is None:
+            return array("I", sorted(found))
+        found = found if isinstance(found, set) else set(found)
+        return array("I", compress(candidates, map(found.__contains__, candidates)))
+
+    def closest(self, text: str, limit: int = 10) -> list:
+        """
+        Return the machines holding a serial within a few typos of a single-term query, as
+        (distance, row, column, serial) (see FuzzyIndex.closest). A scoped term ("disk:S3UANX")
+        only looks at its column. Returns [] for other queries or until a FuzzyIndex is attached.
+        """
+        terms = parse_query(text)
+        if self.fuzzy is None or len(terms) != 1 or terms[0].negate:
+            return []
+        return self.fuzzy.closest(terms[0].value, limit, terms[0].column, self.removed)
+
+    def search(self, text: str):
+        """Return the sorted rows matching a query, or None when the query is empty and every row matches."""
+        terms = parse_query(text)
+        if not terms:
+            self.search_index.search("")
+            return None
+        if all(term.column is None and not term.negate and " " not in term.value for term in terms):
+            return self.search_index.search(" ".join(term.value for term in terms))
+
+        rows = None
+        for term in sorted((term for term in terms if not term.negate), key=lambda term: MODE_COST[term.mode]):
+            rows = self._term_rows(term, rows)
+            if not rows:
+                return array("I")
+        if rows is None:
+            rows = array("I", range(len(self.records)))
+        for term in (term for term in terms if term.negate):
+            excluded = set(self._term_rows(term, rows))
+            rows = array("I", (row for row in rows if row not in excluded))
+        if self.removed:
+            rows = array("I", (row for row in rows if row not in self.removed))
+        return rows
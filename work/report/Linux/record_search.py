@@ -0,0 +1,164 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, deque
+from itertools import compress, repeat
+
+from record_table import COLUMNS, RecordTable
+
+# Separates cells inside a row's haystack so a word never matches across two columns.
+CELL_SEPARATOR = "\x1f"
+
+GRAM = 3
+# Shortest word the trigram index can answer: it holds the trigrams starting at every
+# GRAM-th character of a cell, and a word this long always contains one of them.
+MIN_INDEXED_WORD = 2 * GRAM - 1
+# A word whose rarest trigram is in more than 1/SCAN_FRACTION of the rows is scanned instead.
+SCAN_FRACTION = 8
+
+
+class SearchIndex:
+    """
+    Precomputed, lowercase search haystacks for every row of a RecordTable, plus a trigram index.
+
+    Haystacks are built once per load, so a keystroke never re-joins or re-lowercases a
+    row. Words of MIN_INDEXED_WORD characters or more (pasted serials, serial tails) are
+    answered from the trigram index: the posting lists of the word's trigrams are
+    intersected, across all words, before the few candidate rows are verified, so the
+    cost follows the number of candidates rather than the fleet size. Shorter words
+    are tested with map(str.__contains__) and itertools.compress, which keeps the
+    per-row loop in C. When a query refines the previous one (the user keeps typing),
+    only the previous hits are checked.
+
+    To keep the index a third of the size of a full trigram index, only the trigrams
+    starting at every GRAM-th character of each cell are stored; a query looks up each
+    of the GRAM possible alignments of the word and unions the results.
+
+    Rows are added with add_rows() as they are appended to the table and dropped with
+    remove_rows(); row numbers only grow, so posting lists stay sorted.
+    """
+
+    def __init__(self, records: RecordTable):
+        self.records = records
+        self.haystacks = []
+        self.postings = defaultdict(lambda: array("I"))
+        self._last_words = None
+        self._last_rows = None
+        self.add_rows(range(len(records)))
+
+    def __len__(self) -> int:
+        return len(self.haystacks)
+
+    @staticmethod
+    def grams(haystack: str) -> set:
+        """Return the aligned trigrams of every cell of a haystack."""
+        grams = set()
+        for cell in haystack.split(CELL_SEPARATOR):
+            grams.update(cell[start:start + GRAM] for start in range(0, len(cell) - GRAM + 1, GRAM))
+        return grams
+
+    def add_rows(self, rows):
+        """Index table rows appended since the last call (rows must be new and increasing)."""
+        columns = range(len(COLUMNS))
+        display = self.records.display
+        get_posting, append = self.postings.__getitem__, array.append
+        for row in rows:
+            haystack = CELL_SEPARATOR.join(display(row, column) for column in columns).lower()
+            if row >= len(self.haystacks):
+                self.haystacks.extend(repeat("", row + 1 - len(self.haystacks)))
+            self.haystacks[row] = haystack
+            # Append the row to every posting list in C instead of a Python loop.
+            deque(map(append, map(get_posting, self.grams(haystack)), repeat(row)), maxlen=0)
+        self._last_words = self._last_rows = None
+
+    def remove_rows(self, rows):
+        """Stop matching table rows that were deleted or superseded."""
+        for row in rows:
+            # Stale postings still point at the row; verification against "" rejects it.
+            self.haystacks[row] = ""
+        self._last_words = self._last_rows = None
+
+    @staticmethod
+    def _intersect(postings: list) -> set:
+        """Intersect sorted posting lists, smallest first."""
+        postings.sort(key=len)
+        rows = set(postings[0])
+        for posting in postings[1:]:
+            if not rows:
+                break
+            if len(rows) * 16 < len(posting):
+                # Few candidates left: probe the long list by bisection instead of reading it all.
+                size = len(posting)
+                rows = {
+                    row for row in rows
+                    if (position := bisect_left(posting, row)) < size and posting[position] == row
+                }
+            else:
+                rows.intersection_update(posting)
+        return rows
+
+    def _indexed_candidates(self, word: str):
+        """
+        Return a superset of the rows containing the word, from the trigram index,
+        or None when its trigrams are too common for the index to beat a scan.
+        """
+        candidates = set()
+        empty = array("I")
+        for alignment in range(GRAM):
+            grams = {word[start:start + GRAM] for start in range(alignment, len(word) - GRAM + 1, GRAM)}
+            postings = [self.postings.get(gram, empty) for gram in grams]
+            if min(map(len, postings)) * SCAN_FRACTION > len(self.haystacks):
+                return None
+            candidates.update(self._intersect(postings))
+        return candidates
+
+    def _match(self, word: str, candidates=None) -> array:
+        """Return the rows (among candidates, or all rows) whose haystack contains the word."""
+        if candidates is None:
+            return array("I", compress(range(len(self.haystacks)), map(str.__contains__, self.haystacks, repeat(word))))
+        haystacks = map(self.haystacks.__getitem__, candidates)
+        return array("I", compress(candidates, map(str.__contains__, haystacks, repeat(word))))
+
+    def match(self, word: str, candidates=None) -> array:
+        """Return the rows (among sorted candidates, or all rows) containing one lowercase word."""
+        if candidates is None and len(word) >= MIN_INDEXED_WORD:
+            found = self._indexed_candidates(word)
+            if found is not None:
+                candidates = array("I", sorted(found))
+        return self._match(word, candidates)
+
+    def _refines_last(self, words: list) -> bool:
+        """True if every previous word is contained in a new word, so hits can only shrink."""
+        return self._last_words is not None and all(
+            any(old in new for new in words) for old in self._last_words
+        )
+
+    def search(self, text: str):
+        """
+        Return the rows matching every whitespace-separated word (case-insensitive),
+        or None when the query is empty and every row matches.
+        """
+        words = text.lower().split()
+        if not words:
+            self._last_words = self._last_rows = None
+            return None
+
+        rows = self._last_rows if self._refines_last(words) else None
+        if rows is None:
+            # AND across words: intersect the candidates of every indexed word before verifying.
+            candidates = None
+            for word in sorted(set(words), key=len, reverse=True):
+                if len(word) < MIN_INDEXED_WORD:
+                    continue
+                found = self._indexed_candidates(word)
+                if found is not None:
+                    candidates = found if candidates is None else candidates & found
+                    if not candidates:
+                        break
+            if candidates is not None:
+                rows = array("I", sorted(candidates))
+        # Longest words first: they are the most selective and shrink the candidates fastest.
+        for word in sorted(set(words), key=len, reverse=True):
+            rows = self._match(word, rows)
+
+        self._last_words, self._last_rows = words, rows
+        return rows
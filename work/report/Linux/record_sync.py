@@ -0,0 +1,187 @@
+import os
+
+from json_stream import JsonStreamReader
+from record_table import RecordTable
+from shard_store import ShardedStore
+
+
+class RecordSync:
+    """
+    Keeps a loaded RecordTable in step with the store it was read from.
+
+    diff() re-reads the store and compares it with the table, keyed by (client, machine S/N):
+    - Single-file store: every machine is re-read (the file has no finer unit of change),
+      but only the changed ones are returned.
+    - Sharded store: only the shards whose mtime or size changed are read.
+    apply() turns a diff into table rows. The table is append-only, so an updated machine
+    gets a new row and its old row is retired; callers drop retired rows from their views
+    and indexes. Only one diff or apply may run at a time.
+    """
+
+    def __init__(self, json_file: str, records: RecordTable, stamps: dict = None):
+        self.json_file = json_file
+        self.records = records
+        # Built by the first diff() that finds a change (or the first find()):
+        self._rows = None  # hash((client, machine_sn)) -> row, or a list of rows on collision
+        self._client_rows = None  # client -> {live row: None}, in row order
+        self.retired = 0
+        # Stamp the store before it is loaded, so changes made during the load are caught;
+        # a table read from a snapshot passes the stamps the snapshot was taken at.
+        self._stamps = self.stamps() if stamps is None else stamps
+
+    def live_count(self) -> int:
+        """Return the number of machines, leaving out retired rows."""
+        return len(self.records) - self.retired
+
+    def stamps(self) -> dict:
+        return RecordSync.store_stamps(self.json_file)
+
+    @staticmethod
+    def store_stamps(json_file: str) -> dict:
+        """Return {file: (mtime_ns, size)} for the store file, or for every shard and the manifest."""
+        shard_dir = ShardedStore.shard_dir(json_file)
+        paths = [json_file]
+        if shard_dir:
+            paths = [os.path.join(shard_dir, "manifest.json")]
+            shards = os.path.join(shard_dir, "shards")
+            paths.extend(os.path.join(shards, shard) for shard in ShardedStore._manifest(shard_dir)["clients"].values())
+        stamps = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def _build_keys(self):
+        self._rows, self._client_rows = {}, {}
+        # Walk the code columns rather than value(): one pool lookup per distinct client.
+        clients, serials = self.records.pools[0], self.records.pools[1]
+        client_names = {}
+        for row, (client_code, serial_code) in enumerate(zip(self.records.codes[0], self.records.codes[1])):
+            client = client_names.get(client_code)
+            if client is None:
+                client = client_names[client_code] = clients[client_code]
+            key = hash((client, serials[serial_code]))
+            current = self._rows.get(key)
+            if current is None:
+                self._rows[key] = row
+            elif isinstance(current, list):
+                current.append(row)
+            else:
+                self._rows[key] = [current, row]
+            self._client_rows.setdefault(client, {})[row] = None
+
+    def _add(self, row: int):
+        client, machine_sn = self.records.value(row, 0), self.records.value(row, 1)
+        key = hash((client, machine_sn))
+        current = self._rows.get(key)
+        if current is None:
+            self._rows[key] = row
+        elif isinstance(current, list):
+            current.append(row)
+        else:
+            self._rows[key] = [current, row]
+        self._client_rows.setdefault(client, {})[row] = None
+
+    def _discard(self, row: int):
+        client, machine_sn = self.records.value(row, 0), self.records.value(row, 1)
+        key = hash((client, machine_sn))
+        current = self._rows.get(key)
+        if isinstance(current, list):
+            current.remove(row)
+            if len(current) == 1:
+                self._rows[key] = current[0]
+        elif current == row:
+            del self._rows[key]
+        del self._client_rows[client][row]
+
+    def find(self, client: str, machine_sn: str):
+        """Return the live row of a machine, or None."""
+        if self._rows is None:
+            self._build_keys()
+        current = self._rows.get(hash((client, machine_sn)))
+        for row in current if isinstance(current, list) else (current,):
+            if row is not None and self.records.value(row, 1) == machine_sn and self.records.value(row, 0) == client:
+                return row
+        return None
+
+    def _changed_shards(self, shard_dir: str, stamps: dict):
+        """Yield (client, machines) for the clients whose shard changed, and (client, {}) for removed clients."""
+        manifest = ShardedStore._manifest(shard_dir)["clients"]
+        shards = os.path.join(shard_dir, "shards")
+        for client, shard in manifest.items():
+            path = os.path.join(shards, shard)
+            if stamps.get(path) != self._stamps.get(path):
+                yield client, ShardedStore._read_shard(shard_dir, shard)
+        for client in set(self._client_rows) - set(manifest):
+            yield client, {}
+
+    def diff(self):
+        """
+        Compare the store with the table. Returns (inserted, updated, removed):
+        - inserted: [(client, machine_sn, record)] for machines not in the table
+        - updated: [(row, client, machine_sn, record)] for machines whose record changed
+        - removed: [row] for machines no longer in the store
+        Raises json.JSONDecodeError while the store is being rewritten; retry later.
+        """
+        stamps = self.stamps()
+        inserted, updated, removed = [], [], []
+        if stamps == self._stamps:
+            return inserted, updated, removed
+        # The row maps are built on the first change, not on load: an unchanged store never needs them.
+        if self._rows is None:
+            self._build_keys()
+
+        shard_dir = ShardedStore.shard_dir(self.json_file)
+        if shard_dir:
+            clients = list(self._changed_shards(shard_dir, stamps))
+            machines = ((client, machine_sn, record) for client, records in clients for machine_sn, record in records.items())
+            candidates = [row for client, _ in clients for row in self._client_rows.get(client, ())]
+        else:
+            machines = self._read_machines()
+            candidates = None
+
+        seen = set()
+        for client, machine_sn, record in machines:
+            row = self.find(client, machine_sn)
+            if row is None:
+                inserted.append((client, machine_sn, record))
+                continue
+            seen.add(row)
+            if not self.records.matches(row, record):
+                updated.append((row, client, machine_sn, record))
+        if candidates is None:
+            candidates = (row for rows in self._client_rows.values() for row in rows)
+        removed = [row for row in candidates if row not in seen]
+        self._stamps = stamps
+        return inserted, updated, removed
+
+    def _read_machines(self):
+        # A half-written file raises part way through; the partial diff is simply discarded.
+        try:
+            with open(self.json_file, "rb") as file:
+                yield from JsonStreamReader.iter_machines(file)
+        except FileNotFoundError:
+            return
+
+    def apply(self, changes):
+        """
+        Apply a diff to the table. Returns (removed rows, {old row: new row}, inserted rows):
+        removed and old rows are retired, new and inserted rows were appended.
+        """
+        inserted, updated, removed = changes
+        replaced = {}
+        for row, client, machine_sn, record in updated:
+            self._discard(row)
+            replaced[row] = self.records.append(client, machine_sn, record)
+            self._add(replaced[row])
+        for row in removed:
+            self._discard(row)
+        self.retired += len(removed) + len(replaced)
+        new_rows = []
+        for client, machine_sn, record in inserted:
+            new_rows.append(self.records.append(client, machine_sn, record))
+            self._add(new_rows[-1])
+        return removed, replaced, new_rows
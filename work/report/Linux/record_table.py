@@ -0,0 +1,231 @@
+from array import array
+
+from components import MULTI_VALUED_FIELDS, RECORD_FIELDS, ComponentModel
+
+# Table columns as shown by the viewer: the two keys followed by every component field.
+COLUMNS = ("Client", "Machine S/N") + RECORD_FIELDS
+
+
+class ValuePool:
+    """
+    Dictionary encoding for one column: each distinct value is stored once and referenced by code.
+
+    Once frozen, the distinct values are packed into a single UTF-8 blob with an offsets
+    array, so a value costs its bytes plus four instead of a full Python string object.
+    Values appended after freezing stay in a small tail list until the next freeze, and
+    are only deduplicated among themselves: rebuilding the lookup for every packed value
+    would undo the packing for the sake of a few live updates.
+    The blob and offsets may be read-only buffers of a memory-mapped snapshot (see
+    from_buffers); the next freeze copies them before packing new values.
+    """
+
+    __slots__ = ("_blob", "_offsets", "_tail", "_codes")
+
+    def __init__(self):
+        self._blob = b""
+        self._offsets = array("I", [0])
+        self._tail = []
+        self._codes = {}
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1 + len(self._tail)
+
+    def __getitem__(self, code: int) -> str:
+        packed = len(self._offsets) - 1
+        if code >= packed:
+            return self._tail[code - packed]
+        return str(self._blob[self._offsets[code]:self._offsets[code + 1]], "utf-8")
+
+    def encode(self, value: str) -> int:
+        if self._codes is None:
+            self._codes = {}
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self)
+            self._tail.append(value)
+            self._codes[value] = code
+        return code
+
+    def freeze(self):
+        """Pack the pending values into the blob and drop the value -> code lookup."""
+        if self._tail:
+            if not isinstance(self._offsets, array):
+                self._offsets, self._blob = array("I", self._offsets), bytes(self._blob)
+            encoded = [value.encode("utf-8") for value in self._tail]
+            offset = self._offsets[-1]
+            for chunk in encoded:
+                offset += len(chunk)
+                self._offsets.append(offset)
+            self._blob += b"".join(encoded)
+            self._tail = []
+        self._codes = None
+
+    def buffers(self) -> tuple:
+        """Return the packed (offsets, blob) of a frozen pool."""
+        return self._offsets, self._blob
+
+    @classmethod
+    def from_buffers(cls, offsets, blob) -> "ValuePool":
+        """Return a frozen pool over packed offsets (uint32 items) and a UTF-8 blob, without copying them."""
+        pool = cls()
+        pool._offsets, pool._blob, pool._codes = offsets, blob, None
+        return pool
+
+
+class MachineRecord:
+    """Lightweight row view returned by RecordTable.record()."""
+
+    __slots__ = ("client", "machine_sn", "values")
+
+    def __init__(self, client: str, machine_sn: str, values: tuple):
+        self.client = client
+        self.machine_sn = machine_sn
+        # One value per RECORD_FIELDS entry, as stored in the table.
+        self.values = values
+
+    def get(self, field: str, default=None):
+        try:
+            return self.values[RECORD_FIELDS.index(field)]
+        except ValueError:
+            return default
+
+
+class RecordTable:
+    """
+    Columnar, dictionary-encoded machine records for the loader and the viewer.
+
+    Every column is an array of 4-byte codes into a ValuePool, so repeated values such as
+    "Unknown", "N/A" or a client name are stored once, and distinct values are packed into
+    one blob per column. Multi-valued fields are kept as one ", "-joined string of serials.
+    A table opened from a snapshot (see inventory_snapshot.py) reads its codes and pools
+    straight from the mapped file; the first append copies the codes into arrays.
+    """
+
+    def __init__(self):
+        self.pools = [ValuePool() for _ in COLUMNS]
+        self.codes = [array("I") for _ in COLUMNS]
+        self._query = None
+        self._mapped = False  # True while the codes are read-only views of the snapshot
+
+    def __len__(self) -> int:
+        return len(self.codes[0])
+
+    @staticmethod
+    def _cell(field: str, value) -> str:
+        """Convert a stored field value to its compact form."""
+        if field in MULTI_VALUED_FIELDS:
+            return ", ".join(ComponentModel.serials({field: value}, field))
+        return "Unknown" if value is None else str(value)
+
+    @staticmethod
+    def display_cells(client: str, machine_sn: str, record: dict) -> list:
+        """Return the cells a record would display in the table, without storing it (for streaming)."""
+        cells = [client, machine_sn]
+        for field in RECORD_FIELDS:
+            cell = RecordTable._cell(field, record.get(field, "Unknown"))
+            cells.append(cell if cell or field not in MULTI_VALUED_FIELDS else "Unknown")
+        return cells
+
+    def append(self, client: str, machine_sn: str, record: dict) -> int:
+        """Append one machine record and return its row number."""
+        if self._mapped:
+            self._own_codes()
+        cells = [client, machine_sn]
+        cells.extend(self._cell(field, record.get(field, "Unknown")) for field in RECORD_FIELDS)
+        for column, cell in enumerate(cells):
+            self.codes[column].append(self.pools[column].encode(cell))
+        return len(self) - 1
+
+    def _own_codes(self):
+        """Copy codes read from a snapshot into arrays, so rows can be appended."""
+        owned = []
+        for codes in self.codes:
+            column = array("I")
+            column.frombytes(memoryview(codes).cast("B"))
+            owned.append(column)
+        self.codes, self._mapped = owned, False
+
+    def freeze(self):
+        """Pack the columns and release the build-time lookup maps once loading is done."""
+        for pool in self.pools:
+            pool.freeze()
+
+    def value(self, row: int, column: int) -> str:
+        """Return the stored value of a cell (multi-valued cells are ", "-joined, "" if empty)."""
+        return self.pools[column][self.codes[column][row]]
+
+    def serials(self, row: int, column: int) -> list:
+        """Return the serials of a cell as a list."""
+        value = self.value(row, column)
+        if COLUMNS[column] in MULTI_VALUED_FIELDS:
+            return value.split(", ") if value else []
+        return [value]
+
+    def display(self, row: int, column: int) -> str:
+        """Return the text shown for a cell."""
+        value = self.value(row, column)
+        return value if value or COLUMNS[column] not in MULTI_VALUED_FIELDS else "Unknown"
+
+    def matches(self, row: int, record: dict) -> bool:
+        """True if the row already holds this record's values, as append() would store them."""
+        return all(
+            self.value(row, column) == self._cell(field, record.get(field, "Unknown"))
+            for column, field in enumerate(RECORD_FIELDS, start=2)
+        )
+
+    def record(self, row: int) -> MachineRecord:
+        values = tuple(self.value(row, column) for column in range(2, len(COLUMNS)))
+        return MachineRecord(self.value(row, 0), self.value(row, 1), values)
+
+    def to_dict(self, row: int) -> dict:
+        """Return a row in the store's record shape (multi-valued fields as typed entries)."""
+        record = {}
+        for column, field in enumerate(RECORD_FIELDS, start=2):
+            if field in MULTI_VALUED_FIELDS:
+                record[field] = [{"serial": serial} for serial in self.serials(row, column)]
+            else:
+                record[field] = self.value(row, column)
+        return record
+
+    def query_index(self):
+        """Return the RecordQuery over this table, built on first use and extended with appended rows."""
+        from record_query import RecordQuery  # record_query builds on this module
+
+        if self._query is None:
+            self._query = RecordQuery(self)
+        elif self._query.indexed < len(self):
+            self._query.add_rows(range(self._query.indexed, len(self)))
+        return self._query
+
+    def query(self, text: str):
+        """
+        Return the rows matching a query such as "disk:S3UANX client:=gg245 -battery:unknown"
+        (see record_query.parse_query), or None when the query is empty.
+        """
+        return self.query_index().search(text)
+
+    @classmethod
+    def from_machines(cls, machines) -> "RecordTable":
+        """Build a frozen table from an iterable of (client, machine_sn, record)."""
+        table = cls()
+        for client, machine_sn, record in machines:
+            table.append(client, machine_sn, record)
+        table.freeze()
+        return table
+
+    @classmethod
+    def from_buffers(cls, pools: list, codes: list) -> "RecordTable":
+        """Return a table over packed pools and read-only per-column codes (uint32 items), e.g. mapped from a snapshot."""
+        table = cls()
+        table.pools, table.codes, table._mapped = pools, codes, True
+        return table
+
+    @classmethod
+    def from_data(cls, data: dict) -> "RecordTable":
+        """Build a frozen table from a store dictionary."""
+        return cls.from_machines(
+            (client, machine_sn, record)
+            for client, machines in data.items()
+            for machine_sn, record in machines.items()
+        )
+
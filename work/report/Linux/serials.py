@@ -0,0 +1,88 @@
+import re
+
+# Version of the keys below; indexes built with other keys are rebuilt (bump when canonical() changes).
+KEY_VERSION = 2
+
+# Values the probes and BIOS vendors report when there is no real serial, compared case-insensitively.
+PLACEHOLDERS = frozenset({
+    "", "unknown", "n/a", "na", "none", "null", "default string", "to be filled by o.e.m.",
+    "to be filled by oem", "system serial number", "chassis serial number", "base board serial number",
+    "serial number", "not specified", "not applicable", "not available", "not installed", "no dimm",
+    "empty", "o.e.m.", "oem", "invalid", "restricted", "restricted by bios",
+})
+
+# Filler serials once separators are dropped and the case folded: runs of one character
+# ("00000000", "FFFFFFFF-FFFF-...", "XXXXXXXX"), counting sequences, dmidecode's "SerNum0"
+# style RAM slots and the UUID many AMI boards ship with.
+_FILLER = re.compile(r"(.)\1*|0?123456789(0|ABCDEF)?|SERNUM\d*|03000200040005000006000700080009")
+
+# "Unknown+3": a placeholder Machine S/N numbered to keep several machines apart in one client.
+_NUMBERED = re.compile(r"(.*)\+\d+")
+
+
+def compact(value) -> str:
+    """Return a serial uppercased, without the separators of MAC addresses, UUIDs and pasted whitespace."""
+    # Chained replace() is about three times faster than str.translate for serial-sized strings.
+    return str(value).strip().upper().replace(":", "").replace("-", "").replace(" ", "").replace("\t", "")
+
+
+def is_placeholder(value) -> bool:
+    """Return True if the value carries no serial information."""
+    if value is None:
+        return True
+    text = str(value).strip()
+    if text.lower() in PLACEHOLDERS:
+        return True
+    key = compact(text)
+    return not key or _FILLER.fullmatch(key) is not None
+
+
+def is_numbered(value) -> bool:
+    """Return True for a numbered placeholder Machine S/N such as "Unknown+3"."""
+    if value is None or "+" not in str(value):
+        return False
+    match = _NUMBERED.fullmatch(str(value).strip())
+    return match is not None and is_placeholder(match.group(1))
+
+
+def _disk_serial(serial: str) -> str:
+    # udev's ID_SERIAL is VENDOR_MODEL_SERIAL; sysfs and ID_SERIAL_SHORT hold the serial alone.
+    return serial.rpartition("_")[2]
+
+
+# Field -> function returning the part of a raw value that identifies the component.
+_CANONICAL = {"Disk S/N": _disk_serial}
+
+
+def canonical(field: str, value) -> str:
+    """
+    Return the key a serial is compared and indexed by, or None for a placeholder.
+    The same disk reported as "SAMSUNG_MZNLN512HAJQ-00007_S3UANX0M508687" (udev) and as
+    "S3UANX0M508687" (sysfs) gets one key, and so do "3c:7c:3f:2b:39:cd" and "3C7C3F2B39CD".
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    if text.lower() in PLACEHOLDERS:
+        return None
+    key = compact(_CANONICAL[field](text) if field in _CANONICAL else text)
+    return None if not key or _FILLER.fullmatch(key) else key
+
+
+def lookup_keys(value) -> set:
+    """
+    Return the keys to look up a serial of unknown field by: its compact form, plus its
+    canonical disk serial when it looks like udev's VENDOR_MODEL_SERIAL.
+    """
+    if is_placeholder(value):
+        return set()
+    found = {compact(value), canonical("Disk S/N", value)}
+    found.discard(None)
+    return found
+
+
+def identity(value) -> str:
+    """Return the matching key of a Machine S/N or BIOS S/N, or None for placeholders and "Unknown+N" siblings."""
+    if is_numbered(value):
+        return None
+    return canonical("Machine S/N", value)
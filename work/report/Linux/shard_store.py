@@ -0,0 +1,408 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import stat
+import tempfile
+import zlib
+from contextlib import contextmanager
+
+from json_stream import JsonStreamReader
+from serials import KEY_VERSION, canonical, identity, is_numbered, is_placeholder
+
+# Number of hash buckets for the key indexes; a write only rewrites the buckets of its keys.
+BUCKETS = 256
+
+
+def _new_file_mode() -> int:
+    """Return the permission bits open() gives a new file under the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_file(path: str, mode: str = "w", sync: bool = False):
+    """
+    Yield a temporary file in the same directory as path and move it into place once written.
+    The file keeps path's permission bits (or a new file's under the umask), not mkstemp's 0600,
+    so other users and the viewer can still read a store, index or snapshot replaced this way.
+    sync flushes the file to disk before the move, so a crash leaves the old or the new file
+    and never an empty one; stores need it, sidecars that can be rebuilt from them do not.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1], dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, mode) as file:
+            yield file
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        try:
+            permissions = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            permissions = _new_file_mode()
+        os.chmod(tmp_path, permissions)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_json(path: str, data, indent=None, sync: bool = False):
+    """Write JSON to a temporary file in the same directory and move it into place (see atomic_file)."""
+    with atomic_file(path, sync=sync) as file:
+        # dumps encodes in one call of the C encoder; dump would hand the file one chunk at a time.
+        file.write(json.dumps(data, indent=indent))
+
+
+@contextmanager
+def _locked(directory: str, name: str):
+    """Hold an exclusive advisory lock named after a client, bucket or the manifest."""
+    lock_dir = os.path.join(directory, "locks")
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, name), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class KeyBuckets:
+    """
+    Hash-partitioned postings (key -> list of owners) stored as one small JSON file per bucket.
+    Owners are lists starting with [client, machine_sn, ...]. The version of the keys is
+    kept in a "version" file; buckets written with other keys do not count as existing.
+    A "stamp" file may record what the buckets were built from.
+    """
+
+    def __init__(self, directory: str, version: int = 1):
+        self.directory = directory
+        self.version = version
+        self._cache = {}
+
+    @staticmethod
+    def bucket_of(key: str) -> str:
+        return f"{zlib.crc32(key.encode()) % BUCKETS:02x}"
+
+    def exists(self) -> bool:
+        if not os.path.isdir(self.directory):
+            return False
+        try:
+            with open(os.path.join(self.directory, "version"), "r") as file:
+                version = int(file.read())
+        except (FileNotFoundError, ValueError):
+            version = 1  # Buckets written before keys were versioned
+        return version == self.version
+
+    def stamp(self):
+        """Return the stamp saved with set_stamp (e.g. the stat of the store indexed), or None."""
+        try:
+            with open(os.path.join(self.directory, "stamp"), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def set_stamp(self, stamp):
+        atomic_write_json(os.path.join(self.directory, "stamp"), stamp)
+
+    def _path(self, bucket: str) -> str:
+        return os.path.join(self.directory, f"{bucket}.json")
+
+    def read(self, bucket: str) -> dict:
+        try:
+            with open(self._path(bucket), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get(self, key: str) -> list:
+        """Return the owners of a key, reading (and caching) only its bucket."""
+        bucket = self.bucket_of(key)
+        if bucket not in self._cache:
+            self._cache[bucket] = self.read(bucket)
+        return self._cache[bucket].get(key, [])
+
+    def write_all(self, postings: dict):
+        """Replace every bucket with the given postings."""
+        os.makedirs(self.directory, exist_ok=True)
+        buckets = {f"{n:02x}": {} for n in range(BUCKETS)}
+        for key, owners in postings.items():
+            buckets[self.bucket_of(key)][key] = owners
+        for bucket, content in buckets.items():
+            atomic_write_json(self._path(bucket), content)
+        atomic_write_json(os.path.join(self.directory, "version"), self.version)
+        self._cache.clear()
+
+    def update(self, removed: list, added: list):
+        """
+        Apply changes bucket by bucket under a per-bucket lock.
+        - removed: (key, client, machine_sn) postings to drop.
+        - added: (key, owner) postings to append.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        changes = {}
+        for key, client, machine_sn in removed:
+            changes.setdefault(self.bucket_of(key), ([], []))[0].append((key, client, machine_sn))
+        for key, owner in added:
+            changes.setdefault(self.bucket_of(key), ([], []))[1].append((key, owner))
+
+        for bucket in sorted(changes):
+            bucket_removed, bucket_added = changes[bucket]
+            with _locked(self.directory, f"bucket-{bucket}"):
+                postings = self.read(bucket)
+                for key, client, machine_sn in bucket_removed:
+                    owners = [o for o in postings.get(key, []) if o[0] != client or o[1] != machine_sn]
+                    if owners:
+                        postings[key] = owners
+                    else:
+                        postings.pop(key, None)
+                for key, owner in bucket_added:
+                    postings.setdefault(key, []).append(owner)
+                atomic_write_json(self._path(bucket), postings)
+            self._cache.pop(bucket, None)
+
+
+class ShardedStore:
+    """
+    Optional store layout with one JSON file per client plus a small manifest:
+
+        client_system_info.d/
+            manifest.json          {"version": 1, "clients": {client: shard file}}
+            shards/<client>.json   {machine_sn: record} for that client only
+            identity/<bucket>.json Machine S/N and BIOS S/N -> owning (client, machine)
+
+    A save reads and rewrites only its own client's shard. The identity buckets tell the
+    cross-client duplicate check which other shards to load, and per-client locks let
+    independent clients be written in parallel.
+    """
+
+    version = 1
+
+    @staticmethod
+    def shard_dir(json_file: str):
+        """Return the sharded directory that replaces a store file, or None if it is not sharded."""
+        if os.path.isfile(os.path.join(json_file, "manifest.json")):
+            return json_file
+        candidate = os.path.splitext(json_file)[0] + ".d"
+        if os.path.isfile(os.path.join(candidate, "manifest.json")):
+            return candidate
+        return None
+
+    @staticmethod
+    def _shard_name(client: str) -> str:
+        """Return a file name for a client that is safe on disk and unique per name."""
+        slug = re.sub(r"[^A-Za-z0-9._-]", "_", client)[:40]
+        digest = hashlib.sha1(client.encode()).hexdigest()[:8]
+        return f"{slug}-{digest}.json"
+
+    @staticmethod
+    def _manifest(shard_dir: str) -> dict:
+        with open(os.path.join(shard_dir, "manifest.json"), "r") as file:
+            return json.load(file)
+
+    @staticmethod
+    def identity(shard_dir: str) -> KeyBuckets:
+        """Return the identity index, rebuilding it from the shards when it was built with other keys."""
+        buckets = KeyBuckets(os.path.join(shard_dir, "identity"), KEY_VERSION)
+        if not buckets.exists():
+            buckets.write_all(ShardedStore._identity_postings(ShardedStore.iter_clients(shard_dir)))
+        return buckets
+
+    @staticmethod
+    def identity_keys(machine_sn: str, record: dict) -> list:
+        """Return the identity index keys of a machine: its canonical Machine S/N and BIOS S/N (see serials)."""
+        keys = []
+        machine_key = identity(machine_sn)
+        if machine_key:
+            keys.append(f"M:{machine_key}")
+        bios_key = identity(record.get("BIOS S/N"))
+        if bios_key:
+            keys.append(f"B:{bios_key}")
+        return keys
+
+    @staticmethod
+    def _identity_postings(clients) -> dict:
+        """Return the identity postings of (client, machines) pairs."""
+        postings = {}
+        for client, machines in clients:
+            for machine_sn, record in machines.items():
+                for key in ShardedStore.identity_keys(machine_sn, record):
+                    postings.setdefault(key, []).append([client, machine_sn])
+        return postings
+
+    @staticmethod
+    def client_names(shard_dir: str) -> list:
+        """Return the client names from the manifest."""
+        return list(ShardedStore._manifest(shard_dir)["clients"])
+
+    @staticmethod
+    def _read_shard(shard_dir: str, shard: str) -> dict:
+        try:
+            with open(os.path.join(shard_dir, "shards", shard), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def load_client(shard_dir: str, client_name: str) -> dict:
+        """Load one client's shard; {} if the client has none."""
+        shard = ShardedStore._manifest(shard_dir)["clients"].get(client_name)
+        return {} if shard is None else ShardedStore._read_shard(shard_dir, shard)
+
+    @staticmethod
+    def iter_clients(shard_dir: str):
+        """Yield (client, machines) for every shard, one client in memory at a time."""
+        for client, shard in ShardedStore._manifest(shard_dir)["clients"].items():
+            yield client, ShardedStore._read_shard(shard_dir, shard)
+
+    @staticmethod
+    def iter_store(json_file: str):
+        """
+        Yield (client, machine_sn, record) from a store in either layout, holding at most one
+        client (sharded) or one machine (single file) in memory. A missing store yields nothing.
+        """
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            for client, machines in ShardedStore.iter_clients(shard_dir):
+                for machine_sn, record in machines.items():
+                    yield client, machine_sn, record
+            return
+        try:
+            with open(json_file, "rb") as file:
+                yield from JsonStreamReader.iter_machines(file)
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def load_all(shard_dir: str) -> dict:
+        """Load every shard into the single-file store shape."""
+        return dict(ShardedStore.iter_clients(shard_dir))
+
+    @staticmethod
+    def load_candidates(shard_dir: str, client_name: str, machine_sn: str, bios: str) -> dict:
+        """
+        Load the shards a save has to look at: the client's own shard plus the shards of
+        clients that own the same Machine S/N or BIOS S/N according to the identity index.
+        """
+        clients = {client_name}
+        index = ShardedStore.identity(shard_dir)
+        for key in ShardedStore.identity_keys(machine_sn, {"BIOS S/N": bios}):
+            clients.update(owner[0] for owner in index.get(key))
+        return {client: ShardedStore.load_client(shard_dir, client) for client in sorted(clients)}
+
+    @staticmethod
+    def write_clients(shard_dir: str, data: dict, previous: dict):
+        """
+        Write the shards of the clients touched by a save and update the identity index.
+        previous maps (client, machine_sn) to the record before the write (None if it is new).
+        Each shard is re-read under its client lock and only the touched machines are replaced,
+        so concurrent saves to other machines of the same client are kept; data is updated to
+        the shards as written. A new machine whose key another save took meanwhile is settled
+        on the locked shard (see _settle), and previous is updated to the keys written.
+        """
+        index = ShardedStore.identity(shard_dir)  # Rebuilt, if need be, before the shards change
+        clients = sorted({client for client, _ in previous})
+        manifest_path = os.path.join(shard_dir, "manifest.json")
+        new_clients = [client for client in clients if client not in ShardedStore._manifest(shard_dir)["clients"]]
+        if new_clients:
+            with _locked(shard_dir, "manifest"):
+                manifest = ShardedStore._manifest(shard_dir)
+                for client in new_clients:
+                    manifest["clients"].setdefault(client, ShardedStore._shard_name(client))
+                atomic_write_json(manifest_path, manifest, indent=4, sync=True)
+
+        shards = ShardedStore._manifest(shard_dir)["clients"]
+        for client in clients:
+            with _locked(shard_dir, f"client-{shards[client]}"):
+                # Another process may have saved to this client since data was loaded: re-read the
+                # shard under the lock and apply only the machines this save touched.
+                machines = ShardedStore._read_shard(shard_dir, shards[client])
+                loaded = data.get(client, {})
+                for touched_client, machine_sn in list(previous):
+                    if touched_client != client:
+                        continue
+                    record = loaded.get(machine_sn)
+                    if record is None:
+                        machines.pop(machine_sn, None)
+                    elif previous[(client, machine_sn)] is None:
+                        ShardedStore._settle(client, machine_sn, record, machines, loaded, previous)
+                    else:
+                        machines[machine_sn] = record
+                atomic_write_json(os.path.join(shard_dir, "shards", shards[client]), machines, indent=4, sync=True)
+                data[client] = machines
+
+        removed, added = [], []
+        for (client, machine_sn), old_record in previous.items():
+            if old_record is not None:
+                removed.extend((key, client, machine_sn) for key in ShardedStore.identity_keys(machine_sn, old_record))
+            record = data.get(client, {}).get(machine_sn)
+            if record is not None:
+                added.extend((key, [client, machine_sn]) for key in ShardedStore.identity_keys(machine_sn, record))
+        index.update(removed, added)
+
+    @staticmethod
+    def _settle(client: str, machine_sn: str, record: dict, machines: dict, loaded: dict, previous: dict):
+        """
+        Add a new machine to a client's locked shard, redoing the checks the save made on the
+        shard as it was loaded (loaded) against the machines other saves added since:
+        - A placeholder S/N ("Unknown", "Unknown+2") already taken is numbered to the next free "Unknown+N".
+        - A machine added meanwhile with the same Machine S/N or BIOS S/N (by canonical key) is the
+          same machine: the record is merged into it, as a save that had seen it would merge.
+        - Otherwise the machine is added under its key.
+        """
+        if is_placeholder(machine_sn) or is_numbered(machine_sn):
+            if machine_sn in machines:
+                base_sn = machine_sn.rpartition("+")[0] if is_numbered(machine_sn) else machine_sn
+                counter = 1
+                while f"{base_sn}+{counter}" in machines:
+                    counter += 1
+                del previous[(client, machine_sn)]
+                machine_sn = f"{base_sn}+{counter}"
+                previous[(client, machine_sn)] = None
+            machines[machine_sn] = record
+            return
+
+        machine_key = canonical("Machine S/N", machine_sn)
+        bios_key = canonical("BIOS S/N", record.get("BIOS S/N"))
+        same = next((
+            ex_machine_sn for ex_machine_sn, ex_record in machines.items()
+            if (ex_machine_sn == machine_sn or ex_machine_sn not in loaded) and (
+                (machine_key is not None and canonical("Machine S/N", ex_machine_sn) == machine_key)
+                or (bios_key is not None and canonical("BIOS S/N", ex_record.get("BIOS S/N")) == bios_key)
+            )
+        ), None)
+        if same is None:
+            machines[machine_sn] = record
+            return
+        # Imported here: components imports this module.
+        from components import ComponentModel
+
+        merged = dict(machines[same])
+        ComponentModel.merge_into(merged, record)
+        del previous[(client, machine_sn)]
+        previous[(client, same)] = machines[same]
+        machines[same] = merged
+
+    @staticmethod
+    def create(json_file: str, shard_dir: str = None) -> str:
+        """
+        Split a single-file store into the sharded layout, streaming one client at a time.
+        The original file is left untouched; returns the sharded directory.
+        """
+        shard_dir = shard_dir or os.path.splitext(json_file)[0] + ".d"
+        os.makedirs(os.path.join(shard_dir, "shards"), exist_ok=True)
+        manifest = {"version": ShardedStore.version, "clients": {}}
+        postings = {}
+        if os.path.exists(json_file):
+            with open(json_file, "rb") as file:
+                for client, machines in JsonStreamReader.iter_clients(file):
+                    shard = ShardedStore._shard_name(client)
+                    manifest["clients"][client] = shard
+                    atomic_write_json(os.path.join(shard_dir, "shards", shard), machines, indent=4, sync=True)
+                    for key, owners in ShardedStore._identity_postings([(client, machines)]).items():
+                        postings.setdefault(key, []).extend(owners)
+        KeyBuckets(os.path.join(shard_dir, "identity"), KEY_VERSION).write_all(postings)
+        atomic_write_json(os.path.join(shard_dir, "manifest.json"), manifest, indent=4, sync=True)
+        return shard_dir
@@ -0,0 +1,258 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import zlib
+
+from components import MULTI_VALUED_FIELDS, RECORD_FIELDS, ComponentModel
+from serials import canonical, identity
+from shard_store import ShardedStore
+
+PARTITIONS = 128  # Temporary buckets per side; each is diffed in memory on its own
+ADDED, REMOVED, MOVED, CHANGED = "added", "removed", "moved", "changed"
+
+
+def component_keys(record: dict, field: str) -> dict:
+    """
+    Return {canonical serial: entry} for a component field, so a legacy "a, b" string, its
+    typed entries and a udev-form disk serial all have the same keys. Placeholders are dropped.
+    """
+    value = record.get(field)
+    if isinstance(value, (list, dict)) or field in MULTI_VALUED_FIELDS:
+        entries = ComponentModel.to_entries(value)
+    else:
+        entries = [{"serial": serial} for serial in ComponentModel.serials(record, field)]
+    return {canonical(field, entry["serial"]) or entry["serial"]: entry for entry in entries}
+
+
+def _details(entry: dict) -> dict:
+    """Return what an entry records besides its serial (e.g. a NIC slot)."""
+    return {name: value for name, value in entry.items() if name != "serial"}
+
+
+def canonical_record(record: dict) -> dict:
+    """
+    Return the form of a record two snapshots are compared by: component fields as sorted
+    [canonical serial, details] pairs (empty fields left out), other fields as stored.
+    """
+    canonical_form = {}
+    for field, value in record.items():
+        if field not in RECORD_FIELDS:
+            canonical_form[field] = value
+        else:
+            keys = component_keys(record, field)
+            if keys:
+                canonical_form[field] = sorted([key, _details(entry)] for key, entry in keys.items())
+    return canonical_form
+
+
+def record_digest(record: dict) -> str:
+    text = json.dumps(canonical_record(record), sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def field_changes(old_record: dict, new_record: dict) -> dict:
+    """
+    Return {field: {"added": [...], "removed": [...], "details": [...]}} for every field that changed.
+    Component serials are compared by canonical key, so a legacy string and its migrated
+    entries, or the same disk in its udev form, are not a change. "details" lists the
+    serials kept whose details changed (e.g. a NIC slot). Empty lists are left out.
+    """
+    changes = {}
+    for field in sorted(set(old_record) | set(new_record)):
+        if old_record.get(field) == new_record.get(field):
+            continue
+        if field in RECORD_FIELDS:
+            before, after = component_keys(old_record, field), component_keys(new_record, field)
+        else:
+            before, after = ({str(record.get(field)): {"serial": str(record.get(field))}} for record in (old_record, new_record))
+        change = {
+            "added": sorted(after[key]["serial"] for key in after.keys() - before.keys()),
+            "removed": sorted(before[key]["serial"] for key in before.keys() - after.keys()),
+            "details": sorted(after[key]["serial"] for key in after.keys() & before.keys() if _details(after[key]) != _details(before[key])),
+        }
+        change = {name: serials for name, serials in change.items() if serials}
+        if change:
+            changes[field] = change
+    return changes
+
+
+class _Entry:
+    """One machine read back from a partition file; the record stays JSON text until it is diffed."""
+
+    __slots__ = ("client", "machine_sn", "bios", "digest", "text")
+
+    def __init__(self, line: str):
+        header, self.text = line.rstrip("\n").split("\t", 1)
+        self.client, self.machine_sn, self.bios, self.digest = json.loads(header)
+
+    def record(self) -> dict:
+        return json.loads(self.text)
+
+
+class SnapshotDiff:
+    """
+    Compare two inventory snapshots (either store layout) in bounded memory.
+
+    Machines are matched by Machine S/N, then the ones left over by BIOS S/N, and the
+    result is a stream of events:
+        {"change": "added",   "client": ..., "machine": ...}
+        {"change": "removed", "client": ..., "machine": ...}
+        {"change": "moved",   "client": new client, "from_client": ..., "machine": ..., "fields": {...}}
+        {"change": "changed", "client": ..., "machine": ..., "fields": {field: {"added": [...], "removed": [...], "details": [...]}}}
+    A machine matched by BIOS S/N under another Machine S/N carries "from_machine".
+
+    Both files are streamed once and hash-partitioned by matching key into temporary
+    files, so each machine is written and read back once and memory holds one
+    partition at a time rather than either snapshot. Records are compared by a digest
+    of their canonical form (see canonical_record), so a legacy store and the same store
+    after ComponentModel.migrate_store match, and only parsed when the digests differ.
+    Machines left unmatched by Machine S/N are partitioned again by BIOS S/N for the second pass.
+    """
+
+    def __init__(self, old_file: str, new_file: str, partitions: int = PARTITIONS):
+        self.old_file = old_file
+        self.new_file = new_file
+        self.partitions = partitions
+        self.counts = {ADDED: 0, REMOVED: 0, MOVED: 0, CHANGED: 0, "unchanged": 0}
+
+    @staticmethod
+    def _machine_key(client: str, machine_sn: str, bios) -> str:
+        """First-pass key: the Machine S/N, else the BIOS S/N, else the Machine S/N within its client."""
+        return identity(machine_sn) or bios or f"{client}\0{machine_sn}"
+
+    @staticmethod
+    def _partition(key: str, partitions: int) -> int:
+        return zlib.crc32(key.encode()) % partitions
+
+    def _split(self, json_file: str, directory: str, side: str) -> list:
+        """Stream a store into partition files keyed by Machine S/N; returns their paths."""
+        paths = [os.path.join(directory, f"{side}-sn-{n}") for n in range(self.partitions)]
+        files = [open(path, "w", encoding="utf-8") for path in paths]
+        try:
+            for client, machine_sn, record in ShardedStore.iter_store(json_file):
+                text = json.dumps(record, sort_keys=True, separators=(",", ":"))
+                digest = record_digest(record)
+                bios = identity(record.get("BIOS S/N"))
+                header = json.dumps([client, machine_sn, bios, digest])
+                files[self._partition(self._machine_key(client, machine_sn, bios), self.partitions)].write(f"{header}\t{text}\n")
+        finally:
+            for file in files:
+                file.close()
+        return paths
+
+    @staticmethod
+    def _read(path: str, key) -> dict:
+        """Read a partition file into {key: [entries]}, then delete it."""
+        grouped = {}
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                entry = _Entry(line)
+                grouped.setdefault(key(entry), []).append(entry)
+        os.unlink(path)
+        return grouped
+
+    @staticmethod
+    def _pair(olds: list, news: list):
+        """
+        Pair machines sharing a key: same client first, then same BIOS S/N, then across clients
+        when a BIOS S/N is unknown. Returns (pairs, unmatched olds, unmatched news).
+        """
+        pairs = []
+        rules = (
+            lambda old, new: old.client == new.client,
+            lambda old, new: old.bios is not None and old.bios == new.bios,
+            lambda old, new: old.bios is None or new.bios is None,
+        )
+        for same in rules:
+            for old in list(olds):
+                match = next((new for new in news if same(old, new)), None)
+                if match is not None:
+                    pairs.append((old, match))
+                    olds.remove(old)
+                    news.remove(match)
+        return pairs, olds, news
+
+    def _compare(self, old: _Entry, new: _Entry):
+        """Return the event for a matched pair, or None if nothing changed."""
+        if old.digest == new.digest and old.client == new.client and old.machine_sn == new.machine_sn:
+            self.counts["unchanged"] += 1
+            return None
+        event = {"change": MOVED if old.client != new.client else CHANGED, "client": new.client, "machine": new.machine_sn}
+        if old.client != new.client:
+            event["from_client"] = old.client
+        if old.machine_sn != new.machine_sn:
+            event["from_machine"] = old.machine_sn
+        event["fields"] = field_changes(old.record(), new.record()) if old.digest != new.digest else {}
+        self.counts[event["change"]] += 1
+        return event
+
+    def _unmatched(self, change: str, entry: _Entry) -> dict:
+        self.counts[change] += 1
+        return {"change": change, "client": entry.client, "machine": entry.machine_sn}
+
+    def _match(self, old_path: str, new_path: str, key, leftovers):
+        """Diff one pair of partition files; unmatched machines go to leftovers(side, entry) or become added/removed."""
+        olds, news = self._read(old_path, key), self._read(new_path, key)
+        for group_key in sorted(olds.keys() | news.keys()):
+            pairs, old_left, new_left = self._pair(olds.pop(group_key, []), news.pop(group_key, []))
+            for old, new in pairs:
+                event = self._compare(old, new)
+                if event is not None:
+                    yield event
+            for side, change, entries in (("old", REMOVED, old_left), ("new", ADDED, new_left)):
+                for entry in entries:
+                    if leftovers is None or not leftovers(side, entry):
+                        yield self._unmatched(change, entry)
+
+    def events(self):
+        """Yield the difference events; counts are complete once the generator is exhausted."""
+        with tempfile.TemporaryDirectory(prefix="snapshot-diff-") as directory:
+            old_paths = self._split(self.old_file, directory, "old")
+            new_paths = self._split(self.new_file, directory, "new")
+
+            # Second pass buckets: machines unmatched by Machine S/N that have a BIOS S/N.
+            spill = {side: [open(os.path.join(directory, f"{side}-bios-{n}"), "w", encoding="utf-8") for n in range(self.partitions)]
+                     for side in ("old", "new")}
+
+            def leftovers(side, entry):
+                if entry.bios is None:
+                    return False
+                header = json.dumps([entry.client, entry.machine_sn, entry.bios, entry.digest])
+                spill[side][self._partition(entry.bios, self.partitions)].write(f"{header}\t{entry.text}\n")
+                return True
+
+            try:
+                by_machine_sn = lambda entry: self._machine_key(entry.client, entry.machine_sn, entry.bios)
+                for old_path, new_path in zip(old_paths, new_paths):
+                    yield from self._match(old_path, new_path, by_machine_sn, leftovers)
+            finally:
+                for files in spill.values():
+                    for file in files:
+                        file.close()
+            for file_old, file_new in zip(spill["old"], spill["new"]):
+                yield from self._match(file_old.name, file_new.name, lambda entry: entry.bios, None)
+
+    def write(self, output) -> dict:
+        """Write the events as JSON lines to an open text file; returns the counts."""
+        for event in self.events():
+            output.write(json.dumps(event) + "\n")
+        return self.counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two inventory snapshots and print the differences as JSON lines.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--output", default=None, help="Write the JSON lines to a file and print a summary.")
+    parser.add_argument("--partitions", type=int, default=PARTITIONS)
+    args = parser.parse_args()
+    diff = SnapshotDiff(args.old, args.new, args.partitions)
+    if args.output is None:
+        diff.write(sys.stdout)
+    else:
+        with open(args.output, "w") as output:
+            counts = diff.write(output)
+        print(f"✅ {', '.join(f'{count} {change}' for change, count in counts.items())}")
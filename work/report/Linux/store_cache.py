@@ -0,0 +1,81 @@
+import json
+import os
+
+from shard_store import atomic_file
+
+
+def encode_client(client: str, machines: dict) -> str:
+    """Return one client's entry of a store file exactly as json.dump(data, indent=4) writes it."""
+    body = json.dumps(machines, indent=4).replace("\n", "\n    ")
+    return f"    {json.dumps(client)}: {body}"
+
+
+def join_clients(entries) -> str:
+    """Join encode_client() entries into the text of a whole store file."""
+    text = ",\n".join(entries)
+    return "{\n" + text + "\n}" if text else "{}"
+
+
+class StoreCache:
+    """
+    A single-file store kept in memory by a long-running writer (the ingest service).
+
+    Without it every batch re-reads the whole store and encodes all of it again with
+    indent=4, which is the slowest part of a write. The cache keeps the parsed store,
+    the identity index save_batch builds over it, and each client's encoded entry:
+    - load() returns the store as last loaded or written, and reads it again only when
+      the file's (mtime_ns, size) differs from the cached stamp, i.e. another process wrote it.
+    - write() encodes only the clients a save touched and reuses the other entries, so
+      the file is still rewritten whole but the encoding work follows the touched clients.
+      It goes through atomic_file, so a crash or a reader never sees a half-written store.
+    Whoever mutates the loaded data must either write() it or invalidate() the cache.
+    """
+
+    def __init__(self, json_file: str):
+        self.json_file = json_file
+        self.data = None
+        self.index = None  # DataHandle.identity_index(data), kept up to date by save_batch
+        self.stat = None
+        self._entries = {}  # client -> encode_client() text of its machines as last written
+
+    @staticmethod
+    def store_stat(json_file: str):
+        try:
+            stat = os.stat(json_file)
+            return [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            return None
+
+    def invalidate(self):
+        self.data = self.index = self.stat = None
+        self._entries = {}
+
+    def load(self) -> dict:
+        """Return the store, reading it again if it changed on disk since the last load or write."""
+        stat = self.store_stat(self.json_file)
+        if self.data is None or stat != self.stat:
+            self.invalidate()
+            try:
+                with open(self.json_file, "r") as file:
+                    self.data = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.data = {}
+            self.stat = stat
+        return self.data
+
+    def write(self, data: dict, previous: dict):
+        """
+        Write data (the loaded store, changed in place) to the store file.
+        previous maps the (client, machine_sn) pairs the save touched to their old records.
+        """
+        touched = {client for client, _ in previous}
+        entries = {}
+        for client, machines in data.items():
+            entry = self._entries.get(client) if client not in touched else None
+            entries[client] = entry if entry is not None else encode_client(client, machines)
+        with atomic_file(self.json_file, sync=True) as file:
+            file.write(join_clients(entries.values()))
+        if data is not self.data:
+            self.index = None
+        self.data, self._entries = data, entries
+        self.stat = self.store_stat(self.json_file)
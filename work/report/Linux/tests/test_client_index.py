@@ -0,0 +1,29 @@
+import json
+
+from client_index import ClientIndex
+
+
+def write_store(json_file, data):
+    with open(json_file, "w") as file:
+        json.dump(data, file, indent=4)
+
+
+def test_sidecar_is_stamped_and_rebuilt_after_an_outside_write(tmp_path):
+    json_file = str(tmp_path / "client_system_info.json")
+    write_store(json_file, {"acme": {"PF3ABC12": {}}, "Globex": {"R9XYZ001": {}}})
+
+    index = ClientIndex.load(json_file)
+    assert index.names == ["acme", "Globex"]
+    assert index.stamp == index.store_stat(json_file) == ClientIndex.read_stamp(json_file)
+
+    write_store(json_file, {"acme": {"PF3ABC12": {}}, "initech": {"MJ000777": {}}, "Globex": {"R9XYZ001": {}}})
+    assert ClientIndex.load(json_file).names == ["acme", "Globex", "initech"]
+
+
+def test_complete_ranks_prefixes_before_substrings():
+    index = ClientIndex(["Acme Labs", "Big Acme", "acme", "Globex", "Initech"])
+    assert index.complete("acm") == ["acme", "Acme Labs", "Big Acme"]
+    assert index.complete("ac") == ["acme", "Acme Labs"]  # Too short for substring matches
+    index.add("Tacmes")
+    assert index.complete("acm", limit=3) == ["acme", "Acme Labs", "Big Acme"]
+    assert index.complete("acme") == ["acme", "Acme Labs", "Big Acme", "Tacmes"]
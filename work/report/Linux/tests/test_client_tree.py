@@ -0,0 +1,75 @@
+from PyQt6.QtCore import QModelIndex
+
+from record_groups import ClientGroups
+from record_model import ClientTreeModel, RecordTableModel
+from record_table import RecordTable
+
+DISK = {"Disk S/N": [{"serial": "S3UANX0M508687"}]}
+
+
+def table_of(clients: dict) -> RecordTable:
+    return RecordTable.from_data({client: {sn: dict(DISK) for sn in machines} for client, machines in clients.items()})
+
+
+def shown(tree: ClientTreeModel) -> dict:
+    """Return {client: [machine S/N, ...]} as the tree shows it, fetching every client fully."""
+    clients = {}
+    for top_row in range(tree.rowCount()):
+        parent = tree.index(top_row, 0)
+        while tree.canFetchMore(parent):
+            tree.fetchMore(parent)
+        machines = [tree.data(tree.index(row, 0, parent)) for row in range(tree.rowCount(parent))]
+        for row in range(tree.rowCount(parent)):
+            assert tree.parent(tree.index(row, 0, parent)).row() == top_row
+        clients[tree.data(parent)] = machines
+        assert tree.data(tree.index(top_row, 1)) == f"{len(machines):,}"
+    return clients
+
+
+def test_groups_remove_many_rows_of_one_client():
+    records = table_of({"acme": [f"SN{n:05}" for n in range(2000)], "globex": ["R9XYZ001"]})
+    groups = ClientGroups(records)
+    groups.remove_rows(range(0, 2000, 2))
+    assert list(groups.rows["acme"]) == list(range(1, 2000, 2))
+    groups.remove_rows(list(range(1, 2000, 2)) + [2000])
+    assert groups.rows == {} and groups.unknown_totals == {}
+
+
+def test_tree_applies_a_large_sync_in_place():
+    records = table_of({"acme": [f"SN{n:05}" for n in range(1200)], "globex": ["R9XYZ001"], "initech": ["MJ000777"]})
+    groups = ClientGroups(records)
+    tree = ClientTreeModel()
+    tree.set_groups(groups)
+    tree.fetchMore(tree.index(0, 0))  # acme: the first FETCH_BATCH machines are shown
+
+    removed = list(range(0, 1200, 3)) + [1201]  # initech loses its only machine
+    replaced = {}
+    for old in range(1, 1200, 3):
+        replaced[old] = records.append("acme", records.value(old, 1), {"Disk S/N": [{"serial": "WD-WX11A"}]})
+    inserted = [records.append("umbrella", "PF3ABC12", dict(DISK)), records.append("acme", "SN99999", dict(DISK))]
+    groups.apply(removed, replaced, inserted)
+    tree.apply_changes(removed, replaced, inserted)
+
+    rebuilt = ClientTreeModel()
+    rebuilt.set_groups(groups)
+    # Updated machines keep their place in the tree, while the groups append their new rows.
+    in_place, from_groups = shown(tree), shown(rebuilt)
+    assert list(in_place) == list(from_groups) == ["acme", "globex", "umbrella"]
+    assert {client: sorted(machines) for client, machines in in_place.items()} == {
+        client: sorted(machines) for client, machines in from_groups.items()
+    }
+    assert in_place["acme"][:3] == ["SN00001", "SN00002", "SN00004"]
+    assert len(in_place["acme"]) == 1200 - 400 + 1
+
+
+def test_table_model_locates_changed_rows_in_one_pass():
+    records = table_of({"acme": [f"SN{n:05}" for n in range(300)]})
+    model = RecordTableModel(records)
+    model.sort(1)
+    removed = [5, 17, 250]
+    replaced = {40: records.append("acme", "SN00040", {"Disk S/N": [{"serial": "WD-WX11A"}]})}
+    model.apply_changes(removed, replaced, [])
+
+    machines = [model.data(model.index(row, 1)) for row in range(model.rowCount(QModelIndex()))]
+    assert machines == [f"SN{n:05}" for n in range(300) if n not in (5, 17, 250)]
+    assert model.source_row(40 - 2) == replaced[40]
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import random
+import threading
+
+import pytest
+
+from collector_agent import RETRIES, CollectorAgent, UploadError
+from ingest_server import IngestService
+
+SNAPSHOT = {
+    "Machine S/N": "PF3ABC12",
+    "BIOS S/N": "BIOS-7781",
+    "CPU S/N": "BFEBFBFF000906EA",
+    "Battery S/N": "B00012345",
+    "Disk S/N": [{"serial": "S3UANX0M508687"}],
+    "RAM S/N": [{"serial": "1A2B3C4D"}, {"serial": "5E6F7A8B"}],
+}
+
+
+class StandInReceiver(IngestService):
+    """An IngestService that records every POST and can answer the next ones with canned replies."""
+
+    def __init__(self, json_file: str):
+        super().__init__(json_file)
+        self.received = []
+        self.replies = []  # (status code, payload) answered instead of storing, first come first served
+
+    async def route(self, method, path, body):
+        if method == "POST":
+            self.received.append(json.loads(body))
+            if self.replies:
+                return self.replies.pop(0)
+        return await super().route(method, path, body)
+
+
+@pytest.fixture
+def receiver(tmp_path):
+    service = StandInReceiver(str(tmp_path / "client_system_info.json"))
+    loop = asyncio.new_event_loop()
+    ready, ports = threading.Event(), []
+
+    def started(port):
+        ports.append(port)
+        ready.set()
+
+    serving = loop.create_task(service.serve("127.0.0.1", 0, started))
+    thread = threading.Thread(target=lambda: loop.run_until_complete(asyncio.wait([serving])), daemon=True)
+    thread.start()
+    assert ready.wait(10)
+    service.url = f"http://127.0.0.1:{ports[0]}/machines"
+    yield service
+    loop.call_soon_threadsafe(serving.cancel)
+    thread.join(10)
+    loop.close()
+
+
+def make_agent(receiver, tmp_path, snapshot: dict, sleeps: list = None) -> CollectorAgent:
+    return CollectorAgent(
+        receiver.url, "acme", str(tmp_path / "state.json"), collect=lambda: snapshot,
+        sleep=(sleeps if sleeps is not None else []).append, rng=random.Random(1),
+    )
+
+
+def stored(receiver) -> dict:
+    with open(receiver.json_file) as file:
+        return json.load(file)
+
+
+def test_first_report_is_full_then_unchanged_sends_nothing(receiver, tmp_path):
+    agent = make_agent(receiver, tmp_path, dict(SNAPSHOT))
+
+    assert agent.run_once() == "Ok"
+    assert len(receiver.received) == 1
+    assert receiver.received[0]["snapshot"] == SNAPSHOT
+    assert not receiver.received[0].get("delta")
+
+    assert agent.run_once() == "Unchanged"
+    assert len(receiver.received) == 1
+    assert agent.stats["full"] == 1 and agent.stats["unchanged"] == 1
+
+
+def test_changed_field_is_sent_as_delta(receiver, tmp_path):
+    snapshot = dict(SNAPSHOT)
+    agent = make_agent(receiver, tmp_path, snapshot)
+    agent.run_once()
+
+    snapshot["Battery S/N"] = "B00099999"
+    assert agent.run_once() == "Updated"
+    delta = receiver.received[-1]
+    assert delta["delta"] is True
+    assert delta["snapshot"] == {"Machine S/N": "PF3ABC12", "Battery S/N": "B00099999"}
+    assert stored(receiver)["acme"]["PF3ABC12"]["Battery S/N"] == "B00099999"
+    assert agent.stats["delta"] == 1
+
+
+def test_missing_answer_falls_back_to_full_snapshot(receiver, tmp_path):
+    snapshot = dict(SNAPSHOT)
+    agent = make_agent(receiver, tmp_path, snapshot)
+    # The agent remembers a report the receiver no longer has (e.g. the store was restored).
+    agent.save_state(agent.submission(dict(SNAPSHOT), {})[1])
+
+    snapshot["Battery S/N"] = "B00099999"
+    assert agent.run_once() == "Ok"
+    assert [submission.get("delta", False) for submission in receiver.received] == [True, False]
+    assert receiver.received[1]["snapshot"] == snapshot
+    assert stored(receiver)["acme"]["PF3ABC12"]["Battery S/N"] == "B00099999"
+
+
+def test_5xx_answers_are_retried_with_backoff(receiver, tmp_path):
+    sleeps = []
+    agent = make_agent(receiver, tmp_path, dict(SNAPSHOT), sleeps)
+    receiver.replies = [(503, {"error": "busy"})] * 2
+
+    assert agent.run_once() == "Ok"
+    assert len(receiver.received) == 3
+    assert agent.stats["retries"] == 2
+    # Full jitter: each delay is at most BACKOFF_BASE * 2**attempt.
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+
+def test_unreadable_answers_are_retried(receiver, tmp_path):
+    agent = make_agent(receiver, tmp_path, dict(SNAPSHOT))
+    receiver.replies = [(200, {}), (200, {"results": []}), (200, "not an object")]
+
+    assert agent.run_once() == "Ok"
+    assert agent.stats["retries"] == 3
+
+
+def test_persistent_failure_raises_upload_error_and_keeps_state(receiver, tmp_path):
+    agent = make_agent(receiver, tmp_path, dict(SNAPSHOT))
+    receiver.replies = [(200, {"results": [None]})] * (2 * (RETRIES + 1))
+
+    with pytest.raises(UploadError):
+        agent.run_once()
+    agent.run(iterations=1)  # run() reports the error instead of dying
+    assert len(receiver.received) == 2 * (RETRIES + 1)
+    assert agent.load_state() == {}
+    assert agent.stats["full"] == 0
+
+
+def test_4xx_answer_is_not_retried(receiver, tmp_path):
+    agent = make_agent(receiver, tmp_path, dict(SNAPSHOT))
+    receiver.replies = [(400, {"error": "bad"})]
+
+    with pytest.raises(UploadError):
+        agent.run_once()
+    assert len(receiver.received) == 1
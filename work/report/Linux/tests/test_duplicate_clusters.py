@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from data_handle import DataHandle
+from duplicate_clusters import COMPONENTS, MACHINE_AND_BIOS, SAME_BIOS, DuplicateClusters
+
+
+def disks(*serials) -> list:
+    return [{"serial": serial} for serial in serials]
+
+
+STORE = {
+    "gg245": {
+        "PF3ABC12": {"Disk S/N": disks("S3UANX0M508687"), "BIOS S/N": "BIOS-7781"},
+        "Unknown+1": {"Disk S/N": disks("WD-WX11A", "WD-WX11B", "WD-WX11C"), "BIOS S/N": "BIOS-7782"},
+        "Unknown+2": {"Disk S/N": disks("WD-WX22A", "WD-WX22B", "WD-WX22C"), "BIOS S/N": "BIOS-7782"},
+        "MJ000777": {"Disk S/N": disks("ST1000A", "ST1000B", "ST1000C"), "NIC S/N": disks("3c:7c:3f:2b:39:cd"), "BIOS S/N": "BIOS-0777"},
+        "PF000001": {"RAM S/N": disks("1A2B3C4D"), "BIOS S/N": "Default string"},
+    },
+    "gg2451": {
+        "pf3abc-12": {"Disk S/N": disks("S3UANX0M508687"), "RAM S/N": disks("5E6F7A8B"), "BIOS S/N": "bios-7781"},
+        "MJ000999": {"Disk S/N": disks("ST1000A", "ST1000B", "ST1000C"), "NIC S/N": disks("3C7C3F2B39CD"), "BIOS S/N": "BIOS-0999"},
+        "PF000002": {"RAM S/N": disks("1A2B3C4D"), "BIOS S/N": "Default string"},
+    },
+    "acme": {"R9XYZ001": {"Disk S/N": disks("S3UANX0M000001", "S3UANX0M000002", "S3UANX0M000003"), "BIOS S/N": "BIOS-7782"}},
+}
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    path = str(tmp_path / "client_system_info.json")
+    with open(path, "w") as file:
+        json.dump(STORE, file, indent=4)
+    return path
+
+
+def named(plan: list) -> dict:
+    """Return {(kept client, machine): {(client, machine): reason}} for a plan."""
+    return {
+        (entry["keep"]["client"], entry["keep"]["machine"]): {(merge["client"], merge["machine"]): merge["reason"] for merge in entry["merge"]}
+        for entry in plan
+    }
+
+
+def test_clusters_and_reasons(json_file):
+    plan = DuplicateClusters(json_file).scan().plan()
+    # Shared RAM serials and placeholder BIOS S/N link nothing, nor does a BIOS S/N shared across clients.
+    assert named(plan) == {
+        ("gg245", "PF3ABC12"): {("gg2451", "pf3abc-12"): MACHINE_AND_BIOS},
+        ("gg245", "MJ000777"): {("gg2451", "MJ000999"): COMPONENTS},
+        ("gg245", "Unknown+1"): {("gg245", "Unknown+2"): SAME_BIOS},
+    }
+    similar = next(entry for entry in plan if entry["keep"]["machine"] == "MJ000777")
+    assert similar["merge"][0]["similarity"] >= 0.4
+
+
+def test_apply_merges_the_plan(json_file):
+    plan = DuplicateClusters(json_file).scan().plan()
+    assert DuplicateClusters.apply(json_file, plan) == (3, 3)
+    data = DataHandle.load_client_data(json_file)
+    assert sorted(data["gg245"]) == ["MJ000777", "PF000001", "PF3ABC12", "Unknown+1"]
+    assert sorted(data["gg2451"]) == ["PF000002"]
+    assert sorted(entry["serial"] for entry in data["gg245"]["Unknown+1"]["Disk S/N"]) == [
+        "WD-WX11A", "WD-WX11B", "WD-WX11C", "WD-WX22A", "WD-WX22B", "WD-WX22C"
+    ]
+    assert data["gg245"]["PF3ABC12"]["RAM S/N"] == disks("5E6F7A8B")
+    assert DuplicateClusters(json_file).scan().plan() == []
+
+
+def test_apply_skips_clusters_changed_since_the_scan(json_file, tmp_path):
+    plan_file = str(tmp_path / "plan.json")
+    DuplicateClusters.write_plan(DuplicateClusters(json_file).scan().plan(), plan_file)
+    data = DataHandle.load_client_data(json_file)
+    data["gg2451"]["MJ000999"]["BIOS S/N"] = "BIOS-1000"
+    DataHandle.write_client_data(json_file, data, {("gg2451", "MJ000999"): STORE["gg2451"]["MJ000999"]})
+
+    assert DuplicateClusters.apply(json_file, DuplicateClusters.read_plan(plan_file)) == (2, 2)
+    assert sorted(DataHandle.load_client_data(json_file)["gg2451"]) == ["MJ000999", "PF000002"]
@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+from client_index import ClientIndex
+from data_handle import DataHandle
+from inventory_snapshot import InventorySnapshot
+from record_groups import ClientGroups
+from record_sync import RecordSync
+from record_table import RecordTable
+from shard_store import ShardedStore
+
+STORE = {
+    "acme": {
+        "PF3ABC12": {"Disk S/N": [{"serial": "S3UANX0M508687"}], "RAM S/N": [{"serial": "1A2B3C4D"}], "BIOS S/N": "BIOS-7781"},
+        "Unknown+1": {"Disk S/N": [], "BIOS S/N": "BIOS-7782", "CPU S/N": "Unknown"},
+    },
+    "globex": {"R9XYZ001": {"Disk S/N": [{"serial": "WD-WX11A"}], "BIOS S/N": "BIOS-9001"}},
+}
+
+
+@pytest.fixture(params=["single", "sharded"])
+def json_file(request, tmp_path):
+    path = str(tmp_path / "client_system_info.json")
+    with open(path, "w") as file:
+        json.dump(STORE, file, indent=4)
+    if request.param == "sharded":
+        ShardedStore.create(path)
+    return path
+
+
+def publish(json_file: str) -> str:
+    stamps = RecordSync.store_stamps(json_file)
+    return InventorySnapshot.publish(json_file, DataHandle.load_records(json_file), stamps)
+
+
+def cells(table: RecordTable) -> list:
+    return [[table.value(row, column) for column in range(len(table.pools))] for row in range(len(table))]
+
+
+def test_published_snapshot_maps_the_same_table_and_groups(json_file):
+    publish(json_file)
+    snapshot = InventorySnapshot.open(json_file)
+    assert snapshot is not None
+
+    loaded = DataHandle.load_records(json_file)
+    assert cells(snapshot.table) == cells(loaded)
+    rebuilt, mapped = ClientGroups(loaded), snapshot.groups()
+    assert {client: list(rows) for client, rows in mapped.rows.items()} == {client: list(rows) for client, rows in rebuilt.rows.items()}
+    assert mapped.unknown_totals == rebuilt.unknown_totals
+    assert sorted(snapshot.client_names()) == ["acme", "globex"]
+
+
+def test_snapshot_of_a_changed_store_is_not_opened(json_file):
+    publish(json_file)
+    data = DataHandle.load_client_data(json_file)
+    data["acme"]["PF3ABC99"] = {"BIOS S/N": "BIOS-7799"}
+    if ShardedStore.shard_dir(json_file):
+        ShardedStore.write_clients(ShardedStore.shard_dir(json_file), data, {("acme", "PF3ABC99"): None})
+    else:
+        with open(json_file, "w") as file:
+            json.dump(data, file)
+    assert InventorySnapshot.open(json_file) is None
+
+
+@pytest.mark.parametrize("damage", [b"", b"INVSNAP\0garbage", b"NOTASNAP" + bytes(64)])
+def test_damaged_snapshot_is_not_opened(json_file, damage):
+    path = publish(json_file)
+    with open(path, "wb") as file:
+        file.write(damage)
+    assert InventorySnapshot.open(json_file) is None
+
+
+def test_truncated_snapshot_is_not_opened(json_file):
+    path = publish(json_file)
+    os.truncate(path, os.path.getsize(path) // 2)
+    assert InventorySnapshot.open(json_file) is None
+
+
+def test_write_republishes_the_snapshot(json_file):
+    publish(json_file)
+    result, staged = DataHandle.stage_client_data(json_file, "initech", {"MJ000777": {"BIOS S/N": "BIOS-0777"}})
+    assert staged is None and result in ("Ok", "Add New")
+
+    InventorySnapshot.wait_rebuilds()
+    snapshot = InventorySnapshot.open(json_file)
+    assert snapshot is not None
+    assert sorted(snapshot.client_names()) == ["acme", "globex", "initech"]
+    assert len(snapshot.table) == 4
+
+
+def test_burst_of_writes_shares_one_rebuild(json_file, monkeypatch):
+    built = []
+    rebuild = InventorySnapshot.rebuild
+    monkeypatch.setattr(InventorySnapshot, "rebuild", staticmethod(lambda path: built.append(path) or rebuild(path)))
+
+    for _ in range(5):
+        InventorySnapshot.schedule_rebuild(json_file, delay=0.2)
+    InventorySnapshot.wait_rebuilds()
+    assert built == [json_file]
+    assert InventorySnapshot.open(json_file) is not None
+
+
+def test_client_list_reads_the_snapshot(json_file, monkeypatch):
+    class Dropdown:
+        def __init__(self):
+            self.items = []
+
+        def addItems(self, items):
+            self.items.extend(items)
+
+    publish(json_file)
+    monkeypatch.setattr(ClientIndex, "load", staticmethod(lambda path: pytest.fail("the client index was read")))
+    dropdown = Dropdown()
+    index = DataHandle.load_existing_clients(json_file, dropdown)
+    assert dropdown.items == ["acme", "globex"]
+    assert index.complete("glo") == ["globex"]
@@ -0,0 +1,50 @@
+import io
+import json
+
+import pytest
+
+from json_stream import JsonStreamReader
+
+STORE = {
+    "acme": {
+        "PF3ABC12": {"Disk S/N": [{"serial": "S3UANX0M508687"}], "BIOS S/N": "BIOS-7781", "Note": "braces { [ in \"text\" \\"},
+        "R9XYZ001": {"RAM S/N": [], "NIC S/N": [{"serial": "3c:7c:3f:2b:39:cd", "slot": "enp0s31f6"}]},
+    },
+    "flat": {"serial": "]}"},
+    "empty": {},
+    "ünïcode": {"MJ000777": {"BIOS S/N": "é"}},
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_skipped_clients_leave_the_reader_on_the_next_key(chunk_size, indent):
+    text = json.dumps(STORE, indent=indent, ensure_ascii=False).encode()
+    for wanted in STORE:
+        reader = JsonStreamReader(io.BytesIO(text), chunk_size)
+        reader.expect("start_map")
+        seen = {}
+        for client in reader.iter_map():
+            if client == wanted:
+                seen[client] = reader.read_value()
+            else:
+                reader.skip_value()
+                seen[client] = None
+        assert list(seen) == list(STORE)
+        assert seen[wanted] == STORE[wanted]
+
+
+def test_client_names_and_machines(tmp_path):
+    json_file = tmp_path / "client_system_info.json"
+    json_file.write_text(json.dumps(STORE, indent=4))
+    assert JsonStreamReader.client_names(str(json_file)) == list(STORE)
+    assert JsonStreamReader.client_machines(str(json_file), "ünïcode") == STORE["ünïcode"]
+    assert JsonStreamReader.client_machines(str(json_file), "missing") == {}
+
+
+def test_skipping_a_truncated_value_fails():
+    reader = JsonStreamReader(io.BytesIO(b'{"acme": {"PF3ABC12": {"BIOS S/N": "B'), 8)
+    reader.expect("start_map")
+    next(reader.iter_map())
+    with pytest.raises(json.JSONDecodeError):
+        reader.skip_value()
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from data_handle import DataHandle
+from machine_fingerprint import MIN_SIMILARITY, FingerprintIndex, similarity, tokens
+
+
+def machine(n: int) -> dict:
+    return {
+        "Disk S/N": [{"serial": f"S3UANX{n:05}D{disk}"} for disk in range(4)],
+        "RAM S/N": [{"serial": f"1A2B{n:05}{slot}"} for slot in range(4)],
+        "CPU S/N": f"BFEBFBFF{n:08X}",
+        "NIC S/N": [{"serial": f"3c:7c:3f:{n >> 8:02x}:{n & 255:02x}:cd"}],
+        "BIOS S/N": f"BIOS-{n:05}",
+    }
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    path = str(tmp_path / "client_system_info.json")
+    with open(path, "w") as file:
+        json.dump({"acme": {f"PF{n:06}": machine(n) for n in range(300)}}, file, indent=4)
+    return path
+
+
+def test_tokens_are_canonical_and_skip_placeholders():
+    record = {"Disk S/N": [{"serial": "SAMSUNG_MZNLN512HAJQ-00007_S3UANX0M508687"}], "NIC S/N": "3c:7c:3f:2b:39:cd", "CPU S/N": "Unknown", "BIOS S/N": "Default string"}
+    assert tokens(record) == {"Disk S/N:S3UANX0M508687", "NIC S/N:3C7C3F2B39CD"}
+    assert similarity(record, {"Disk S/N": [{"serial": "S3UANX0M508687"}]}) == 0.5
+    assert similarity(record, {"CPU S/N": "Unknown"}) == 0.0
+
+
+def test_board_swap_is_found_with_its_score(json_file):
+    swapped = machine(42)
+    swapped["BIOS S/N"] = "BIOS-NEW01"
+    swapped["Disk S/N"][0] = {"serial": "WD-WX11A"}
+    assert FingerprintIndex.load(json_file).candidates(swapped)[0] == ["acme", "PF000042"]
+
+    likely, scores = DataHandle.find_similar(json_file, swapped, DataHandle.load_client_data(json_file))
+    assert list(likely) == ["acme"] and list(likely["acme"]) == ["PF000042"]
+    # 11 components each, of which the BIOS S/N and one disk differ.
+    assert scores == {("acme", "PF000042"): pytest.approx(9 / 13)}
+    assert scores[("acme", "PF000042")] >= MIN_SIMILARITY
+
+
+def test_unrelated_and_placeholder_machines_are_not_offered(json_file):
+    assert DataHandle.find_similar(json_file, machine(1000), DataHandle.load_client_data(json_file)) == ({}, {})
+    placeholders = {"Disk S/N": [], "CPU S/N": "Unknown", "BIOS S/N": "Default string"}
+    assert FingerprintIndex.load(json_file).candidates(placeholders) == []
+
+
+def test_saved_machine_is_indexed_and_an_unknown_serial_is_matched(json_file):
+    assert DataHandle.stage_client_data(json_file, "acme", {"PF000300": machine(300)}) == ("Ok", None)
+    moved = machine(300)
+    moved["RAM S/N"].pop()
+    result, staged = DataHandle.stage_client_data(json_file, "acme", {"Unknown": moved})
+    assert result == "Duplicates"
+    assert list(staged["duplicates"]["acme"]) == ["PF000300"]
+    assert staged["scores"][("acme", "PF000300")] == pytest.approx(10 / 11)
@@ -0,0 +1,29 @@
+from record_fuzzy import FuzzyIndex, edit_distance, fold
+from record_table import RecordTable
+
+
+def table_of(disks: dict) -> RecordTable:
+    return RecordTable.from_data({"acme": {machine_sn: {"Disk S/N": [{"serial": disk}]} for machine_sn, disk in disks.items()}})
+
+
+def test_confusables_and_separators_fold_away():
+    assert fold("SAMSUNG_MZNLN512HAJQ-00007_S3UANX0M5O8687") == fold("53UANX0M508687")
+    assert edit_distance("ABCDEF", "ABXDEF", 2) == 1
+    assert edit_distance("ABCDEF", "UVWXYZ", 2) == 3
+
+
+def test_typo_finds_the_machine():
+    records = table_of({f"PF{n:06}": f"S3UANX{n:06}M" for n in range(200)})
+    index = FuzzyIndex(records)
+    distance, row, column, serial = index.closest("S3UANX000123N")[0]
+    assert (distance, records.value(row, 1), serial) == (1, "PF000123", "S3UANX000123M")
+    assert index.closest("S3U") == []  # Too short to look up
+
+
+def test_query_made_only_of_common_trigrams_still_gets_suggestions():
+    # Every trigram of these serials is in every cell, so all of them are stop trigrams.
+    disks = {f"PF{n:06}": ("ABCABCAB", "BCABCABC", "CABCABCA")[n % 3] for n in range(60)}
+    index = FuzzyIndex(table_of(disks))
+    found = index.closest("ABCABCAC", limit=100)
+    assert len(found) == 20
+    assert {(distance, serial) for distance, _, _, serial in found} == {(1, "ABCABCAB")}
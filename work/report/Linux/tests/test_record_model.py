@@ -0,0 +1,50 @@
+from PyQt6.QtCore import QModelIndex, QPersistentModelIndex, Qt
+
+from record_model import RecordTableModel
+from record_table import COLUMNS, RecordTable
+
+
+def table_of(machines: dict) -> RecordTable:
+    return RecordTable.from_data({"acme": {machine_sn: {"BIOS S/N": bios} for machine_sn, bios in machines.items()}})
+
+
+def shown(model: RecordTableModel, column: int = 1) -> list:
+    return [model.data(model.index(row, column)) for row in range(model.rowCount(QModelIndex()))]
+
+
+def test_cells_come_from_the_table():
+    model = RecordTableModel(table_of({"PF3ABC12": "BIOS-7781", "R9XYZ001": None}))
+    assert (model.rowCount(QModelIndex()), model.columnCount(QModelIndex())) == (2, len(COLUMNS))
+    assert model.headerData(1, Qt.Orientation.Horizontal) == "Machine S/N"
+    assert model.data(model.index(0, COLUMNS.index("BIOS S/N"))) == "BIOS-7781"
+    assert model.data(model.index(1, COLUMNS.index("BIOS S/N"))) == "Unknown"
+    assert model.data(model.index(0, 1), Qt.ItemDataRole.EditRole) is None
+
+
+def test_sort_and_filter_keep_the_selection():
+    model = RecordTableModel(table_of({"pf3": "B2", "MJ1": "B1", "aa9": "B3", "ZX0": "B0"}))
+    selected = QPersistentModelIndex(model.index(0, 1))  # "pf3"
+
+    model.sort(1)
+    assert shown(model) == ["aa9", "MJ1", "pf3", "ZX0"]  # Case-insensitive
+    assert selected.row() == 2
+    model.sort(COLUMNS.index("BIOS S/N"), Qt.SortOrder.DescendingOrder)
+    assert shown(model) == ["aa9", "pf3", "MJ1", "ZX0"]
+
+    model.set_visible_rows([0, 3])
+    assert shown(model) == ["pf3", "ZX0"]
+    assert selected.row() == 0 and model.source_row(0) == 0
+    model.set_visible_rows([1])
+    assert not selected.isValid()
+    model.set_visible_rows(None)
+    assert list(model.view_rows()) == [2, 0, 1, 3]
+
+
+def test_appended_rows_are_shown_once_told():
+    records = table_of({"PF3ABC12": "B1"})
+    model = RecordTableModel(records)
+    model.set_visible_rows([0])
+    records.append("acme", "MJ000777", {"BIOS S/N": "B2"})
+    assert model.rowCount(QModelIndex()) == 1
+    model.append_rows(len(records))
+    assert shown(model) == ["PF3ABC12", "MJ000777"]
@@ -0,0 +1,57 @@
+import pytest
+
+from record_query import EXACT, PREFIX, SUBSTRING, match_cells, parse_query
+from record_table import COLUMNS, RecordTable
+
+STORE = {
+    "gg245": {
+        "PF3ABC12": {"Disk S/N": [{"serial": "SAMSUNG_MZNLN512HAJQ-00007_S3UANX0M508687"}], "NIC S/N": [{"serial": "3c:7c:3f:2b:39:cd"}]},
+        "PF3ABC13": {"Disk S/N": [{"serial": "S3UANX0M508688"}, {"serial": "WD-WX11A"}], "Battery S/N": "Unknown"},
+    },
+    "gg2451": {
+        "R9XYZ001": {"Disk S/N": [], "NIC S/N": [{"serial": "52:00:a5:10:20:30"}], "Battery S/N": "BAT-01"},
+    },
+    "Acme Labs": {"MJ000777": {"Disk S/N": [{"serial": "WD-WX22B"}], "BIOS S/N": "BIOS-0777"}},
+}
+
+
+def test_parse_fields_modes_and_negation():
+    terms = parse_query('disk:=S3UANX0M508687 -client:gg245* bios:"a b" 52:00:a5 disk:')
+    assert [(term.column, term.value, term.mode, term.negate) for term in terms] == [
+        (COLUMNS.index("Disk S/N"), "s3uanx0m508687", EXACT, False),
+        (0, "gg245", PREFIX, True),
+        (COLUMNS.index("BIOS S/N"), "a b", SUBSTRING, False),
+        (None, "52:00:a5", SUBSTRING, False),
+    ]
+    assert [term.value for term in parse_query('client:"acme')] == ['"acme']
+
+
+@pytest.mark.parametrize("text, machines", [
+    ("disk:=S3UANX0M508687", ["PF3ABC12"]),
+    ("disk:s3uanx", ["PF3ABC12", "PF3ABC13"]),
+    ("disk:S3UANX0M50868*", ["PF3ABC12", "PF3ABC13"]),
+    ("client:=gg245", ["PF3ABC12", "PF3ABC13"]),
+    ("client:gg245 -client:=gg245", ["R9XYZ001"]),
+    ("nic:=3C7C3F2B39CD", ["PF3ABC12"]),
+    ("52:00:a5", ["R9XYZ001"]),
+    ("disk:=unknown", ["R9XYZ001"]),
+    ("-battery:unknown", ["R9XYZ001"]),
+    ('client:"acme labs" wd-wx', ["MJ000777"]),
+    ("machine:pf3* -disk:wd", ["PF3ABC12"]),
+])
+def test_indexed_search_matches_the_streaming_check(text, machines):
+    records = RecordTable.from_data(STORE)
+    rows = records.query(text)
+    assert [records.value(row, 1) for row in rows] == machines
+    cells = [[records.display(row, column) for column in range(len(COLUMNS))] for row in range(len(records))]
+    assert [row for row in range(len(records)) if match_cells(parse_query(text), cells[row])] == list(rows)
+
+
+def test_appended_and_removed_rows_follow_the_index():
+    records = RecordTable.from_data(STORE)
+    assert list(records.query("bios:=BIOS-0777")) == [3]
+    row = records.append("Acme Labs", "MJ000778", {"BIOS S/N": "BIOS-0777"})
+    assert list(records.query("bios:=BIOS-0777")) == [3, row]
+    records.query_index().remove_rows([3])
+    assert list(records.query("bios:=BIOS-0777")) == [row]
+    assert records.query("  ") is None
@@ -0,0 +1,52 @@
+import pytest
+
+from record_search import SearchIndex
+from record_table import COLUMNS, RecordTable
+
+
+def fleet(size: int) -> RecordTable:
+    return RecordTable.from_machines(
+        (f"client{n % 7}", f"PF{n:06}", {"Disk S/N": [{"serial": f"S3UANX0M{n * 7919 % 1000003:07}"}], "BIOS S/N": f"BIOS-{n:05}"})
+        for n in range(size)
+    )
+
+
+def scan(records: RecordTable, text: str, removed=()) -> list:
+    """The search a linear scan over every cell gives."""
+    words = text.lower().split()
+    return [
+        row for row in range(len(records))
+        if row not in removed
+        and all(any(word in records.display(row, column).lower() for column in range(len(COLUMNS))) for word in words)
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "S3UANX0M0000042", "0m000004", "00004", "x0m00", "bios-00123", "client3 bios-001", "pf0001 s3uanx", "zzzzzz", "0",
+])
+def test_index_finds_what_a_scan_finds(text):
+    records = fleet(3000)
+    index = SearchIndex(records)
+    assert list(index.search(text)) == scan(records, text)
+
+
+def test_serial_tail_is_answered_from_the_index():
+    records = fleet(3000)
+    index = SearchIndex(records)
+    tail = records.display(1234, COLUMNS.index("Disk S/N"))[-6:].lower()
+    assert index._indexed_candidates(tail) is not None
+    assert 1234 in index.search(tail)
+
+
+def test_typing_on_refines_and_removed_rows_stop_matching():
+    records = fleet(500)
+    index = SearchIndex(records)
+    assert index.search("") is None
+    assert list(index.search("bios-001")) == scan(records, "bios-001")
+    assert list(index.search("bios-0012")) == scan(records, "bios-0012")
+
+    index.remove_rows([120])
+    assert list(index.search("bios-0012")) == scan(records, "bios-0012", removed={120})
+    row = records.append("client0", "PF999999", {"BIOS S/N": "BIOS-00120"})
+    index.add_rows([row])
+    assert list(index.search("bios-00120")) == [row]
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from data_handle import DataHandle
+from record_sync import RecordSync
+from shard_store import ShardedStore
+
+STORE = {
+    "acme": {
+        "PF3ABC12": {"Disk S/N": [{"serial": "S3UANX0M508687"}], "BIOS S/N": "BIOS-7781"},
+        "PF3ABC13": {"Disk S/N": [{"serial": "S3UANX0M508688"}], "BIOS S/N": "BIOS-7782"},
+    },
+    "globex": {"R9XYZ001": {"Disk S/N": [{"serial": "WD-WX11A"}], "BIOS S/N": "BIOS-9001"}},
+}
+
+
+@pytest.fixture(params=["single", "sharded"])
+def json_file(request, tmp_path):
+    path = str(tmp_path / "client_system_info.json")
+    with open(path, "w") as file:
+        json.dump(STORE, file, indent=4)
+    if request.param == "sharded":
+        ShardedStore.create(path)
+    return path
+
+
+def rewrite(json_file: str, data: dict, previous: dict):
+    shard_dir = ShardedStore.shard_dir(json_file)
+    if shard_dir:
+        ShardedStore.write_clients(shard_dir, data, previous)
+    else:
+        with open(json_file, "w") as file:
+            json.dump(data, file, indent=4)
+
+
+def live(sync: RecordSync) -> dict:
+    """Return {(client, machine_sn): BIOS S/N} for the rows sync still holds."""
+    return {
+        (client, machine_sn): sync.records.to_dict(sync.find(client, machine_sn))["BIOS S/N"]
+        for client in sync._client_rows
+        for machine_sn in (sync.records.value(row, 1) for row in sync._client_rows[client])
+    }
+
+
+def test_unchanged_store_builds_no_row_maps(json_file):
+    sync = RecordSync(json_file, DataHandle.load_records(json_file))
+    assert sync.diff() == ([], [], [])
+    assert sync._rows is None and sync._client_rows is None
+
+
+def test_diff_and_apply_follow_the_store(json_file):
+    sync = RecordSync(json_file, DataHandle.load_records(json_file))
+    data = DataHandle.load_client_data(json_file)
+    data["acme"]["PF3ABC12"]["BIOS S/N"] = "BIOS-7799"
+    del data["acme"]["PF3ABC13"]
+    data["acme"]["PF3ABC14"] = {"BIOS S/N": "BIOS-7783"}
+    rewrite(json_file, data, {("acme", "PF3ABC12"): STORE["acme"]["PF3ABC12"], ("acme", "PF3ABC13"): {}, ("acme", "PF3ABC14"): None})
+
+    inserted, updated, removed = changes = sync.diff()
+    assert [machine_sn for _, machine_sn, _ in inserted] == ["PF3ABC14"]
+    assert [(row, machine_sn) for row, _, machine_sn, _ in updated] == [(0, "PF3ABC12")]
+    assert removed == [1]
+    removed_rows, replaced, new_rows = sync.apply(changes)
+    assert (removed_rows, replaced, new_rows) == ([1], {0: 3}, [4])
+    assert sync.live_count() == 3
+    assert live(sync) == {("acme", "PF3ABC12"): "BIOS-7799", ("acme", "PF3ABC14"): "BIOS-7783", ("globex", "R9XYZ001"): "BIOS-9001"}
+    assert sync.diff() == ([], [], [])
+
+
+def test_removed_client_retires_its_rows(json_file):
+    sync = RecordSync(json_file, DataHandle.load_records(json_file))
+    data = DataHandle.load_client_data(json_file)
+    del data["globex"]
+    shard_dir = ShardedStore.shard_dir(json_file)
+    if shard_dir:
+        with open(f"{shard_dir}/manifest.json") as file:
+            manifest = json.load(file)
+        del manifest["clients"]["globex"]
+        with open(f"{shard_dir}/manifest.json", "w") as file:
+            json.dump(manifest, file, indent=4)
+    else:
+        rewrite(json_file, data, {})
+
+    changes = sync.diff()
+    assert changes == ([], [], [2])
+    sync.apply(changes)
+    assert sync.find("globex", "R9XYZ001") is None
+    assert sync.live_count() == 2
@@ -0,0 +1,71 @@
+import json
+
+from data_handle import DataHandle
+from shard_store import ShardedStore
+
+STORE = {
+    "acme": {
+        "Unknown+1": {"Disk S/N": [{"serial": "S3UANX0M508687"}], "BIOS S/N": "BIOS-7781"},
+        "PF3ABC12": {"Disk S/N": [{"serial": "WD-WX11A"}], "BIOS S/N": "BIOS-7782"},
+    },
+}
+
+
+def sharded_store(tmp_path) -> str:
+    json_file = str(tmp_path / "client_system_info.json")
+    with open(json_file, "w") as file:
+        json.dump(STORE, file, indent=4)
+    return ShardedStore.create(json_file)
+
+
+def stage(shard_dir: str, machine_sn: str, record: dict):
+    """Decide a save on the shard as loaded now, without writing it: (data, previous)."""
+    data = {"acme": ShardedStore.load_client(shard_dir, "acme")}
+    if machine_sn == "Unknown":
+        previous = DataHandle._add_new_into("acme", machine_sn, record, data)
+    else:
+        data["acme"][machine_sn] = record
+        previous = {("acme", machine_sn): None}
+    return data, previous
+
+
+def test_concurrent_placeholder_saves_get_their_own_number(tmp_path):
+    shard_dir = sharded_store(tmp_path)
+    first = stage(shard_dir, "Unknown", {"BIOS S/N": "BIOS-0001"})
+    second = stage(shard_dir, "Unknown", {"BIOS S/N": "BIOS-0002"})
+    assert list(first[1]) == list(second[1]) == [("acme", "Unknown+2")]
+
+    ShardedStore.write_clients(shard_dir, *first)
+    data, previous = second
+    ShardedStore.write_clients(shard_dir, data, previous)
+    assert previous == {("acme", "Unknown+3"): None}
+
+    machines = ShardedStore.load_client(shard_dir, "acme")
+    assert machines["Unknown+2"] == {"BIOS S/N": "BIOS-0001"}
+    assert machines["Unknown+3"] == {"BIOS S/N": "BIOS-0002"}
+    assert data["acme"] == machines
+    owners = ShardedStore.identity(shard_dir).get("B:BIOS0002")
+    assert [list(owner) for owner in owners] == [["acme", "Unknown+3"]]
+
+
+def test_concurrent_saves_of_one_machine_are_merged(tmp_path):
+    shard_dir = sharded_store(tmp_path)
+    first = stage(shard_dir, "MJ000777", {"Disk S/N": [{"serial": "S3UANX0M500001"}], "BIOS S/N": "BIOS-0777"})
+    second = stage(shard_dir, "mj-000777", {"Disk S/N": [{"serial": "S3UANX0M500002"}], "BIOS S/N": "BIOS-0777"})
+
+    ShardedStore.write_clients(shard_dir, *first)
+    data, previous = second
+    ShardedStore.write_clients(shard_dir, data, previous)
+    assert list(previous) == [("acme", "MJ000777")]
+
+    machines = ShardedStore.load_client(shard_dir, "acme")
+    assert sorted(machines) == ["MJ000777", "PF3ABC12", "Unknown+1"]
+    assert [entry["serial"] for entry in machines["MJ000777"]["Disk S/N"]] == ["S3UANX0M500001", "S3UANX0M500002"]
+
+
+def test_machines_the_save_had_seen_are_left_alone(tmp_path):
+    # Same BIOS S/N as a machine the save loaded: the save already chose to add it as new.
+    shard_dir = sharded_store(tmp_path)
+    data, previous = stage(shard_dir, "R9XYZ001", {"BIOS S/N": "BIOS-7782"})
+    ShardedStore.write_clients(shard_dir, data, previous)
+    assert sorted(ShardedStore.load_client(shard_dir, "acme")) == ["PF3ABC12", "R9XYZ001", "Unknown+1"]
@@ -0,0 +1,98 @@
+import json
+
+from components import ComponentModel
+from snapshot_diff import SnapshotDiff, field_changes
+
+LEGACY = {
+    "acme": {
+        "PF3ABC12": {
+            "Disk S/N": "SAMSUNG_MZNLN512HAJQ-00007_S3UANX0M508687",
+            "RAM S/N": "1A2B3C4D, 5E6F7A8B",
+            "NIC S/N": "3c:7c:3f:2b:39:cd",
+            "CPU S/N": "BFEBFBFF000906EA",
+            "BIOS S/N": "BIOS-7781",
+            "Battery S/N": "Unknown",
+        },
+        "PF3ABC13": {"Disk S/N": "WD-WX11A", "RAM S/N": "99887766", "BIOS S/N": "BIOS-7782"},
+    },
+    "globex": {
+        "R9XYZ001": {"Disk S/N": "S4EVNF0M1", "BIOS S/N": "BIOS-9001", "NIC S/N": "aa:bb:cc:00:11:22"},
+    },
+}
+
+
+def write_store(path, data) -> str:
+    with open(path, "w") as file:
+        json.dump(data, file, indent=4)
+    return str(path)
+
+
+def diff(tmp_path, old: dict, new: dict, partitions: int = 4):
+    old_file, new_file = write_store(tmp_path / "old.json", old), write_store(tmp_path / "new.json", new)
+    engine = SnapshotDiff(old_file, new_file, partitions)
+    return list(engine.events()), engine.counts
+
+
+def test_migrated_store_is_unchanged(tmp_path):
+    legacy_file = write_store(tmp_path / "legacy.json", LEGACY)
+    migrated_file = str(tmp_path / "migrated.json")
+    ComponentModel.migrate_store(legacy_file, migrated_file)
+
+    engine = SnapshotDiff(legacy_file, migrated_file, 4)
+    assert list(engine.events()) == []
+    assert engine.counts["unchanged"] == 3
+    assert engine.counts["changed"] == 0
+
+
+def test_udev_and_sysfs_forms_of_a_disk_are_one_serial():
+    old = {"Disk S/N": "SAMSUNG_MZNLN512HAJQ-00007_S3UANX0M508687"}
+    new = {"Disk S/N": [{"serial": "S3UANX0M508687"}]}
+    assert field_changes(old, new) == {}
+
+
+def test_component_swap_lists_added_and_removed(tmp_path):
+    new = json.loads(json.dumps(LEGACY))
+    new["acme"]["PF3ABC12"]["RAM S/N"] = [{"serial": "1A2B3C4D"}, {"serial": "CAFEF00D"}]
+    events, counts = diff(tmp_path, LEGACY, new)
+
+    assert events == [{
+        "change": "changed", "client": "acme", "machine": "PF3ABC12",
+        "fields": {"RAM S/N": {"added": ["CAFEF00D"], "removed": ["5E6F7A8B"]}},
+    }]
+    assert counts["changed"] == 1 and counts["unchanged"] == 2
+
+
+def test_detail_only_edit_is_listed_under_details():
+    old = {"NIC S/N": [{"serial": "3c:7c:3f:2b:39:cd"}]}
+    new = {"NIC S/N": [{"serial": "3C7C3F2B39CD", "slot": "enp0s31f6"}]}
+    assert field_changes(old, new) == {"NIC S/N": {"details": ["3C7C3F2B39CD"]}}
+
+
+def test_machine_moved_between_clients(tmp_path):
+    new = json.loads(json.dumps(LEGACY))
+    new["globex"]["PF3ABC13"] = new["acme"].pop("PF3ABC13")
+    events, counts = diff(tmp_path, LEGACY, new)
+
+    assert events == [{"change": "moved", "client": "globex", "machine": "PF3ABC13", "from_client": "acme", "fields": {}}]
+    assert counts["moved"] == 1
+
+
+def test_machine_renamed_is_matched_by_bios(tmp_path):
+    new = json.loads(json.dumps(LEGACY))
+    new["globex"]["R9XYZ999"] = new["globex"].pop("R9XYZ001")
+    events, _ = diff(tmp_path, LEGACY, new)
+
+    assert events == [{"change": "changed", "client": "globex", "machine": "R9XYZ999", "from_machine": "R9XYZ001", "fields": {}}]
+
+
+def test_added_and_removed_machines(tmp_path):
+    new = json.loads(json.dumps(LEGACY))
+    del new["acme"]["PF3ABC13"]
+    new["initech"] = {"MJ000777": {"BIOS S/N": "BIOS-0777"}}
+    events, counts = diff(tmp_path, LEGACY, new)
+
+    assert sorted(events, key=lambda event: event["change"]) == [
+        {"change": "added", "client": "initech", "machine": "MJ000777"},
+        {"change": "removed", "client": "acme", "machine": "PF3ABC13"},
+    ]
+    assert counts["added"] == 1 and counts["removed"] == 1
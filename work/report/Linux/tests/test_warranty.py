@@ -0,0 +1,152 @@
+import json
+
+import pytest
+
+from warranty import CACHE_TTL, MISS_TTL, DellAdapter, LenovoAdapter, RateLimiter, WarrantyLookup, warranty_result
+
+DELL_TAG = "7QW3KX2"
+LENOVO_SERIAL = "PF3ABC12"
+
+
+class FakeClock:
+    """A clock that only moves when sleep() is called or a test advances it."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StandInDell(DellAdapter):
+    """Dell without the network: every fetch is recorded and answered with the canned body."""
+
+    def __init__(self, body: bytes = b"[]"):
+        super().__init__("http://127.0.0.1:9", "key")
+        self.body = body
+        self.fetched = []
+
+    def fetch(self, serials: list) -> dict:
+        self.fetched.append(list(serials))
+        return self.parse(self.body, serials)
+
+
+def dell_answer(*serials, end_date="2099-01-31") -> bytes:
+    return json.dumps([
+        {"serviceTag": serial, "productLineDescription": "Latitude 5420", "entitlements": [{"endDate": f"{end_date}T23:59:59Z"}]}
+        for serial in serials
+    ]).encode()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_lookup(tmp_path, clock, *adapters) -> WarrantyLookup:
+    return WarrantyLookup(str(tmp_path / "client_system_info.json"), list(adapters), clock=clock, sleep=clock.sleep)
+
+
+def test_rate_limiter_allows_a_burst_then_spaces_requests(clock):
+    limiter = RateLimiter(rate=2.0, burst=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == pytest.approx([0.5, 0.5, 0.5])
+
+
+def test_rate_limiter_refills_while_idle(clock):
+    limiter = RateLimiter(rate=1.0, burst=2, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+    limiter.acquire()
+
+    clock.now += 10  # Idle time refills the bucket, but never above the burst
+    for _ in range(2):
+        limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_cached_answer_is_reused_until_the_ttl_expires(tmp_path, clock):
+    dell = StandInDell(dell_answer(DELL_TAG))
+    machines = [(DELL_TAG, "Dell Inc.")]
+
+    first = make_lookup(tmp_path, clock, dell).lookup(machines)[DELL_TAG]
+    assert first["status"] == "active" and first["end_date"] == "2099-01-31"
+    assert dell.fetched == [[DELL_TAG]]
+
+    clock.now += CACHE_TTL - 1
+    assert make_lookup(tmp_path, clock, dell).lookup(machines)[DELL_TAG] == first
+    assert len(dell.fetched) == 1
+
+    clock.now += 2
+    assert make_lookup(tmp_path, clock, dell).lookup(machines)[DELL_TAG]["checked"] == int(clock.now)
+    assert len(dell.fetched) == 2
+
+
+def test_not_found_is_asked_again_after_the_miss_ttl(tmp_path, clock):
+    dell = StandInDell(b"[]")
+    machines = [(DELL_TAG, "Dell Inc.")]
+
+    assert make_lookup(tmp_path, clock, dell).lookup(machines)[DELL_TAG]["status"] == "not found"
+    clock.now += MISS_TTL - 1
+    make_lookup(tmp_path, clock, dell).lookup(machines)
+    assert len(dell.fetched) == 1
+
+    clock.now += 2
+    make_lookup(tmp_path, clock, dell).lookup(machines)
+    assert len(dell.fetched) == 2
+
+
+def test_refresh_ignores_the_cache(tmp_path, clock):
+    dell = StandInDell(dell_answer(DELL_TAG))
+    lookup = make_lookup(tmp_path, clock, dell)
+    lookup.lookup([(DELL_TAG, "Dell Inc.")])
+    lookup.lookup([(DELL_TAG, "Dell Inc.")], refresh=True)
+    assert len(dell.fetched) == 2
+
+
+@pytest.mark.parametrize("body", [b"<html>Service Unavailable</html>", b'{"error": "invalid key"}', b"[42]"])
+def test_unparsable_answer_is_an_error_and_is_not_cached(tmp_path, clock, body):
+    dell = StandInDell(body)
+    machines = [(DELL_TAG, "Dell Inc."), ("5RT8MN1", "Dell Inc.")]
+
+    results = make_lookup(tmp_path, clock, dell).lookup(machines)
+    assert {result["status"] for result in results.values()} == {"error"}
+    assert all(result["vendor"] == "dell" and result["error"] for result in results.values())
+
+    dell.body = dell_answer(DELL_TAG, "5RT8MN1")
+    results = make_lookup(tmp_path, clock, dell).lookup(machines)
+    assert {result["status"] for result in results.values()} == {"active"}
+    assert len(dell.fetched) == 2
+
+
+def test_vendorless_serial_goes_only_to_the_one_adapter_it_singles_out(tmp_path, clock):
+    dell, lenovo = StandInDell(), LenovoAdapter("http://127.0.0.1:9", "key")
+    lookup = make_lookup(tmp_path, clock, dell, lenovo)
+
+    # A 7-character serial is also HP's, Lenovo's, ...: without the system vendor it is not Dell's.
+    assert lookup.adapter_for(DELL_TAG) is None
+    assert lookup.adapter_for(DELL_TAG, "Dell Inc.") is dell
+    assert lookup.adapter_for(DELL_TAG, "HP") is None
+    assert lookup.adapter_for(LENOVO_SERIAL) is lenovo
+    assert lookup.adapter_for(LENOVO_SERIAL, "To Be Filled By O.E.M.") is lenovo
+
+    assert lookup.lookup([DELL_TAG])[DELL_TAG] == {"vendor": None, "status": "unknown vendor"}
+    assert dell.fetched == []
+
+
+def test_warranty_result_status_follows_the_end_date():
+    assert warranty_result("dell", "2030-06-30T00:00:00Z", today="2026-10-19")["status"] == "active"
+    assert warranty_result("dell", "2020-06-30", today="2026-10-19")["status"] == "expired"
+    assert warranty_result("dell")["status"] == "not found"
@@ -1,11 +1,27 @@
-import sys
 import json
+import os
+import sys
+import threading
+from array import array
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLineEdit, QPushButton, 
-    QTableWidget, QTableWidgetItem, QHBoxLayout
+    QTableView, QHeaderView, QHBoxLayout, QLabel, QProgressBar, QStackedWidget, QTreeView, QFileDialog
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import QFileSystemWatcher, QThreadPool, QTimer
 from addReport import AddReport  # Import AddReport class
+from data_handle import DataHandle
+from inventory_snapshot import InventorySnapshot
+from record_export import RecordExport
+from record_fuzzy import FuzzyIndex
+from record_groups import ClientGroups
+from record_model import ClientTreeModel, RecordTableModel
+from record_sync import RecordSync
+from record_table import COLUMNS, RecordTable
+from shard_store import ShardedStore
+from workers import Worker
+
+SEARCH_DEBOUNCE_MS = 25  # Wait for a pause in typing before filtering
+STORE_SETTLE_MS = 300  # Wait for a burst of store writes to finish before diffing
 
 class ViewReport(QWidget):
     def __init__(self):
@@ -18,104 +34,386 @@ class ViewReport(QWidget):
         # Search Bar, Refresh Button & Add Report Button
         button_layout = QHBoxLayout()
         self.search_bar = QLineEdit()
-        self.search_bar.setPlaceholderText("Search by any field (Client, Machine S/N, Disk, RAM, Battery)...")
-        self.search_bar.textChanged.connect(self.filter_data)
+        self.search_bar.setPlaceholderText("Search any field, or scope it: disk:S3UANX client:=GG245 ram:B68* -battery:unknown")
+        self.search_bar.setToolTip(
+            "word: in any column    field:word: in one column (client, machine, disk, ram, battery, cpu, bios, gpu, nic, power, display)\n"
+            "field:=value: exact serial    field:value*: serial prefix    -term: exclude    \"quoted words\": keep spaces\n"
+            "A serial with no match lists the closest serials instead (typos, O/0 and I/1 mix-ups)"
+        )
+        # Keystrokes restart the timer; filtering runs once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.filter_data)
+        self.search_bar.textChanged.connect(self.search_timer.start)
 
         self.refresh_button = QPushButton("Refresh")
         self.refresh_button.clicked.connect(self.load_data)
 
+        self.group_button = QPushButton("Group by Client")
+        self.group_button.setCheckable(True)
+        self.group_button.toggled.connect(self.toggle_grouping)
+
+        self.export_button = QPushButton("Export")
+        self.export_button.clicked.connect(self.export_view)
+
         self.add_report_button = QPushButton("Add Report")
         self.add_report_button.clicked.connect(self.run_add_report)  # Opens AddReport window
 
         button_layout.addWidget(self.search_bar)
         button_layout.addWidget(self.refresh_button)
+        button_layout.addWidget(self.group_button)
+        button_layout.addWidget(self.export_button)
         button_layout.addWidget(self.add_report_button)
         main_layout.addLayout(button_layout)
 
-        # Table Widget
-        self.table = QTableWidget()
-        self.table.setColumnCount(11)
-        self.table.setHorizontalHeaderLabels([
-            "Client",
-            "Machine S/N",
-            "Disk S/N",
-            "RAM S/N",
-            "Battery S/N",
-            "CPU S/N",
-            "BIOS S/N",
-            "GPU S/N",
-            "NIC S/N",
-            "Power S/N",
-            "Display S/N"
-        ])
+        # Table View over a lazy model: only painted rows produce cells
+        self.model = RecordTableModel()
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setSortingEnabled(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        main_layout.addWidget(self.table)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        # Fixed row heights let the view skip measuring every row
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        # Size columns from the first rows rather than measuring a thousand of them
+        self.table.horizontalHeader().setResizeContentsPrecision(100)
+
+        # Tree View grouped by client: machines are only fetched when a client is expanded
+        self.groups = None
+        self.visible_rows = None
+        self.tree_stale = False
+        self.tree_model = ClientTreeModel()
+        self.tree = QTreeView()
+        self.tree.setModel(self.tree_model)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setSelectionBehavior(QTreeView.SelectionBehavior.SelectRows)
+
+        self.views = QStackedWidget()
+        self.views.addWidget(self.table)
+        self.views.addWidget(self.tree)
+        main_layout.addWidget(self.views)
+
+        # Row count and load progress
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.hide()
+        status_layout.addWidget(self.status_label)
+        status_layout.addStretch()
+        status_layout.addWidget(self.progress_bar)
+        main_layout.addLayout(status_layout)
 
         self.setLayout(main_layout)
 
+        # Searches run off the GUI thread, one at a time; the generation drops stale results
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(1)
+        self.search_generation = 0
+
+        # The store is parsed on a worker thread; Refresh cancels a load still in progress
+        self.load_generation = 0
+        self.load_cancel = None
+        self.loading = False
+
+        # Store changes on disk are diffed and applied row by row instead of reloading
+        self.sync = None
+        self.snapshot = None  # The mapped snapshot the table was opened from, if any
+        self.load_stamps = None
+        self.refresh_running = False
+        self.refresh_pending = False
+        self.store_timer = QTimer(self)
+        self.store_timer.setSingleShot(True)
+        self.store_timer.setInterval(STORE_SETTLE_MS)
+        self.store_timer.timeout.connect(self.refresh_changes)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.store_timer.start)
+        self.watcher.directoryChanged.connect(self.store_timer.start)
+
         # Load JSON Data
         self.load_data()
 
     def load_data(self):
-        """ Load JSON file and display it in the table, auto-resize columns """
-        self.table.setRowCount(0)  # Clear table before loading
+        """
+        Open the store's snapshot when it is fresh, or else start loading the JSON file into the
+        table model on a worker thread; any load in progress is cancelled
+        """
+        if self.load_cancel is not None:
+            self.load_cancel.set()
+        self.load_cancel = threading.Event()
+        self.load_generation += 1
+        self.search_generation += 1  # Results computed against the old table are discarded
+        self.loading = True
+
+        # Stamp the store before it is read, so changes made during the load are caught
+        self.load_stamps = RecordSync.store_stamps(DataHandle.json_file)
+        self.snapshot = InventorySnapshot.open(DataHandle.json_file, self.load_stamps)
+        records = RecordTable() if self.snapshot is None else self.snapshot.table
+        self.sync = RecordSync(DataHandle.json_file, records, self.load_stamps)
+        self.model.set_records(records)
+        self.groups = None
+        self.visible_rows = None
+        self.tree_model.set_groups(None)
+        if self.snapshot is not None:
+            # The snapshot maps in at once with its rows grouped: no loader thread needed
+            self.load_finished((self.load_generation, records, self.snapshot.groups(), None))
+            return
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.status_label.setText("Loading...")
+
+        worker = Worker(self.load, DataHandle.json_file, records, self.load_generation, self.load_cancel, progress=True)
+        worker.signals.progress.connect(self.load_progress)
+        worker.signals.finished.connect(self.load_finished)
+        worker.signals.error.connect(self.load_failed)
+        QThreadPool.globalInstance().start(worker)
+
+    @staticmethod
+    def load(json_file, records, generation, cancelled, progress):
+        """ Runs on the loader thread: stream machines into records, reporting each batch, then group them by client """
+        error = None
         try:
-            with open("client_system_info.json", "r") as file:
-                data = json.load(file)
-
-            row = 0
-            for client, machines in data.items():
-                for machine_sn, details in machines.items():
-                    self.table.insertRow(row)
-                    # Column 0: Client
-                    self.table.setItem(row, 0, QTableWidgetItem(client))
-                    # Column 1: Machine S/N
-                    self.table.setItem(row, 1, QTableWidgetItem(machine_sn))
-                    # Column 2: Disk S/N
-                    self.table.setItem(row, 2, QTableWidgetItem(details.get("Disk S/N", "Unknown")))
-                    # Column 3: RAM S/N
-                    self.table.setItem(row, 3, QTableWidgetItem(details.get("RAM S/N", "Unknown")))
-                    # Column 4: Battery S/N
-                    self.table.setItem(row, 4, QTableWidgetItem(details.get("Battery S/N", "Unknown")))
-                    # Column 5: CPU S/N
-                    self.table.setItem(row, 5, QTableWidgetItem(details.get("CPU S/N", "Unknown")))
-                    # Column 6: BIOS S/N
-                    self.table.setItem(row, 6, QTableWidgetItem(details.get("BIOS S/N", "Unknown")))
-                    # Column 7: GPU S/N
-                    self.table.setItem(row, 7, QTableWidgetItem(details.get("GPU S/N", "Unknown")))
-                    # Column 8: NIC S/N
-                    self.table.setItem(row, 8, QTableWidgetItem(details.get("NIC S/N", "Unknown")))
-                    # Column 9: Power S/N
-                    self.table.setItem(row, 9, QTableWidgetItem(details.get("Power S/N", "Unknown")))
-                    # Column 10: Display S/N
-                    self.table.setItem(row, 10, QTableWidgetItem(details.get("Display S/N", "Unknown")))
-                    row += 1
-
-            # Auto-resize columns to fit content
-            self.table.resizeColumnsToContents()
+            for rows, fraction in DataHandle.stream_records(json_file, records):
+                if cancelled.is_set():
+                    return generation, None, None, None
+                progress((generation, rows, fraction))
+        except (json.JSONDecodeError, OSError) as exception:
+            # Keep the machines read before the damaged part of the file.
+            error = f"Could not read the rest of {json_file}: {exception}"
+        return generation, records, ClientGroups(records), error
+
+    def load_progress(self, update):
+        """ Show the rows parsed so far as one batch """
+        generation, rows, fraction = update
+        if generation != self.load_generation:
+            return
+        first_batch = self.model.rowCount() == 0
+        self.model.append_rows(rows)
+        self.progress_bar.setValue(int(fraction * 1000))
+        self.status_label.setText(f"Loading... {rows:,} machines")
+        if first_batch:
             self.adjust_window_size()
 
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.table.setRowCount(0)  # Clear table if file is missing/corrupt
+    def load_finished(self, result):
+        """ Finish a load: pack the table, place rows in sort order, build the search indexes and apply the search """
+        generation, records, groups, error = result
+        if generation != self.load_generation or records is None:
+            return
+        self.loading = False
+        self.groups = groups
+        self.tree_stale = True
+        if self.snapshot is None:
+            # The loader thread is done with the table, so it can be packed safely.
+            records.freeze()
+            self.model.append_rows(len(records))
+            self.model.resort()
+            if not error:
+                # Publish the table for the next viewer, stamped as the store was before it was read
+                QThreadPool.globalInstance().start(
+                    Worker(InventorySnapshot.publish, DataHandle.json_file, records, self.load_stamps, len(records))
+                )
+        self.progress_bar.hide()
+        self.update_status()
+        if error:
+            self.status_label.setText(f"{self.status_label.text()}  ⚠ {error}")
+        self.update_tree()
+
+        # Auto-resize columns to fit content
+        self.adjust_window_size()
 
+        # Build the search indexes on the search thread, ahead of any query
+        self.search_pool.start(Worker(records.query_index))
+        # The typo-tolerant serial index takes longest to build, so it is built apart and attached when ready
+        worker = Worker(FuzzyIndex, records)
+        worker.signals.finished.connect(self.fuzzy_ready)
+        QThreadPool.globalInstance().start(worker)
+        if self.search_bar.text().strip():
+            self.filter_data()
+        self.watch_store()
+        self.store_timer.start()  # Catch writes made while the store was loading
+
+    def watch_store(self):
+        """ Watch the store file and its directory (atomic writes replace the file), or the shard layout """
+        json_file = DataHandle.json_file
+        shard_dir = ShardedStore.shard_dir(json_file)
+        if shard_dir:
+            paths = [shard_dir, os.path.join(shard_dir, "shards"), os.path.join(shard_dir, "manifest.json")]
+        else:
+            paths = [json_file, os.path.dirname(os.path.abspath(json_file))]
+        watched = set(self.watcher.files() + self.watcher.directories())
+        missing = [path for path in paths if path not in watched and os.path.exists(path)]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def refresh_changes(self):
+        """ Diff the store against the loaded table on a worker thread, one diff at a time """
+        if self.loading or self.sync is None:
+            return
+        if self.refresh_running:
+            self.refresh_pending = True
+            return
+        self.refresh_running = True
+        worker = Worker(self.diff_store, self.sync, self.load_generation)
+        worker.signals.finished.connect(self.apply_store_changes)
+        worker.signals.error.connect(self.refresh_failed)
+        QThreadPool.globalInstance().start(worker)
+
+    @staticmethod
+    def diff_store(sync, generation):
+        """ Runs on the loader thread: compare the store with the table, without touching any widget """
+        try:
+            return generation, sync.diff()
+        except (json.JSONDecodeError, OSError):
+            return generation, None  # The store is mid-write; try again once it settles
+
+    def apply_store_changes(self, result):
+        """ Apply inserted, updated and removed machines to the table, the view and the search indexes """
+        self.refresh_running = False
+        generation, changes = result
+        self.watch_store()
+        if generation != self.load_generation:
+            return
+        if changes is None:
+            self.store_timer.start()
+        elif any(changes):
+            records = self.model.records
+            removed, replaced, inserted = self.sync.apply(changes)
+            self.model.apply_changes(removed, replaced, inserted)
+            self.groups.apply(removed, replaced, inserted)
+            if self.tree_stale or not self.group_button.isChecked():
+                self.tree_stale = True
+            else:
+                self.tree_model.apply_changes(removed, replaced, inserted)
+            self.search_generation += 1
+            self.search_pool.start(Worker(self.retire_rows, records, removed + list(replaced)))
+            if self.search_bar.text().strip():
+                self.filter_data()
+            self.update_status()
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.refresh_changes()
+
+    def refresh_failed(self, error):
+        """ Keep watching after an unexpected diff failure """
+        self.refresh_running = False
+        self.status_label.setText(f"⚠ Refresh failed: {error.strip().splitlines()[-1]}")
+
+    def fuzzy_ready(self, index):
+        """ Hand a finished FuzzyIndex to the search thread, then retry a search that found nothing """
+        if index.records is not self.model.records:
+            return  # Built for a table that has since been reloaded
+        self.search_pool.start(Worker(self.attach_fuzzy, index))
+        if self.visible_rows is not None and not self.visible_rows:
+            self.filter_data()
+
+    @staticmethod
+    def attach_fuzzy(index):
+        """ Runs on the search thread, so a search never sees the index half attached """
+        index.records.query_index().fuzzy = index
+
+    @staticmethod
+    def retire_rows(records, rows):
+        """ Runs on the search thread: index appended rows and stop matching retired ones """
+        records.query_index().remove_rows(rows)
+
+    def load_failed(self, error):
+        """ Stop showing progress when the loader thread failed unexpectedly """
+        self.loading = False
+        self.progress_bar.hide()
+        self.status_label.setText(f"⚠ Loading failed: {error.strip().splitlines()[-1]}")
+
+    def update_status(self):
+        """ Show how many machines are listed """
+        total = self.sync.live_count() if self.sync else len(self.model.records)
+        shown = self.model.rowCount()
+        self.status_label.setText(f"{total:,} machines" if shown == total else f"{shown:,} of {total:,} machines")
 
     def adjust_window_size(self):
         """ Adjusts the window size to fit the table contents """
         self.table.resizeColumnsToContents()  # Make columns fit content
-        width = sum(self.table.columnWidth(i) for i in range(self.table.columnCount())) + 50
-        height = (self.table.rowHeight(0) * (self.table.rowCount() + 2)) + 100
+        width = sum(self.table.columnWidth(i) for i in range(self.model.columnCount())) + 50
+        visible_rows = min(self.model.rowCount(), 30)  # Large tables scroll instead of growing the window
+        height = (self.table.rowHeight(0) * (visible_rows + 2)) + 100
         self.resize(width, height)
 
     def filter_data(self):
         """ Filter table content based on search bar input (supports spaces and multiple words) """
-        filter_text = self.search_bar.text().strip().lower()
-        words = filter_text.split()  # Allows searching multiple words in any order
+        if self.loading:
+            return  # Applied once loading finishes
+        self.search_generation += 1
+        worker = Worker(self.search, self.model.records, self.search_generation, self.search_bar.text())
+        worker.signals.finished.connect(self.apply_filter)
+        self.search_pool.start(worker)
+
+    @staticmethod
+    def search(records, generation, text):
+        """ Runs on the search thread: match rows without touching any widget, or the closest serials if none match """
+        rows = records.query(text)
+        closest = records.query_index().closest(text) if rows is not None and not rows else []
+        return generation, rows, closest
+
+    def apply_filter(self, result):
+        """ Show the matching rows in one batch, unless a newer search has started since """
+        generation, rows, closest = result
+        if generation == self.search_generation:
+            if closest:
+                rows = array("I", sorted(row for _, row, _, _ in closest))
+            self.model.set_visible_rows(rows)
+            self.visible_rows = rows
+            self.tree_stale = True
+            self.update_tree()
+            self.update_status()
+            if closest:
+                self.status_label.setText(self.closest_text(closest))
+
+    @staticmethod
+    def closest_text(closest):
+        """ Describe the closest serials shown when nothing matched exactly """
+        differences = {0: "look-alike characters", 1: "1 typo"}
+        shown = ", ".join(
+            f"{serial} ({COLUMNS[column]}, {differences.get(distance, f'{distance} typos')})"
+            for distance, _, column, serial in closest[:3]
+        )
+        more = f" and {len(closest) - 3} more" if len(closest) > 3 else ""
+        return f"No exact match. Closest: {shown}{more}"
+
+    def toggle_grouping(self, grouped):
+        """ Switch between the flat table and the tree grouped by client """
+        self.views.setCurrentWidget(self.tree if grouped else self.table)
+        self.update_tree()
+
+    def update_tree(self):
+        """ Regroup the tree for the current load and search, but only while it is shown """
+        if not self.tree_stale or self.groups is None or not self.group_button.isChecked():
+            return
+        grouped = None if self.visible_rows is None else self.groups.subset(self.visible_rows)
+        self.tree_model.set_groups(self.groups, grouped)
+        self.tree.resizeColumnToContents(0)
+        self.tree_stale = False
 
-        for row in range(self.table.rowCount()):
-            row_text = " ".join([self.table.item(row, col).text().lower() for col in range(self.table.columnCount()) if self.table.item(row, col)])
-            match = all(word in row_text for word in words)  # Check if all words exist in any column
-            self.table.setRowHidden(row, not match)
+    def export_view(self):
+        """ Export the machines currently listed (search and sort applied) to CSV or XLSX on a worker thread """
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export Machines", "machines.xlsx", "Excel Workbook (*.xlsx);;CSV (*.csv)"
+        )
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += ".csv" if "csv" in selected.lower() else ".xlsx"
+        rows = self.model.view_rows()
+        self.status_label.setText(f"Exporting {len(rows):,} machines...")
+        worker = Worker(RecordExport.write_table, self.model.records, rows, path, progress=True)
+        worker.signals.progress.connect(
+            lambda count: self.status_label.setText(f"Exporting... {count:,} of {len(rows):,} machines")
+        )
+        worker.signals.finished.connect(
+            lambda count: self.status_label.setText(f"✅ Exported {count:,} machines to {path}")
+        )
+        worker.signals.error.connect(
+            lambda error: self.status_label.setText(f"⚠ Export failed: {error.strip().splitlines()[-1]}")
+        )
+        QThreadPool.globalInstance().start(worker)
 
     def run_add_report(self):
         """ Opens the AddReport window """
@@ -0,0 +1,318 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from components import ComponentModel
+from shard_store import ShardedStore, atomic_write_json
+
+CACHE_TTL = 7 * 24 * 3600  # Seconds a vendor answer is reused
+MISS_TTL = 24 * 3600  # "not found" is asked again sooner: vendors register machines late
+TIMEOUT = 30
+RETRIES = 3  # Extra attempts after a 429 or 5xx answer
+
+
+class RateLimiter:
+    """
+    Token bucket shared by the threads calling one vendor: at most `rate` requests per
+    second on average, with bursts of up to `burst`. A caller that finds the bucket
+    empty reserves the next token and sleeps until it is due.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+def warranty_result(vendor: str, end_date: str = None, product: str = None, today: str = None) -> dict:
+    """Build a lookup result; the status is "active" or "expired" from the end date, "not found" without one."""
+    end_date = end_date[:10] if end_date else None
+    if end_date is None:
+        status = "not found"
+    else:
+        status = "active" if end_date >= (today or time.strftime("%Y-%m-%d")) else "expired"
+    return {"vendor": vendor, "status": status, "end_date": end_date, "product": product}
+
+
+def describe(result: dict) -> str:
+    """Return a one-line description of a lookup result, e.g. "active until 2026-03-31 (Latitude 5420)"."""
+    if result["status"] in ("active", "expired"):
+        text = f"{result['status']} until {result['end_date']}"
+        return f"{text} ({result['product']})" if result.get("product") else text
+    return result.get("error") or result["status"]
+
+
+class VendorAdapter(ABC):
+    """
+    One vendor's warranty API. Subclasses set the class attributes and implement
+    request() and parse(); everything else (batching, rate limits, caching) is WarrantyLookup's.
+    The endpoint and API key come from <NAME>_WARRANTY_URL and <NAME>_WARRANTY_KEY unless given,
+    so an adapter can be pointed at a local stand-in server.
+    """
+
+    name = ""
+    aliases = ()  # Lower-case fragments of the DMI system vendor, e.g. "dell inc."
+    # Serials recognized without a vendor name; only a shape no other vendor uses belongs here.
+    serial_pattern = None
+    default_url = ""
+    batch_size = 1  # Serials per request
+    rate = 1.0  # Requests per second
+    concurrency = 2  # Requests in flight
+
+    def __init__(self, base_url: str = None, api_key: str = None):
+        self.base_url = (base_url or os.environ.get(f"{self.name.upper()}_WARRANTY_URL", self.default_url)).rstrip("/")
+        self.api_key = api_key if api_key is not None else os.environ.get(f"{self.name.upper()}_WARRANTY_KEY", "")
+
+    def matches(self, serial: str, vendor: str = None) -> bool:
+        """Return True if this adapter handles a machine, by its system vendor or else by its serial format."""
+        if vendor:
+            return any(alias in vendor.lower() for alias in self.aliases)
+        return self.serial_pattern is not None and re.fullmatch(self.serial_pattern, serial) is not None
+
+    @abstractmethod
+    def request(self, serials: list) -> urllib.request.Request:
+        """Return the request asking for a batch of serials."""
+
+    @abstractmethod
+    def parse(self, body: bytes, serials: list) -> dict:
+        """Return {serial: warranty_result(...)} for a response; serials missing from it are "not found"."""
+
+    def fetch(self, serials: list) -> dict:
+        with urllib.request.urlopen(self.request(serials), timeout=TIMEOUT) as response:
+            return self.parse(response.read(), serials)
+
+
+class DellAdapter(VendorAdapter):
+    """Dell asset entitlements (API v5): up to 100 service tags per GET, bearer token."""
+
+    name = "dell"
+    aliases = ("dell",)
+    # None: a 7-character service tag looks like Lenovo's, HP's and other vendors' serials,
+    # so a Dell machine is only recognized by its system vendor.
+    serial_pattern = None
+    default_url = "https://apigtwb2c.us.dell.com/PROD/sbil/eapi/v5"
+    batch_size = 100
+    rate = 2.0
+    concurrency = 4
+
+    def request(self, serials: list) -> urllib.request.Request:
+        query = urllib.parse.urlencode({"servicetags": ",".join(serials)})
+        return urllib.request.Request(
+            f"{self.base_url}/asset-entitlements?{query}", headers={"Authorization": f"Bearer {self.api_key}", "Accept": "application/json"}
+        )
+
+    def parse(self, body: bytes, serials: list) -> dict:
+        results = {serial: warranty_result(self.name) for serial in serials}
+        for asset in json.loads(body):
+            serial = str(asset.get("serviceTag", "")).upper()
+            if serial not in results or asset.get("invalid"):
+                continue
+            end_dates = [entitlement.get("endDate") for entitlement in asset.get("entitlements", []) if entitlement.get("endDate")]
+            results[serial] = warranty_result(self.name, max(end_dates, default=None), asset.get("productLineDescription"))
+        return results
+
+
+class LenovoAdapter(VendorAdapter):
+    """Lenovo warranty (API v2.5): up to 50 comma-separated serials per GET, ClientID header."""
+
+    name = "lenovo"
+    aliases = ("lenovo",)
+    serial_pattern = r"(PF|PC|PG|PW|PZ|R9|MJ|MP|S1)[0-9A-Z]{6}"
+    default_url = "https://supportapi.lenovo.com/v2.5"
+    batch_size = 50
+    rate = 1.0
+    concurrency = 2
+
+    def request(self, serials: list) -> urllib.request.Request:
+        query = urllib.parse.urlencode({"Serial": ",".join(serials)})
+        return urllib.request.Request(f"{self.base_url}/warranty?{query}", headers={"ClientID": self.api_key, "Accept": "application/json"})
+
+    def parse(self, body: bytes, serials: list) -> dict:
+        results = {serial: warranty_result(self.name) for serial in serials}
+        machines = json.loads(body)
+        for machine in machines if isinstance(machines, list) else [machines]:
+            serial = str(machine.get("Serial", "")).upper()
+            if serial not in results:
+                continue
+            end_dates = [warranty.get("End") for warranty in machine.get("Warranty") or [] if warranty.get("End")]
+            results[serial] = warranty_result(self.name, max(end_dates, default=None), machine.get("Product"))
+        return results
+
+
+ADAPTERS = [DellAdapter, LenovoAdapter]
+
+
+class WarrantyCache:
+    """
+    Vendor answers kept next to the store ("<store>.warranty.json", or warranty.json in a
+    sharded store's directory), keyed by "vendor:serial" with the time they were fetched.
+    """
+
+    version = 1
+
+    def __init__(self, json_file: str):
+        shard_dir = ShardedStore.shard_dir(json_file)
+        self.path = os.path.join(shard_dir, "warranty.json") if shard_dir else os.path.splitext(json_file)[0] + ".warranty.json"
+        self.results = self.read()
+
+    def read(self) -> dict:
+        try:
+            with open(self.path, "r") as file:
+                raw = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return raw.get("results", {}) if raw.get("version") == self.version else {}
+
+    def write(self, new_results: dict):
+        """
+        Add results and atomically rewrite the cache, keeping entries other processes wrote meanwhile.
+        The read and rewrite hold an exclusive lock on "<cache>.lock", so concurrent lookups do not drop each other's results.
+        """
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.results = dict(self.read(), **new_results)
+                atomic_write_json(self.path, {"version": self.version, "results": self.results})
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class WarrantyLookup:
+    """
+    Warranty status of machines by Machine S/N, for AddReport, the CLI and bulk ingestion.
+
+    Each machine goes to the adapter of its vendor: the DMI system vendor when known, else
+    the one adapter whose serial format matches (none when several do, so no machine is
+    sent to the wrong vendor and cached under it). Answers cached for less than CACHE_TTL
+    (MISS_TTL for "not found") are reused; the rest are sent in batches of the vendor's batch_size,
+    several requests in flight per vendor, each vendor throttled by its own rate
+    limiter. 429 and 5xx answers are retried after Retry-After or a growing delay.
+    Results are dicts with vendor, status ("active", "expired", "not found",
+    "unknown vendor" or "error"), end_date, product and checked (epoch seconds).
+    """
+
+    def __init__(self, json_file: str, adapters: list = None, ttl: float = CACHE_TTL, clock=time.time, sleep=time.sleep):
+        self.adapters = adapters if adapters is not None else [adapter() for adapter in ADAPTERS]
+        self.limiters = {adapter.name: RateLimiter(adapter.rate, adapter.concurrency, sleep=sleep) for adapter in self.adapters}
+        self.cache = WarrantyCache(json_file)
+        self.ttl = ttl
+        self.clock = clock
+        self.sleep = sleep
+
+    def adapter_for(self, machine_sn: str, vendor: str = None):
+        """
+        Return the adapter for a machine, or None when no vendor handles it or, without a
+        vendor, when the serial's format does not single out one adapter.
+        """
+        if ComponentModel.is_placeholder(vendor):
+            vendor = None
+        matching = [adapter for adapter in self.adapters if adapter.matches(machine_sn, vendor)]
+        if vendor:
+            return matching[0] if matching else None
+        return matching[0] if len(matching) == 1 else None
+
+    def fresh(self, result: dict) -> bool:
+        ttl = MISS_TTL if result.get("status") == "not found" else self.ttl
+        return self.clock() - result.get("checked", 0) < min(ttl, self.ttl)
+
+    @staticmethod
+    def _errors(adapter: VendorAdapter, serials: list, error: str) -> dict:
+        return {serial: {"vendor": adapter.name, "status": "error", "error": error} for serial in serials}
+
+    def _fetch(self, adapter: VendorAdapter, serials: list) -> dict:
+        """
+        Fetch one batch under the vendor's rate limit; a failed batch, or one answered with
+        a body the adapter cannot parse, reports an error for each serial.
+        """
+        for attempt in range(RETRIES + 1):
+            self.limiters[adapter.name].acquire()
+            try:
+                return adapter.fetch(serials)
+            except urllib.error.HTTPError as http_error:
+                error = f"HTTP {http_error.code}"
+                if (http_error.code != 429 and http_error.code < 500) or attempt == RETRIES:
+                    break
+                retry_after = http_error.headers.get("Retry-After", "")
+                self.sleep(float(retry_after) if retry_after.isdigit() else 2 ** attempt)
+            except (urllib.error.URLError, OSError, ValueError) as fetch_error:
+                error = str(fetch_error)
+                break
+            except (AttributeError, KeyError, TypeError, IndexError) as parse_error:
+                # Valid JSON of an unexpected shape, e.g. an error object instead of a list
+                error = f"unexpected {adapter.name} response ({type(parse_error).__name__}: {parse_error})"
+                break
+        return self._errors(adapter, serials, error)
+
+    def lookup(self, machines, refresh: bool = False, progress=None) -> dict:
+        """
+        Return {machine_sn: result} for machine serials, or (machine_sn, vendor) pairs.
+        refresh ignores the cache; progress, if given, is called with the number of machines resolved so far.
+        A batch that fails in any way is reported as "error"; the other batches are still returned and cached.
+        """
+        results, pending = {}, {}
+        for machine in machines:
+            machine_sn, vendor = (machine, None) if isinstance(machine, str) else machine
+            serial = machine_sn.strip().upper()
+            adapter = None if ComponentModel.is_placeholder(serial) else self.adapter_for(serial, vendor)
+            if adapter is None:
+                results[machine_sn] = {"vendor": None, "status": "unknown vendor"}
+                continue
+            cached = self.cache.results.get(f"{adapter.name}:{serial}")
+            if cached is not None and not refresh and self.fresh(cached):
+                results[machine_sn] = cached
+            else:
+                pending.setdefault(adapter, {}).setdefault(serial, []).append(machine_sn)
+        if progress is not None:
+            progress(len(results))
+
+        fetched = {}
+        executors = {adapter: ThreadPoolExecutor(adapter.concurrency) for adapter in pending}
+        try:
+            futures = {}
+            for adapter, serials in pending.items():
+                serials = list(serials)
+                for start in range(0, len(serials), adapter.batch_size):
+                    batch = serials[start:start + adapter.batch_size]
+                    futures[executors[adapter].submit(self._fetch, adapter, batch)] = adapter, batch
+            for future in as_completed(futures):
+                adapter, batch = futures[future]
+                try:
+                    batch_results = future.result()
+                except Exception as batch_error:
+                    batch_results = self._errors(adapter, batch, f"{type(batch_error).__name__}: {batch_error}")
+                for serial, result in batch_results.items():
+                    result["checked"] = int(self.clock())
+                    if result["status"] != "error":
+                        fetched[f"{adapter.name}:{serial}"] = result
+                    for machine_sn in pending[adapter].get(serial, []):
+                        results[machine_sn] = result
+                if progress is not None:
+                    progress(len(results))
+        finally:
+            for executor in executors.values():
+                executor.shutdown()
+        if fetched:
+            self.cache.write(fetched)
+        return results
@@ -0,0 +1,36 @@
+import traceback
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    """Signals a Worker emits back on the thread that owns the receiving widget."""
+
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(object)
+
+
+class Worker(QRunnable):
+    """
+    Run a function on a QThreadPool and report the result by signal.
+    The function must not touch widgets; connect to signals.finished to update the UI.
+    With progress=True the function also receives progress=signals.progress.emit.
+    """
+
+    def __init__(self, fn, *args, progress=False, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        if progress:
+            self.kwargs["progress"] = self.signals.progress.emit
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception:
+            self.signals.error.emit(traceback.format_exc())
+        else:
+            self.signals.finished.emit(result)